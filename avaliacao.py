@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# avaliacao.py
+# Avaliação offline de acurácia e do limiar de reconhecimento: comparações
+# genuínas e impostoras sobre os cadastros (usuarios/) e pastas rotuladas de
+# capturas, curvas ROC/DET, FAR/FRR por limiar e usuários problemáticos
+
+import sys
+import csv
+import argparse
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from benchmark import carregar_encodings_rotulados, metadados_execucao, salvar_resultado, USUARIOS_DIR
+from codificacao import CODIFICADORES, CodificadorDlib, criar_codificador
+
+# --- CONFIGURAÇÕES DA AVALIAÇÃO ---
+LIMIARES_CANDIDATOS = [0.4, 0.45, 0.5, 0.55, 0.6]  # Escala do dlib; proporcionais ao limiar nos demais
+FAR_ALVO = 0.001            # FAR aceitável para sugerir um limiar
+DISTANCIA_MAXIMA = 2.0      # Distâncias maiores caem na última faixa do histograma
+NUM_FAIXAS = 4000           # Resolução das curvas: 0.0005 de distância por faixa
+TAMANHO_BLOCO = 1024        # Linhas comparadas por vez (memória ~ bloco x N x 4 bytes)
+TOTAL_OUTLIERS = 20
+
+
+class Comparacoes:
+    """
+    Acumula as comparações sem guardar os N² pares: histogramas de
+    distâncias genuínas/impostoras e, por amostra, a pior distância genuína
+    e o impostor mais próximo.
+    """
+
+    def __init__(self, total_amostras: int):
+        self.genuinas = np.zeros(NUM_FAIXAS, dtype=np.int64)
+        self.impostoras = np.zeros(NUM_FAIXAS, dtype=np.int64)
+        self.pior_genuina = np.full(total_amostras, -np.inf, dtype=np.float32)
+        self.impostor_proximo = np.full(total_amostras, np.inf, dtype=np.float32)
+        self.indice_impostor = np.full(total_amostras, -1, dtype=np.int64)
+
+    def contar(self, genuinas: np.ndarray, impostoras: np.ndarray) -> None:
+        self.genuinas += np.bincount(_faixas(genuinas), minlength=NUM_FAIXAS)
+        self.impostoras += np.bincount(_faixas(impostoras), minlength=NUM_FAIXAS)
+
+    def atualizar_amostras(self, linhas: np.ndarray, pior_genuina: np.ndarray,
+                           impostor_proximo: np.ndarray, indice_impostor: np.ndarray) -> None:
+        self.pior_genuina[linhas] = np.maximum(self.pior_genuina[linhas], pior_genuina)
+        melhorou = impostor_proximo < self.impostor_proximo[linhas]
+        self.impostor_proximo[linhas[melhorou]] = impostor_proximo[melhorou]
+        self.indice_impostor[linhas[melhorou]] = indice_impostor[melhorou]
+
+
+def _faixas(distancias: np.ndarray) -> np.ndarray:
+    return np.minimum((distancias * (NUM_FAIXAS / DISTANCIA_MAXIMA)).astype(np.int64), NUM_FAIXAS - 1)
+
+
+def comparar_em_blocos(consultas: np.ndarray, ids_consultas: np.ndarray, referencias: np.ndarray,
+                       ids_referencias: np.ndarray, comparacoes: Comparacoes, deslocamento: int = 0,
+                       mesma_base: bool = False, tamanho_bloco: int = TAMANHO_BLOCO) -> None:
+    """
+    Distâncias de todas as consultas para todas as referências, um bloco de
+    linhas por vez (||a||² + ||b||² - 2ab). Com `mesma_base`, cada par entra
+    uma única vez nos histogramas e a amostra não é comparada com ela mesma.
+    `deslocamento` é a posição da primeira consulta nas estatísticas por amostra.
+    """
+    normas_referencias = np.einsum('ij,ij->i', referencias, referencias)
+    colunas = np.arange(len(referencias))
+
+    for inicio in range(0, len(consultas), tamanho_bloco):
+        bloco = consultas[inicio:inicio + tamanho_bloco]
+        quadrados = (np.einsum('ij,ij->i', bloco, bloco)[:, None] + normas_referencias[None, :]
+                     - 2.0 * bloco @ referencias.T)
+        distancias = np.sqrt(np.maximum(quadrados, 0.0))
+        mesmo_rotulo = ids_consultas[inicio:inicio + len(bloco), None] == ids_referencias[None, :]
+
+        if mesma_base:
+            linhas = np.arange(inicio, inicio + len(bloco))[:, None]
+            propria = colunas[None, :] == linhas
+            unico = colunas[None, :] > linhas
+            comparacoes.contar(distancias[unico & mesmo_rotulo], distancias[unico & ~mesmo_rotulo])
+        else:
+            propria = np.zeros_like(mesmo_rotulo)
+            comparacoes.contar(distancias[mesmo_rotulo], distancias[~mesmo_rotulo])
+
+        genuinas = np.where(mesmo_rotulo & ~propria, distancias, -np.inf).max(axis=1)
+        impostoras = np.where(mesmo_rotulo, np.inf, distancias)
+        indices = impostoras.argmin(axis=1)
+        comparacoes.atualizar_amostras(np.arange(inicio, inicio + len(bloco)) + deslocamento, genuinas,
+                                       impostoras[np.arange(len(bloco)), indices], indices)
+
+
+def curvas(comparacoes: Comparacoes) -> Dict[str, np.ndarray]:
+    """FAR/FRR para cada limiar (borda superior de cada faixa do histograma)."""
+    limiares = (np.arange(NUM_FAIXAS) + 1) * (DISTANCIA_MAXIMA / NUM_FAIXAS)
+    total_genuinas = max(int(comparacoes.genuinas.sum()), 1)
+    total_impostoras = max(int(comparacoes.impostoras.sum()), 1)
+    far = np.cumsum(comparacoes.impostoras) / total_impostoras
+    frr = 1.0 - np.cumsum(comparacoes.genuinas) / total_genuinas
+    return {'limiar': limiares, 'far': far, 'frr': frr}
+
+
+def taxas_no_limiar(curva: Dict[str, np.ndarray], limiar: float) -> Dict[str, float]:
+    indice = min(int(np.searchsorted(curva['limiar'], limiar - 1e-9)), NUM_FAIXAS - 1)
+    return {'limiar': limiar, 'far': float(curva['far'][indice]), 'frr': float(curva['frr'][indice])}
+
+
+def resumo_curva(curva: Dict[str, np.ndarray], limiares: List[float], far_alvo: float) -> Dict:
+    """EER, limiar sugerido para o FAR alvo e FAR/FRR nos limiares candidatos."""
+    eer = int(np.argmin(np.abs(curva['far'] - curva['frr'])))
+    dentro = np.nonzero(curva['far'] <= far_alvo)[0]
+    sugerido = int(dentro[-1]) if len(dentro) else None
+    return {
+        'eer': round(float((curva['far'][eer] + curva['frr'][eer]) / 2), 6),
+        'limiar_eer': round(float(curva['limiar'][eer]), 4),
+        'far_alvo': far_alvo,
+        'limiar_far_alvo': round(float(curva['limiar'][sugerido]), 4) if sugerido is not None else None,
+        'frr_no_far_alvo': round(float(curva['frr'][sugerido]), 6) if sugerido is not None else None,
+        'limiares': [taxas_no_limiar(curva, limiar) for limiar in limiares],
+    }
+
+
+def outliers_por_usuario(rotulos: List[str], caminhos: List[str], comparacoes: Comparacoes,
+                         total: int = TOTAL_OUTLIERS) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Usuários com menor margem entre a pior comparação genuína e o impostor
+    mais próximo: candidatos a recadastro ou a pares confundíveis.
+
+    Quem não tem margem (uma amostra só, sem comparação genuína) não entra
+    nesse ranking: distância a impostor e margem não são comparáveis. Esses
+    vêm numa segunda lista, do impostor mais próximo ao mais distante.
+    Retorna (por margem, sem margem), cada uma com até `total` usuários.
+    """
+    por_usuario: Dict[str, Dict] = {}
+    for i, rotulo in enumerate(rotulos):
+        item = por_usuario.setdefault(rotulo, {'usuario': rotulo, 'amostras': 0, 'pior_genuina': None,
+                                               'amostra_pior_genuina': None, 'impostor_proximo': None,
+                                               'rotulo_impostor': None})
+        item['amostras'] += 1
+        if np.isfinite(comparacoes.pior_genuina[i]) and (item['pior_genuina'] is None
+                                                          or comparacoes.pior_genuina[i] > item['pior_genuina']):
+            item['pior_genuina'] = float(comparacoes.pior_genuina[i])
+            item['amostra_pior_genuina'] = caminhos[i]
+        if np.isfinite(comparacoes.impostor_proximo[i]) and (item['impostor_proximo'] is None
+                                                              or comparacoes.impostor_proximo[i] < item['impostor_proximo']):
+            item['impostor_proximo'] = float(comparacoes.impostor_proximo[i])
+            item['rotulo_impostor'] = rotulos[comparacoes.indice_impostor[i]]
+
+    for item in por_usuario.values():
+        if item['pior_genuina'] is not None and item['impostor_proximo'] is not None:
+            item['margem'] = round(item['impostor_proximo'] - item['pior_genuina'], 4)
+        else:
+            item['margem'] = None
+
+    com_margem = sorted((u for u in por_usuario.values() if u['margem'] is not None), key=lambda u: u['margem'])
+    sem_margem = sorted((u for u in por_usuario.values() if u['margem'] is None and u['impostor_proximo'] is not None),
+                        key=lambda u: u['impostor_proximo'])
+    return com_margem[:total], sem_margem[:total]
+
+
+def salvar_curvas_csv(curva: Dict[str, np.ndarray], caminho: str) -> None:
+    """Uma linha por limiar: ROC (FAR x TAR) e DET (FAR x FRR) saem do mesmo arquivo."""
+    with open(caminho, 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(['limiar', 'far', 'frr', 'tar'])
+        for limiar, far, frr in zip(curva['limiar'], curva['far'], curva['frr']):
+            escritor.writerow([f"{limiar:.4f}", f"{far:.8f}", f"{frr:.8f}", f"{1 - frr:.8f}"])
+    print(f"💾 Curvas salvas em {caminho}")
+
+
+def salvar_grafico(curva: Dict[str, np.ndarray], caminho: str, limiar_atual: float) -> None:
+    """ROC e DET lado a lado (requer matplotlib, que não é dependência do sistema)."""
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("⚠️ matplotlib não instalado; use o CSV de --curvas para os gráficos")
+        return
+
+    atual = taxas_no_limiar(curva, limiar_atual)
+    fig, (roc, det) = plt.subplots(1, 2, figsize=(11, 4.5))
+    roc.plot(curva['far'], 1 - curva['frr'])
+    roc.scatter([atual['far']], [1 - atual['frr']], color='red', label=f"limiar {limiar_atual}")
+    roc.set_xscale('log')
+    roc.set_xlabel('FAR')
+    roc.set_ylabel('TAR')
+    roc.set_title('ROC')
+    roc.legend()
+
+    det.plot(curva['far'], curva['frr'])
+    det.scatter([atual['far']], [atual['frr']], color='red', label=f"limiar {limiar_atual}")
+    det.set_xscale('log')
+    det.set_yscale('log')
+    det.set_xlabel('FAR')
+    det.set_ylabel('FRR')
+    det.set_title('DET')
+    det.legend()
+
+    fig.tight_layout()
+    fig.savefig(caminho, dpi=120)
+    print(f"💾 Gráfico salvo em {caminho}")
+
+
+def avaliar(cadastros: Tuple[List[str], List[str], np.ndarray],
+            sondas: Optional[Tuple[List[str], List[str], np.ndarray]] = None,
+            tamanho_bloco: int = TAMANHO_BLOCO) -> Tuple[Comparacoes, List[str], List[str]]:
+    """
+    Cadastros x cadastros (cada par uma vez) e, se houver, sondas x cadastros.
+    Retorna as comparações e os rótulos/caminhos na ordem das amostras.
+    """
+    rotulos_c, caminhos_c, encodings_c = cadastros
+    rotulos_s, caminhos_s, encodings_s = sondas if sondas else ([], [], np.empty((0, 128), np.float32))
+
+    _, ids = np.unique(np.array(rotulos_c + rotulos_s, dtype=object).astype(str), return_inverse=True)
+    ids_c, ids_s = ids[:len(rotulos_c)], ids[len(rotulos_c):]
+
+    comparacoes = Comparacoes(len(rotulos_c) + len(rotulos_s))
+    comparar_em_blocos(encodings_c, ids_c, encodings_c, ids_c, comparacoes,
+                       mesma_base=True, tamanho_bloco=tamanho_bloco)
+    if len(rotulos_s):
+        comparar_em_blocos(encodings_s, ids_s, encodings_c, ids_c, comparacoes,
+                           deslocamento=len(rotulos_c), tamanho_bloco=tamanho_bloco)
+
+    # indice_impostor aponta para os cadastros, que vêm primeiro na lista de rótulos
+    return comparacoes, rotulos_c + rotulos_s, caminhos_c + caminhos_s
+
+
+def imprimir_relatorio(resumo: Dict, comparacoes: Comparacoes, outliers: List[Dict],
+                       sem_margem: List[Dict] = ()) -> None:
+    print(f"\n📊 {int(comparacoes.genuinas.sum())} pares genuínos | {int(comparacoes.impostoras.sum())} impostores")
+    print(f"   EER {resumo['eer']:.2%} no limiar {resumo['limiar_eer']}")
+    if resumo['limiar_far_alvo'] is not None:
+        print(f"   FAR ≤ {resumo['far_alvo']}: limiar {resumo['limiar_far_alvo']} (FRR {resumo['frr_no_far_alvo']:.2%})")
+
+    print(f"\n{'Limiar':>6} | {'FAR':>9} | {'FRR':>9}")
+    print("-" * 30)
+    for taxa in resumo['limiares']:
+        print(f"{taxa['limiar']:>6.3f} | {taxa['far']:>9.4%} | {taxa['frr']:>9.4%}")
+
+    if outliers:
+        print(f"\n{'Usuário':<20} | {'pior genuína':>12} | {'impostor':>8} | {'margem':>7} | mais parecido com")
+        print("-" * 78)
+        for u in outliers:
+            pior = f"{u['pior_genuina']:.3f}" if u['pior_genuina'] is not None else "-"
+            impostor = f"{u['impostor_proximo']:.3f}" if u['impostor_proximo'] is not None else "-"
+            margem = f"{u['margem']:.3f}" if u['margem'] is not None else "-"
+            print(f"{u['usuario']:<20} | {pior:>12} | {impostor:>8} | {margem:>7} | {u['rotulo_impostor'] or '-'}")
+
+    if sem_margem:
+        print("\nSem comparação genuína (uma amostra), pelo impostor mais próximo:")
+        print(f"{'Usuário':<20} | {'impostor':>8} | mais parecido com")
+        print("-" * 52)
+        for u in sem_margem:
+            print(f"{u['usuario']:<20} | {u['impostor_proximo']:>8.3f} | {u['rotulo_impostor']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Avaliação de acurácia e do limiar de reconhecimento")
+    parser.add_argument('--cadastros', default=USUARIOS_DIR, help="Pasta dos cadastros (uma subpasta por pessoa)")
+    parser.add_argument('--sondas', help="Pasta rotulada de capturas da catraca (subpastas com o mesmo nome do cadastro)")
+    parser.add_argument('--codificador', default=CodificadorDlib.nome, choices=list(CODIFICADORES),
+                        help="Backend de encoding avaliado")
+    parser.add_argument('--limiares', nargs='+', type=float)
+    parser.add_argument('--far-alvo', type=float, default=FAR_ALVO)
+    parser.add_argument('--limiar-atual', type=float, help="Marcado nos gráficos (padrão: o do codificador)")
+    parser.add_argument('--bloco', type=int, default=TAMANHO_BLOCO, help="Linhas por bloco de distâncias")
+    parser.add_argument('--outliers', type=int, default=TOTAL_OUTLIERS)
+    parser.add_argument('--curvas', help="CSV com FAR/FRR/TAR por limiar (ROC e DET)")
+    parser.add_argument('--grafico', help="PNG com ROC e DET (requer matplotlib)")
+    parser.add_argument('--saida', help="Arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    try:
+        codificador = criar_codificador(args.codificador)
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        return 1
+    escala = codificador.limiar / CodificadorDlib.limiar
+    limiares = args.limiares or [round(limiar * escala, 3) for limiar in LIMIARES_CANDIDATOS]
+    limiar_atual = args.limiar_atual if args.limiar_atual is not None else codificador.limiar
+
+    cadastros = carregar_encodings_rotulados(args.cadastros, codificador)
+    sondas = carregar_encodings_rotulados(args.sondas, codificador) if args.sondas else None
+    if not cadastros[0]:
+        print(f"❌ Nenhum rosto encontrado em {args.cadastros}")
+        return 1
+
+    print(f"📂 {len(cadastros[0])} amostra(s) de {len(set(cadastros[0]))} cadastro(s)"
+          + (f" | {len(sondas[0])} sonda(s)" if sondas else ""))
+    comparacoes, rotulos, caminhos = avaliar(cadastros, sondas, args.bloco)
+    if comparacoes.genuinas.sum() == 0 or comparacoes.impostoras.sum() == 0:
+        print("❌ São necessárias comparações genuínas (2+ rostos da mesma pessoa) e impostoras (2+ pessoas)")
+        return 1
+
+    curva = curvas(comparacoes)
+    resumo = resumo_curva(curva, limiares, args.far_alvo)
+    outliers, sem_margem = outliers_por_usuario(rotulos, caminhos, comparacoes, args.outliers)
+    imprimir_relatorio(resumo, comparacoes, outliers, sem_margem)
+
+    if args.curvas:
+        salvar_curvas_csv(curva, args.curvas)
+    if args.grafico:
+        salvar_grafico(curva, args.grafico, limiar_atual)
+
+    salvar_resultado({
+        'avaliacao': 'limiar',
+        'ambiente': metadados_execucao(),
+        'parametros': {'cadastros': args.cadastros, 'sondas': args.sondas, 'far_alvo': args.far_alvo,
+                       'codificador': codificador.versao},
+        'pares_genuinos': int(comparacoes.genuinas.sum()),
+        'pares_impostores': int(comparacoes.impostoras.sum()),
+        'resumo': resumo,
+        'outliers': outliers,
+        'outliers_sem_margem': sem_margem,
+    }, args.saida)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
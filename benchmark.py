@@ -0,0 +1,1123 @@
+#!/usr/bin/env python3
+# benchmark.py
+# Harness de benchmark compartilhado: latência (p50/p95/p99) e recall (com
+# caixas anotadas) dos detectores de rosto, vazão do encoding em lote por
+# tamanho de lote, velocidade x acurácia dos backends de encoding (dlib, SFace), tempo
+# de inicialização da galeria (blobs do SQLite x arquivo mapeado),
+# acurácia x velocidade da galeria em precisão reduzida e o pipeline completo
+# da catraca (vídeo gravado ou sintético, sem câmera nem janela)
+
+import os
+import sys
+import json
+import glob
+import time
+import sqlite3
+import tempfile
+import argparse
+import platform
+import subprocess
+import cv2
+import numpy as np
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import resource  # CPU e pico de memória (indisponível no Windows)
+except ImportError:
+    resource = None
+
+from deteccao import DETECTORES, criar_detector, detectar_rostos
+from chip_facial import LANDMARKS_ARQUIVO, CHIP_TAMANHO, listar_chips
+from codificacao import (CODIFICADORES, CodificadorRostos, criar_codificador, codificar_chips, codificar_rostos,
+                         extrair_chips)
+from galeria import Galeria, PRECISOES, PRECISAO_COMPLETA, TOP_K_REORDENAR, encoding_para_blob, blob_para_encoding
+from galeria_mapeada import criar_versionamento, versao_banco, salvar_galeria_mapeada, abrir_galeria_mapeada
+
+USUARIOS_DIR = "usuarios"
+EXTENSOES_IMAGEM = (".jpg", ".jpeg", ".png", ".bmp")
+IOU_MINIMO = 0.3  # Caixas de backends diferentes têm convenções diferentes
+
+
+# --- UTILITÁRIOS DE MEDIÇÃO ---
+
+def cronometrar(funcao: Callable, *args, repeticoes: int = 1):
+    """Executa `funcao(*args)` `repeticoes` vezes; retorna (último resultado, tempos em ms)."""
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        tempos.append((time.perf_counter() - inicio) * 1000.0)
+    return resultado, tempos
+
+
+def resumo_latencias(amostras_ms: List[float]) -> Dict[str, float]:
+    """Resume uma lista de latências (ms) em média e percentis."""
+    if not amostras_ms:
+        return {'n': 0}
+    amostras = np.asarray(amostras_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(amostras, [50, 95, 99])
+    return {
+        'n': int(amostras.size),
+        'media': round(float(amostras.mean()), 3),
+        'p50': round(float(p50), 3),
+        'p95': round(float(p95), 3),
+        'p99': round(float(p99), 3),
+        'max': round(float(amostras.max()), 3),
+    }
+
+
+def metadados_execucao() -> Dict:
+    """Informações do ambiente gravadas junto com cada resultado."""
+    return {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'maquina': platform.machine(),
+        'cpus': os.cpu_count(),
+        'versao': versao_codigo(),
+    }
+
+
+def versao_codigo() -> Optional[str]:
+    """Commit atual (para comparar resultados entre versões), se for um repositório git."""
+    try:
+        saida = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return saida.stdout.strip() or None
+
+
+def uso_recursos() -> Dict[str, float]:
+    """Tempo de CPU (s) e pico de RSS (MB) do processo até agora."""
+    if resource is None:
+        return {}
+    uso = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    pico = uso.ru_maxrss / (1024 * 1024) if sys.platform == 'darwin' else uso.ru_maxrss / 1024
+    return {'cpu_s': uso.ru_utime + uso.ru_stime, 'pico_rss_mb': round(pico, 1)}
+
+
+def salvar_resultado(resultado: Dict, caminho: Optional[str]) -> None:
+    """Grava o resultado em JSON (ou imprime no stdout se não houver caminho)."""
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if caminho:
+        with open(caminho, 'w', encoding='utf-8') as f:
+            f.write(texto)
+        print(f"💾 Resultado salvo em {caminho}")
+    else:
+        print(texto)
+
+
+# --- CONJUNTO DE IMAGENS ---
+
+def carregar_caixas_anotadas(caminho: str) -> Dict[str, List[Tuple[int, int, int, int]]]:
+    """
+    Caixas marcadas à mão, independentes de qualquer detector: JSON
+    {"caminho da imagem relativo à pasta": [[top, right, bottom, left], ...]}.
+    Lista vazia = imagem sem rosto.
+    """
+    with open(caminho, 'r', encoding='utf-8') as f:
+        anotacoes = json.load(f)
+    return {os.path.normpath(imagem): [tuple(caixa) for caixa in caixas] for imagem, caixas in anotacoes.items()}
+
+
+def carregar_imagens_rotuladas(pasta: str, anotacoes: Optional[Dict[str, List[Tuple[int, int, int, int]]]] = None
+                               ) -> List[Tuple[str, np.ndarray, Optional[List[Tuple[int, int, int, int]]]]]:
+    """
+    Carrega as imagens de `pasta` (recursivamente) com as caixas de
+    referência de cada uma: as de `anotacoes` (ver carregar_caixas_anotadas)
+    ou, sem elas, a caixa que o detector do cadastro gravou em landmarks.json.
+    None = imagem sem referência.
+    """
+    imagens = []
+    for caminho in sorted(glob.glob(os.path.join(pasta, "**", "*"), recursive=True)):
+        if not caminho.lower().endswith(EXTENSOES_IMAGEM) or os.path.basename(caminho).startswith("rosto"):
+            continue
+
+        imagem = cv2.imread(caminho)
+        if imagem is None:
+            continue
+
+        referencias = None
+        if anotacoes is not None:
+            referencias = anotacoes.get(os.path.normpath(os.path.relpath(caminho, pasta)))
+        else:
+            caminho_landmarks = os.path.join(os.path.dirname(caminho), LANDMARKS_ARQUIVO)
+            if os.path.basename(caminho) == "foto.jpg" and os.path.exists(caminho_landmarks):
+                with open(caminho_landmarks, 'r', encoding='utf-8') as f:
+                    dados = json.load(f)
+                if list(dados.get('dimensoes_origem', [])) == list(imagem.shape[:2]):
+                    referencias = [tuple(dados['face_location'])]
+
+        imagens.append((caminho, imagem, referencias))
+    return imagens
+
+
+def iou(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+    """Interseção sobre união de duas caixas (top, right, bottom, left)."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    intersecao = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    uniao = area_a + area_b - intersecao
+    return intersecao / uniao if uniao > 0 else 0.0
+
+
+# --- BENCHMARK DE DETECTORES ---
+
+def benchmark_detector(nome: str, imagens, escala: float = 1.0, upsample: int = 0,
+                       repeticoes: int = 3, anotadas: bool = False) -> Dict:
+    """
+    Mede a latência de um backend sobre o conjunto de imagens e compara as
+    caixas com as de referência. Com caixas `anotadas` à mão o resultado é
+    o recall; com as do cadastro, que saíram de um detector, é só a
+    concordância com ele (o próprio detector do cadastro sempre concorda).
+    """
+    try:
+        backend = criar_detector(nome)
+    except Exception as e:
+        return {'erro': str(e)}
+
+    # Aquecimento (carregamento de modelo / alocações)
+    if imagens:
+        detectar_rostos(imagens[0][1], backend, escala, upsample)
+
+    latencias = []
+    encontradas = referencias_total = com_deteccao = 0
+    for _, imagem, referencias in imagens:
+        caixas, tempos = cronometrar(detectar_rostos, imagem, backend, escala, upsample,
+                                     repeticoes=repeticoes)
+        latencias.extend(tempos)
+        com_deteccao += len(caixas) > 0
+
+        if referencias:
+            referencias_total += len(referencias)
+            encontradas += sum(any(iou(caixa, referencia) >= IOU_MINIMO for caixa in caixas)
+                               for referencia in referencias)
+
+    taxa = round(encontradas / referencias_total, 4) if referencias_total else None
+    return {
+        'latencia_ms': resumo_latencias(latencias),
+        ('recall' if anotadas else 'concordancia_cadastro'): taxa,
+        'imagens_com_deteccao': round(com_deteccao / len(imagens), 4) if imagens else None,
+        'imagens': len(imagens),
+        'caixas_referencia': referencias_total,
+    }
+
+
+def benchmark_detectores(imagens, nomes: List[str], escala: float, upsample: int,
+                         repeticoes: int, anotadas: bool = False) -> Dict:
+    """Roda `benchmark_detector` para cada backend pedido."""
+    return {nome: benchmark_detector(nome, imagens, escala, upsample, repeticoes, anotadas) for nome in nomes}
+
+
+def imprimir_tabela_detectores(resultados: Dict, anotadas: bool = False) -> None:
+    """Tabela resumida no terminal."""
+    chave, titulo = ('recall', 'Recall') if anotadas else ('concordancia_cadastro', 'Concord.')
+    print(f"\n{'Detector':<8} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {titulo:>8} | {'Detecção':>8}")
+    print("-" * 65)
+    for nome, r in resultados.items():
+        if 'erro' in r:
+            print(f"{nome:<8} | indisponível: {r['erro']}")
+            continue
+        lat = r['latencia_ms']
+        taxa = f"{r[chave]:.2%}" if r[chave] is not None else "-"
+        deteccao = f"{r['imagens_com_deteccao']:.2%}" if r['imagens_com_deteccao'] is not None else "-"
+        print(f"{nome:<8} | {lat.get('p50', 0):>8.1f} | {lat.get('p95', 0):>8.1f} | {lat.get('p99', 0):>8.1f} | "
+              f"{taxa:>8} | {deteccao:>8}")
+
+
+def comando_detectores(args) -> int:
+    anotacoes = None
+    if args.caixas:
+        try:
+            anotacoes = carregar_caixas_anotadas(args.caixas)
+        except (OSError, ValueError) as e:
+            print(f"❌ Caixas anotadas inválidas ({args.caixas}): {e}")
+            return 1
+    imagens = carregar_imagens_rotuladas(args.pasta, anotacoes)
+    if not imagens:
+        print(f"❌ Nenhuma imagem encontrada em {args.pasta}")
+        return 1
+
+    anotadas = anotacoes is not None
+    print(f"📊 {len(imagens)} imagem(ns) | escala {args.escala} | upsample {args.upsample} | referência: "
+          f"{'caixas anotadas (recall)' if anotadas else 'caixa do cadastro (concordância, não recall)'}")
+    resultados = benchmark_detectores(imagens, args.detectores, args.escala, args.upsample, args.repeticoes, anotadas)
+    imprimir_tabela_detectores(resultados, anotadas)
+
+    salvar_resultado({
+        'benchmark': 'detectores',
+        'ambiente': metadados_execucao(),
+        'parametros': {'pasta': args.pasta, 'caixas': args.caixas, 'escala': args.escala,
+                       'upsample': args.upsample, 'repeticoes': args.repeticoes},
+        'resultados': resultados,
+    }, args.saida)
+    return 0
+
+
+# --- BENCHMARK DE ENCODING EM LOTE ---
+
+def carregar_chips(pasta: str, quantidade: int) -> List[np.ndarray]:
+    """Chips RGB dos usuários (repetidos até `quantidade`) ou sintéticos se não houver."""
+    chips = []
+    for caminho_usuario in sorted(glob.glob(os.path.join(pasta, "*"))):
+        for caminho_chip in listar_chips(caminho_usuario):
+            chip = cv2.imread(caminho_chip)
+            if chip is not None and chip.shape[:2] == (CHIP_TAMANHO, CHIP_TAMANHO):
+                chips.append(cv2.cvtColor(chip, cv2.COLOR_BGR2RGB))
+
+    if not chips:
+        gerador = np.random.default_rng(0)
+        chips = [gerador.integers(0, 256, (CHIP_TAMANHO, CHIP_TAMANHO, 3), dtype=np.uint8)]
+
+    return [chips[i % len(chips)] for i in range(quantidade)]
+
+
+def benchmark_encoding_lote(chips: List[np.ndarray], tamanhos_lote: List[int],
+                            tamanho_galeria: int, repeticoes: int) -> Dict:
+    """
+    Compara, para cada tamanho de lote, o encoding rosto a rosto com o
+    encoding em lote seguido de uma única busca vetorizada na galeria.
+    """
+    gerador = np.random.default_rng(1)
+    galeria = Galeria()
+    for i in range(tamanho_galeria):
+        galeria.adicionar_usuario({'id': i}, gerador.normal(0, 0.1, (1, 128)))
+    galeria.buscar(np.zeros((1, 128)))  # monta a matriz fora da medição
+
+    codificar_chips(chips[:1])  # aquecimento
+    resultados = {}
+    for tamanho in tamanhos_lote:
+        lote = chips[:tamanho]
+
+        def um_a_um():
+            for chip in lote:
+                galeria.buscar(codificar_chips([chip]))
+
+        def em_lote():
+            galeria.buscar(codificar_chips(lote))
+
+        _, tempos_individual = cronometrar(um_a_um, repeticoes=repeticoes)
+        _, tempos_lote = cronometrar(em_lote, repeticoes=repeticoes)
+
+        individual = resumo_latencias(tempos_individual)
+        agrupado = resumo_latencias(tempos_lote)
+        resultados[str(tamanho)] = {
+            'individual_ms': individual,
+            'lote_ms': agrupado,
+            'rostos_por_s_individual': round(tamanho * 1000.0 / individual['p50'], 2),
+            'rostos_por_s_lote': round(tamanho * 1000.0 / agrupado['p50'], 2),
+        }
+    return resultados
+
+
+def comando_encoding(args) -> int:
+    chips = carregar_chips(args.pasta, max(args.lotes))
+    print(f"📊 Encoding em lote | lotes {args.lotes} | galeria {args.galeria} usuário(s)")
+    resultados = benchmark_encoding_lote(chips, args.lotes, args.galeria, args.repeticoes)
+
+    print(f"\n{'Lote':>5} | {'rostos/s (1 a 1)':>17} | {'rostos/s (lote)':>16} | {'ganho':>6}")
+    print("-" * 54)
+    for tamanho, r in resultados.items():
+        ganho = r['rostos_por_s_lote'] / r['rostos_por_s_individual']
+        print(f"{tamanho:>5} | {r['rostos_por_s_individual']:>17.1f} | {r['rostos_por_s_lote']:>16.1f} | {ganho:>5.2f}x")
+
+    salvar_resultado({
+        'benchmark': 'encoding_lote',
+        'ambiente': metadados_execucao(),
+        'parametros': {'pasta': args.pasta, 'lotes': args.lotes,
+                       'galeria': args.galeria, 'repeticoes': args.repeticoes},
+        'resultados': resultados,
+    }, args.saida)
+    return 0
+
+
+# --- BACKENDS DE ENCODING ---
+
+def benchmark_codificador(nome: str, rotulos: List[str], caminhos: List[str], chips: List[np.ndarray],
+                          tamanho_lote: int, repeticoes: int, far_alvo: float) -> Dict:
+    """
+    Velocidade (ms por rosto, um a um e em lote) e acurácia de verificação
+    (EER, FRR no FAR alvo, FAR/FRR no limiar padrão do backend) sobre os
+    mesmos chips. Os encodings de cada backend só são comparados entre si.
+    """
+    from avaliacao import avaliar, curvas, resumo_curva  # avaliacao importa este módulo
+
+    try:
+        codificador = criar_codificador(nome)
+        codificador.aquecer()
+    except Exception as e:
+        return {'erro': str(e)}
+
+    lote = [chips[i % len(chips)] for i in range(tamanho_lote)]
+    _, tempos_individual = cronometrar(lambda: [codificador.codificar([c]) for c in lote], repeticoes=repeticoes)
+    _, tempos_lote = cronometrar(codificador.codificar, lote, repeticoes=repeticoes)
+
+    resultado = {
+        'versao': codificador.versao,
+        'limiar_padrao': codificador.limiar,
+        'ms_por_rosto_individual': round(float(np.median(tempos_individual)) / tamanho_lote, 3),
+        'ms_por_rosto_lote': round(float(np.median(tempos_lote)) / tamanho_lote, 3),
+    }
+
+    encodings = np.asarray(codificador.codificar(chips), dtype=np.float32)
+    comparacoes, _, _ = avaliar((rotulos, caminhos, encodings))
+    if comparacoes.genuinas.sum() == 0 or comparacoes.impostoras.sum() == 0:
+        return resultado  # Sem pares genuínos e impostores: só velocidade
+
+    resumo = resumo_curva(curvas(comparacoes), [codificador.limiar], far_alvo)
+    resultado.update(pares_genuinos=int(comparacoes.genuinas.sum()),
+                     pares_impostores=int(comparacoes.impostoras.sum()),
+                     eer=resumo['eer'], limiar_eer=resumo['limiar_eer'],
+                     limiar_far_alvo=resumo['limiar_far_alvo'], frr_no_far_alvo=resumo['frr_no_far_alvo'],
+                     no_limiar_padrao=resumo['limiares'][0])
+    return resultado
+
+
+def comando_codificadores(args) -> int:
+    rotulos, caminhos, chips = carregar_chips_rotulados(args.pasta)
+    if not chips:
+        print(f"❌ Nenhum rosto encontrado em {args.pasta}")
+        return 1
+
+    print(f"📊 Codificadores | {len(chips)} rosto(s) de {len(set(rotulos))} rótulo(s) | "
+          f"lote {args.lote} | FAR alvo {args.far_alvo}")
+    resultados = {nome: benchmark_codificador(nome, rotulos, caminhos, chips, args.lote, args.repeticoes,
+                                              args.far_alvo)
+                  for nome in args.codificadores}
+
+    print(f"\n{'Backend':<7} | {'ms/rosto':>8} | {'em lote':>7} | {'EER':>7} | {'limiar EER':>10} | "
+          f"{'FAR':>8} | {'FRR':>8} (no limiar padrão)")
+    print("-" * 92)
+    for nome, r in resultados.items():
+        if 'erro' in r:
+            print(f"{nome:<7} | indisponível: {r['erro']}")
+            continue
+        acuracia = (f"{r['eer']:>7.2%} | {r['limiar_eer']:>10.3f} | {r['no_limiar_padrao']['far']:>8.3%} | "
+                    f"{r['no_limiar_padrao']['frr']:>8.3%} ({r['limiar_padrao']})") if 'eer' in r else \
+            "sem pares genuínos/impostores"
+        print(f"{nome:<7} | {r['ms_por_rosto_individual']:>8.2f} | {r['ms_por_rosto_lote']:>7.2f} | {acuracia}")
+
+    salvar_resultado({
+        'benchmark': 'codificadores',
+        'ambiente': metadados_execucao(),
+        'parametros': {'pasta': args.pasta, 'lote': args.lote, 'repeticoes': args.repeticoes,
+                       'far_alvo': args.far_alvo},
+        'resultados': resultados,
+    }, args.saida)
+    return 0
+
+
+# --- PRECISÃO REDUZIDA DA GALERIA ---
+
+def carregar_chips_rotulados(pasta: str) -> Tuple[List[str], List[str], List[np.ndarray]]:
+    """
+    Chips alinhados de `pasta/<rótulo>/`: os gravados (rosto*.jpg) quando
+    existem, senão o de cada imagem com exatamente um rosto detectado.
+    Retorna (rótulos, caminhos das imagens, chips RGB).
+    """
+    rotulos, caminhos, chips = [], [], []
+    backend = criar_detector("hog")
+    for caminho_rotulo in sorted(glob.glob(os.path.join(pasta, "*"))):
+        if not os.path.isdir(caminho_rotulo):
+            continue
+        rotulo = os.path.basename(caminho_rotulo)
+
+        arquivos = listar_chips(caminho_rotulo)
+        if arquivos:
+            novos = [cv2.cvtColor(cv2.imread(c), cv2.COLOR_BGR2RGB) for c in arquivos]
+        else:
+            arquivos, novos = [], []
+            for caminho in sorted(glob.glob(os.path.join(caminho_rotulo, "*"))):
+                imagem = cv2.imread(caminho) if caminho.lower().endswith(EXTENSOES_IMAGEM) else None
+                if imagem is None:
+                    continue
+                caixas = detectar_rostos(imagem, backend)
+                if len(caixas) == 1:
+                    novos.extend(extrair_chips(cv2.cvtColor(imagem, cv2.COLOR_BGR2RGB), caixas))
+                    arquivos.append(caminho)
+
+        rotulos.extend([rotulo] * len(novos))
+        caminhos.extend(arquivos)
+        chips.extend(novos)
+
+    return rotulos, caminhos, chips
+
+
+def carregar_encodings_rotulados(pasta: str, codificador: Optional[CodificadorRostos] = None
+                                 ) -> Tuple[List[str], List[str], np.ndarray]:
+    """
+    Encodings rotulados de `pasta/<rótulo>/` (ver carregar_chips_rotulados),
+    no codificador informado ou no ativo.
+    Retorna (rótulos, caminhos das imagens, matriz N x 128).
+    """
+    rotulos, caminhos, chips = carregar_chips_rotulados(pasta)
+    encodings = codificar_chips(chips, codificador)
+    return rotulos, caminhos, np.asarray(encodings, dtype=np.float32).reshape(-1, 128)
+
+
+def conjunto_sintetico(identidades: int, amostras: int, ruido: float = 0.03) -> Tuple[List[str], np.ndarray]:
+    """Identidades sintéticas (centro + ruído) quando não há fotos rotuladas."""
+    gerador = np.random.default_rng(3)
+    centros = gerador.normal(0, 0.09, (identidades, 128))
+    encodings = centros[:, None, :] + gerador.normal(0, ruido, (identidades, amostras, 128))
+    rotulos = [str(i) for i in range(identidades) for _ in range(amostras)]
+    return rotulos, encodings.reshape(-1, 128).astype(np.float32)
+
+
+def dividir_galeria_sondas(rotulos: List[str], encodings: np.ndarray):
+    """Primeira amostra de cada rótulo vai para a galeria; as demais viram sondas."""
+    galeria, sondas, rotulos_sondas = {}, [], []
+    for rotulo, encoding in zip(rotulos, encodings):
+        if rotulo not in galeria:
+            galeria[rotulo] = encoding
+        else:
+            sondas.append(encoding)
+            rotulos_sondas.append(rotulo)
+    return galeria, np.asarray(sondas, dtype=np.float32).reshape(-1, 128), rotulos_sondas
+
+
+def benchmark_precisao(rotulos: List[str], encodings: np.ndarray, distratores: int, limiar: float,
+                       top_k: int, repeticoes: int) -> Dict:
+    """
+    Para cada precisão: acerto rank-1 (rótulo certo e dentro do limiar),
+    concordância com a busca float32, erro de distância, latência de uma
+    busca e memória da matriz varrida. Distratores sintéticos aumentam a
+    galeria sem mudar as sondas.
+    """
+    modelos, sondas, rotulos_sondas = dividir_galeria_sondas(rotulos, encodings)
+    gerador = np.random.default_rng(4)
+    extras = gerador.normal(0, 0.09, (distratores, 128))
+
+    galerias = {}
+    for precisao in PRECISOES:
+        galeria = Galeria(precisao=precisao, top_k=top_k)
+        for rotulo, encoding in modelos.items():
+            galeria.adicionar_usuario({'rotulo': rotulo}, encoding)
+        for i, encoding in enumerate(extras):
+            galeria.adicionar_usuario({'rotulo': f"_distrator_{i}"}, encoding)
+        galeria.preparar()
+        galerias[precisao] = galeria
+
+    referencia = galerias[PRECISAO_COMPLETA].buscar(sondas)
+    resultados = {}
+    for precisao, galeria in galerias.items():
+        matches = galeria.buscar(sondas)
+        acertos = sum(1 for (indice, distancia), rotulo in zip(matches, rotulos_sondas)
+                      if indice >= 0 and distancia <= limiar and galeria.usuarios[indice]['rotulo'] == rotulo)
+        iguais = sum(1 for (a, _), (b, _) in zip(matches, referencia) if a == b)
+        erros = [abs(d - dr) for (_, d), (_, dr) in zip(matches, referencia)]
+
+        latencias = []
+        for sonda in sondas[:max(1, min(len(sondas), 50))]:
+            _, tempos = cronometrar(galeria.buscar, sonda[None, :], repeticoes=repeticoes)
+            latencias.extend(tempos)
+
+        resultados[precisao] = {
+            'acerto_rank1': round(acertos / len(sondas), 4) if len(sondas) else None,
+            'concordancia_float32': round(iguais / len(sondas), 4) if len(sondas) else None,
+            'erro_distancia_max': round(float(max(erros)), 6) if erros else None,
+            'latencia_ms': resumo_latencias(latencias),
+            'bytes_varredura': galeria.bytes_varredura,
+        }
+    return resultados
+
+
+def comando_precisao(args) -> int:
+    if args.pasta:
+        rotulos, _, encodings = carregar_encodings_rotulados(args.pasta)
+        if len(set(rotulos)) == 0 or len(rotulos) == len(set(rotulos)):
+            print(f"❌ {args.pasta} precisa de ao menos um rótulo com 2+ rostos")
+            return 1
+    else:
+        rotulos, encodings = conjunto_sintetico(args.identidades, args.amostras)
+
+    print(f"📊 Precisão da galeria | {len(set(rotulos))} rótulo(s), {len(rotulos)} rosto(s) | "
+          f"{args.distratores} distrator(es) | top-k {args.top_k}")
+    resultados = benchmark_precisao(rotulos, encodings, args.distratores, args.limiar, args.top_k, args.repeticoes)
+
+    print(f"\n{'Precisão':<8} | {'rank-1':>7} | {'= float32':>9} | {'erro máx':>9} | {'p50 ms':>7} | {'MB':>7}")
+    print("-" * 62)
+    for precisao, r in resultados.items():
+        print(f"{precisao:<8} | {r['acerto_rank1']:>7.2%} | {r['concordancia_float32']:>9.2%} | "
+              f"{r['erro_distancia_max']:>9.5f} | {r['latencia_ms']['p50']:>7.2f} | {r['bytes_varredura'] / 1e6:>7.2f}")
+
+    salvar_resultado({
+        'benchmark': 'precisao_galeria',
+        'ambiente': metadados_execucao(),
+        'parametros': {'pasta': args.pasta, 'identidades': args.identidades, 'amostras': args.amostras,
+                       'distratores': args.distratores, 'limiar': args.limiar, 'top_k': args.top_k,
+                       'repeticoes': args.repeticoes},
+        'resultados': resultados,
+    }, args.saida)
+    return 0
+
+
+# --- INICIALIZAÇÃO DA GALERIA ---
+
+def criar_banco_sintetico(db_file: str, usuarios: int, templates_por_usuario: int) -> None:
+    """Banco com `usuarios` pessoas sintéticas (mesmo esquema de usuarios/templates)."""
+    gerador = np.random.default_rng(2)
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    cursor.execute('CREATE TABLE usuarios (id INTEGER PRIMARY KEY, nome TEXT, equipe TEXT, cpf TEXT, foto_path TEXT)')
+    cursor.execute('CREATE TABLE templates (id INTEGER PRIMARY KEY, usuario_id INTEGER, encoding BLOB, origem TEXT)')
+    criar_versionamento(cursor)
+    cursor.executemany('INSERT INTO usuarios VALUES (?, ?, ?, ?, ?)',
+                       [(i, f"Pessoa {i}", "Bench", str(i), "") for i in range(1, usuarios + 1)])
+    cursor.executemany('INSERT INTO templates (usuario_id, encoding, origem) VALUES (?, ?, ?)',
+                       [(i, encoding_para_blob(gerador.normal(0, 0.1, 128)), "cadastro")
+                        for i in range(1, usuarios + 1) for _ in range(templates_por_usuario)])
+    conn.commit()
+    conn.close()
+
+
+def galeria_dos_blobs(db_file: str) -> Galeria:
+    """Caminho antigo: desserializa os blobs linha a linha e monta a galeria."""
+    conn = sqlite3.connect(db_file)
+    usuarios = {uid: {'id': uid, 'nome': nome, 'equipe': equipe, 'cpf': cpf}
+                for uid, nome, equipe, cpf in conn.execute('SELECT id, nome, equipe, cpf FROM usuarios')}
+    templates = {}
+    for uid, blob in conn.execute('SELECT usuario_id, encoding FROM templates ORDER BY usuario_id, id'):
+        templates.setdefault(uid, []).append(blob_para_encoding(blob))
+    conn.close()
+
+    galeria = Galeria()
+    for uid, encodings in templates.items():
+        galeria.adicionar_usuario(usuarios[uid], encodings)
+    galeria.preparar()
+    return galeria
+
+
+def benchmark_inicializacao(tamanhos: List[int], templates_por_usuario: int, repeticoes: int) -> Dict:
+    """Tempo até a primeira busca: blobs do SQLite x arquivo mapeado, por tamanho de galeria."""
+    sonda = np.zeros((1, 128), dtype=np.float32)
+    resultados = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        for tamanho in tamanhos:
+            db_file = os.path.join(pasta, f"bench_{tamanho}.db")
+            arquivo = os.path.join(pasta, f"galeria_{tamanho}.bin")
+            criar_banco_sintetico(db_file, tamanho, templates_por_usuario)
+            salvar_galeria_mapeada(galeria_dos_blobs(db_file), versao_banco(db_file), arquivo)
+
+            _, tempos_blobs = cronometrar(lambda: galeria_dos_blobs(db_file).buscar(sonda), repeticoes=repeticoes)
+            _, tempos_mapa = cronometrar(
+                lambda: abrir_galeria_mapeada(arquivo, db_file, Galeria().modo).buscar(sonda), repeticoes=repeticoes)
+
+            resultados[str(tamanho)] = {
+                'blobs_ms': resumo_latencias(tempos_blobs),
+                'mapeada_ms': resumo_latencias(tempos_mapa),
+                'arquivo_bytes': os.path.getsize(arquivo),
+            }
+    return resultados
+
+
+def comando_galeria(args) -> int:
+    print(f"📊 Inicialização da galeria | tamanhos {args.tamanhos} | {args.templates} template(s)/usuário")
+    resultados = benchmark_inicializacao(args.tamanhos, args.templates, args.repeticoes)
+
+    print(f"\n{'Usuários':>9} | {'blobs p50 (ms)':>15} | {'mapeada p50 (ms)':>17} | {'arquivo (MB)':>12}")
+    print("-" * 63)
+    for tamanho, r in resultados.items():
+        print(f"{tamanho:>9} | {r['blobs_ms']['p50']:>15.2f} | {r['mapeada_ms']['p50']:>17.2f} | "
+              f"{r['arquivo_bytes'] / 1e6:>12.2f}")
+
+    salvar_resultado({
+        'benchmark': 'inicializacao_galeria',
+        'ambiente': metadados_execucao(),
+        'parametros': {'tamanhos': args.tamanhos, 'templates': args.templates, 'repeticoes': args.repeticoes},
+        'resultados': resultados,
+    }, args.saida)
+    return 0
+
+
+# --- PIPELINE COMPLETO ---
+
+def frames_video(caminho: str) -> Tuple[Iterator[np.ndarray], float]:
+    """Frames de um vídeo gravado e o FPS declarado no arquivo."""
+    cap = cv2.VideoCapture(caminho)
+    if not cap.isOpened():
+        raise OSError(f"Não foi possível abrir {caminho}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    def gerar():
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield frame
+        finally:
+            cap.release()
+    return gerar(), fps
+
+
+def frames_sinteticos(total: int, largura: int, altura: int, rostos: List[np.ndarray],
+                      fps: float = 30.0) -> Tuple[Iterator[np.ndarray], float]:
+    """
+    Vídeo sintético: cada pessoa (foto recortada) atravessa o quadro durante
+    dois segundos, seguida de um segundo de catraca vazia.
+    """
+    fundo = np.tile(np.linspace(60, 160, largura, dtype=np.uint8)[None, :, None], (altura, 1, 3))
+    por_passagem = int(fps * 3)
+
+    def gerar():
+        for i in range(total):
+            frame = fundo.copy()
+            passagem, fase = divmod(i, por_passagem)
+            if rostos and fase < fps * 2:
+                rosto = rostos[passagem % len(rostos)]
+                h, w = rosto.shape[:2]
+                x = int((largura - w) * fase / (fps * 2))
+                y = (altura - h) // 2
+                frame[y:y + h, x:x + w] = rosto
+            yield frame
+    return gerar(), fps
+
+
+def recortes_de_rosto(pasta: str, altura_rosto: int = 240) -> List[np.ndarray]:
+    """Fotos dos cadastros recortadas em volta do rosto (landmarks.json) para o vídeo sintético."""
+    recortes = []
+    for caminho_foto in sorted(glob.glob(os.path.join(pasta, "*", "foto.jpg"))):
+        foto = cv2.imread(caminho_foto)
+        if foto is None:
+            continue
+        caminho_landmarks = os.path.join(os.path.dirname(caminho_foto), LANDMARKS_ARQUIVO)
+        if os.path.exists(caminho_landmarks):
+            with open(caminho_landmarks, 'r', encoding='utf-8') as f:
+                top, right, bottom, left = json.load(f)['face_location']
+            margem = (bottom - top) // 2
+            foto = foto[max(0, top - margem):bottom + margem, max(0, left - margem):right + margem]
+        escala = altura_rosto / foto.shape[0]
+        recortes.append(cv2.resize(foto, None, fx=escala, fy=escala))
+    return recortes
+
+
+def benchmark_pipeline(frames: Iterator[np.ndarray], fps_video: float, galeria: Galeria,
+                       intervalo: float, cooldown: float, desenhar: bool) -> Dict:
+    """
+    Passa cada frame pelas mesmas etapas de `iniciar_camera_continua`
+    (detecção na ROI, encoding em lote, busca na galeria, registro no banco
+    e desenho da interface), sem câmera nem janela. O intervalo e o cooldown
+    contam no tempo do vídeo, então o resultado não depende da máquina.
+    """
+    import catraca_virtual
+    from catraca_virtual import (draw_recognition_interface, determinar_tipo_acesso_db, registrar_acesso_db,
+                                 FACE_MATCH_THRESHOLD, ROI_CATRACA, ESCALAS_BUSCA, REFINAR_DETECCAO,
+                                 DETECTOR_BACKEND)
+    from deteccao import DetectorAdaptativo
+
+    detector = DetectorAdaptativo(ROI_CATRACA, ESCALAS_BUSCA, REFINAR_DETECCAO, criar_detector(DETECTOR_BACKEND))
+    etapas = {nome: [] for nome in ('deteccao', 'encoding', 'busca', 'registro', 'desenho', 'frame')}
+    ultima_passagem: Dict[str, float] = {}
+    contagem = {'frames': 0, 'processados': 0, 'rostos': 0, 'reconhecidos': 0, 'registros': 0}
+
+    recursos_inicio = uso_recursos()
+    inicio = time.perf_counter()
+    ultimo_processamento = -intervalo
+    for indice, frame in enumerate(frames):
+        contagem['frames'] += 1
+        agora = indice / fps_video
+        if agora - ultimo_processamento < intervalo:
+            continue
+        ultimo_processamento = agora
+        contagem['processados'] += 1
+        inicio_frame = time.perf_counter()
+
+        face_locations, tempos = cronometrar(detector.detectar, frame)
+        etapas['deteccao'].extend(tempos)
+        nomes, distancias = [], []
+        if face_locations:
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            encodings, tempos = cronometrar(codificar_rostos, rgb_frame, face_locations)
+            etapas['encoding'].extend(tempos)
+            matches, tempos = cronometrar(galeria.buscar, encodings)
+            etapas['busca'].extend(tempos)
+            contagem['rostos'] += len(face_locations)
+
+            for indice_usuario, distancia in matches:
+                distancias.append(distancia)
+                if indice_usuario < 0 or distancia > FACE_MATCH_THRESHOLD:
+                    nomes.append("Desconhecido")
+                    continue
+                dados_usuario = galeria.usuarios[indice_usuario]
+                nomes.append(dados_usuario['nome'])
+                contagem['reconhecidos'] += 1
+                if agora - ultima_passagem.get(dados_usuario['cpf'], -cooldown) > cooldown:
+                    ultima_passagem[dados_usuario['cpf']] = agora
+                    inicio_registro = time.perf_counter()
+                    registrar_acesso_db(dados_usuario, "Identificado", determinar_tipo_acesso_db(dados_usuario['cpf']))
+                    etapas['registro'].append((time.perf_counter() - inicio_registro) * 1000.0)
+                    contagem['registros'] += 1
+
+        if desenhar:
+            _, tempos = cronometrar(draw_recognition_interface, frame, face_locations, nomes, distancias,
+                                    None, len(galeria))
+            etapas['desenho'].extend(tempos)
+        etapas['frame'].append((time.perf_counter() - inicio_frame) * 1000.0)
+
+    duracao = time.perf_counter() - inicio
+    recursos_fim = uso_recursos()
+    resultado = {
+        'contagem': contagem,
+        'duracao_s': round(duracao, 3),
+        'fps_lidos': round(contagem['frames'] / duracao, 2) if duracao else None,
+        'fps_processados': round(contagem['processados'] / duracao, 2) if duracao else None,
+        'latencia_ms': {nome: resumo_latencias(tempos) for nome, tempos in etapas.items()},
+        'banco': catraca_virtual.DB_FILE,
+    }
+    if recursos_fim:
+        resultado['cpu_percentual'] = round(100.0 * (recursos_fim['cpu_s'] - recursos_inicio['cpu_s']) / duracao, 1)
+        resultado['pico_rss_mb'] = recursos_fim['pico_rss_mb']
+    return resultado
+
+
+def comando_pipeline(args) -> int:
+    import catraca_virtual
+
+    if args.video:
+        frames, fps = frames_video(args.video)
+        origem = args.video
+    else:
+        recortes = recortes_de_rosto(args.pasta)
+        frames, fps = frames_sinteticos(args.frames, args.largura, args.altura, recortes)
+        origem = f"sintético ({len(recortes)} rosto(s))"
+
+    # Galeria: cadastros da pasta + distratores sintéticos
+    rotulos, _, encodings = carregar_encodings_rotulados(args.pasta)
+    galeria = Galeria()
+    for rotulo, encoding in zip(rotulos, encodings):
+        galeria.adicionar_usuario({'id': None, 'nome': rotulo, 'equipe': 'Bench', 'cpf': rotulo}, encoding)
+    gerador = np.random.default_rng(5)
+    for i, encoding in enumerate(gerador.normal(0, 0.09, (args.galeria, 128))):
+        galeria.adicionar_usuario({'id': None, 'nome': f"Distrator {i}", 'equipe': 'Bench', 'cpf': f"d{i}"}, encoding)
+    galeria.preparar()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        # Acessos vão para um banco descartável, nunca para o da catraca
+        catraca_virtual.DB_FILE = os.path.join(pasta, "bench.db")
+        catraca_virtual.setup_database()
+        print(f"📊 Pipeline | {origem} | galeria {len(galeria)} | intervalo {args.intervalo}s")
+        resultado = benchmark_pipeline(frames, fps, galeria, args.intervalo, args.cooldown, not args.sem_desenho)
+    resultado.pop('banco')
+
+    print(f"\n{resultado['contagem']['frames']} frame(s), {resultado['contagem']['processados']} processado(s) "
+          f"em {resultado['duracao_s']} s | {resultado['fps_processados']} FPS processados")
+    if 'cpu_percentual' in resultado:
+        print(f"CPU {resultado['cpu_percentual']}% | pico de RSS {resultado['pico_rss_mb']} MB")
+    print(f"\n{'Etapa':<9} | {'n':>6} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8}")
+    print("-" * 50)
+    for etapa, lat in resultado['latencia_ms'].items():
+        if lat['n']:
+            print(f"{etapa:<9} | {lat['n']:>6} | {lat['p50']:>8.2f} | {lat['p95']:>8.2f} | {lat['p99']:>8.2f}")
+
+    salvar_resultado({
+        'benchmark': 'pipeline',
+        'ambiente': metadados_execucao(),
+        'parametros': {'video': args.video, 'frames': args.frames, 'resolucao': [args.largura, args.altura],
+                       'galeria': len(galeria), 'intervalo': args.intervalo, 'cooldown': args.cooldown,
+                       'desenho': not args.sem_desenho},
+        'resultados': resultado,
+    }, args.saida)
+    return 0
+
+
+def desenho_legado(frame, face_locations, nomes, total_cadastrados: int) -> None:
+    """Desenho da interface como era antes do Renderizador (cópia do frame inteiro por frame)."""
+    from catraca_virtual import draw_face_landmarks
+
+    copia_global = frame.copy()  # `current_frame = frame.copy()` do laço, que ninguém lia
+    for (top, right, bottom, left), nome in zip(face_locations, nomes):
+        draw_face_landmarks(frame, (top, right, bottom, left), (0, 255, 0), 3)
+        cv2.putText(frame, nome, (left + 6, top - 15), cv2.FONT_HERSHEY_DUPLEX, 0.8, (0, 255, 0), 2)
+        cv2.putText(frame, "IDENTIFICADO", (left + 6, bottom + 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    overlay = frame.copy()
+    cv2.rectangle(overlay, (0, 0), (frame.shape[1], 80), (0, 0, 0), -1)
+    cv2.addWeighted(overlay, 0.4, frame, 0.6, 0, frame)
+    cv2.putText(frame, "SISTEMA DE IDENTIFICACAO - CATRACA", (20, 30), cv2.FONT_HERSHEY_DUPLEX, 0.8, (255, 255, 255), 2)
+    cv2.putText(frame, f"Pessoas cadastradas: {total_cadastrados} | Rostos detectados: {len(face_locations)}",
+                (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    del copia_global
+
+
+def benchmark_interface(largura: int, altura: int, rostos: int, repeticoes: int) -> Dict:
+    """
+    Desenho legado x Renderizador sobre o mesmo frame: latência por frame,
+    bytes alocados (pico transitório visto pelo tracemalloc, que enxerga os
+    buffers do numpy) e quantos pixels saem diferentes.
+    """
+    import tracemalloc
+    from catraca_virtual import draw_face_landmarks
+    from renderizacao import Renderizador
+
+    renderizador = Renderizador()
+
+    def desenho_novo(frame, face_locations, nomes, total_cadastrados):
+        for (top, right, bottom, left), nome in zip(face_locations, nomes):
+            draw_face_landmarks(frame, (top, right, bottom, left), (0, 255, 0), 3)
+            renderizador.texto(frame, nome, (left + 6, top - 15), cv2.FONT_HERSHEY_DUPLEX, 0.8, (0, 255, 0), 2)
+            renderizador.texto(frame, "IDENTIFICADO", (left + 6, bottom + 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7,
+                               (0, 255, 0), 2)
+        renderizador.cabecalho(frame, "SISTEMA DE IDENTIFICACAO - CATRACA",
+                               f"Pessoas cadastradas: {total_cadastrados} | Rostos detectados: {len(face_locations)}")
+
+    gerador = np.random.default_rng(7)
+    base = cv2.GaussianBlur(gerador.integers(0, 256, (altura, largura, 3), dtype=np.uint8), (15, 15), 0)
+    passo = largura // (rostos + 1)
+    face_locations = [(altura // 3, passo * (i + 1) + 90, altura // 3 + 200, passo * (i + 1) - 90)
+                      for i in range(rostos)]
+    nomes = [f"Pessoa {i + 1}" for i in range(rostos)]
+    frame = np.empty_like(base)
+
+    resultados, saidas = {}, {}
+    for nome, desenhar in (('legado', desenho_legado), ('renderizador', desenho_novo)):
+        tempos = []
+        for _ in range(repeticoes):
+            np.copyto(frame, base)
+            inicio = time.perf_counter()
+            desenhar(frame, face_locations, nomes, 1000)
+            tempos.append((time.perf_counter() - inicio) * 1000.0)
+        saidas[nome] = frame.copy()
+
+        tracemalloc.start()
+        picos = []
+        for _ in range(min(repeticoes, 50)):
+            np.copyto(frame, base)
+            atual, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            desenhar(frame, face_locations, nomes, 1000)
+            picos.append(tracemalloc.get_traced_memory()[1] - atual)
+        tracemalloc.stop()
+
+        resultados[nome] = {'latencia_ms': resumo_latencias(tempos),
+                            'bytes_alocados_por_frame': int(np.median(picos))}
+
+    legado, novo = resultados['legado'], resultados['renderizador']
+    return {
+        'resultados': resultados,
+        'economia_ms_p50': round(legado['latencia_ms']['p50'] - novo['latencia_ms']['p50'], 4),
+        'economia_bytes_por_frame': legado['bytes_alocados_por_frame'] - novo['bytes_alocados_por_frame'],
+        'pixels_diferentes': int(np.count_nonzero(np.any(saidas['legado'] != saidas['renderizador'], axis=2))),
+    }
+
+
+def comando_interface(args) -> int:
+    print(f"🎨 Interface | {args.largura}x{args.altura} | {args.rostos} rosto(s) | {args.repeticoes} repetições")
+    resultado = benchmark_interface(args.largura, args.altura, args.rostos, args.repeticoes)
+
+    print(f"\n{'Desenho':<13} | {'p50 ms':>8} | {'p95 ms':>8} | {'KB alocados/frame':>17}")
+    print("-" * 56)
+    for nome, r in resultado['resultados'].items():
+        print(f"{nome:<13} | {r['latencia_ms']['p50']:>8.3f} | {r['latencia_ms']['p95']:>8.3f} | "
+              f"{r['bytes_alocados_por_frame'] / 1024:>17.1f}")
+    print(f"\nEconomia por frame: {resultado['economia_ms_p50']:.3f} ms (p50), "
+          f"{resultado['economia_bytes_por_frame'] / 1024:.0f} KB | pixels diferentes: {resultado['pixels_diferentes']}")
+
+    salvar_resultado({
+        'benchmark': 'interface',
+        'ambiente': metadados_execucao(),
+        'parametros': {'resolucao': [args.largura, args.altura], 'rostos': args.rostos,
+                       'repeticoes': args.repeticoes},
+        'resultados': resultado,
+    }, args.saida)
+    return 0
+
+
+def medir_latencia_tela(cap: cv2.VideoCapture, ciclos: int, janela: str = "Latencia da camera") -> Dict:
+    """
+    Latência tela -> frame: com a câmera apontada para a janela, alterna a
+    janela entre preto e branco e mede quanto tempo o brilho do frame leva
+    para cruzar o meio do caminho. Inclui o atraso do monitor, então é um
+    limite superior da latência real da câmera (glass-to-frame).
+    """
+    tela = np.zeros((600, 800, 3), np.uint8)
+
+    def brilho() -> Optional[float]:
+        ret, frame = cap.read()
+        cv2.waitKey(1)
+        return float(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY).mean()) if ret else None
+
+    def mostrar(valor: int, segundos: float) -> float:
+        tela[:] = valor
+        cv2.imshow(janela, tela)
+        fim = time.perf_counter() + segundos
+        niveis = []
+        while time.perf_counter() < fim:
+            nivel = brilho()
+            if nivel is not None:
+                niveis.append(nivel)
+        return float(np.median(niveis[-5:])) if niveis else 0.0
+
+    escuro = mostrar(0, 1.5)
+    claro = mostrar(255, 1.5)
+    if claro - escuro < 20:
+        cv2.destroyWindow(janela)
+        raise RuntimeError("A câmera não enxerga a janela piscando (aponte-a para a tela)")
+    limiar = (claro + escuro) / 2
+
+    latencias, valor = [], 255
+    for _ in range(ciclos):
+        valor = 0 if valor == 255 else 255
+        tela[:] = valor
+        cv2.imshow(janela, tela)
+        cv2.waitKey(1)
+        inicio = time.perf_counter()
+        while time.perf_counter() - inicio < 2.0:
+            nivel = brilho()
+            if nivel is not None and (nivel > limiar) == (valor == 255):
+                latencias.append((time.perf_counter() - inicio) * 1000.0)
+                break
+        mostrar(valor, 0.4)  # Estabiliza antes da próxima troca
+
+    cv2.destroyWindow(janela)
+    return {'niveis': {'escuro': round(escuro, 1), 'claro': round(claro, 1)},
+            'latencia_ms': resumo_latencias(latencias), 'sem_resposta': ciclos - len(latencias)}
+
+
+def comando_camera(args) -> int:
+    from camera import normalizar_fonte, fonte_e_camera, negociar_formato, sondar_captura
+
+    fonte = normalizar_fonte(args.fonte)
+    cap = cv2.VideoCapture(fonte)
+    if not cap.isOpened():
+        print(f"❌ Não foi possível abrir {args.fonte}")
+        return 1
+
+    resultado: Dict = {'fonte': args.fonte}
+    try:
+        if fonte_e_camera(fonte):
+            resultado['negociado'] = negociar_formato(cap, args.largura, args.altura, args.fps,
+                                                      None if args.fourcc == '-' else args.fourcc, args.buffer)
+            negociado = resultado['negociado']
+            print(f"📷 Pedido {args.largura}x{args.altura} {args.fourcc} {args.fps} fps | driver: "
+                  f"{negociado['largura']}x{negociado['altura']} {negociado['fourcc']} "
+                  f"{negociado['fps_declarado']} fps, buffer {negociado['buffer']}")
+        else:
+            print("📼 Fonte não é webcam: sem negociação (o FPS medido é o de leitura do arquivo/stream)")
+
+        resultado['sondagem'] = sondar_captura(cap, args.frames)
+        sondagem = resultado['sondagem']
+        print(f"⏱️ {sondagem['frames']} frame(s) {sondagem['resolucao']} | FPS real {sondagem['fps_real']} | "
+              f"intervalo p95 {sondagem['intervalo_p95_ms']} ms")
+        if 'idade_frame_ms' in sondagem:
+            print(f"   Idade do frame ao chegar (carimbo do driver): p50 {sondagem['idade_frame_ms']['p50']} ms")
+
+        if args.piscar:
+            resultado['tela_para_frame'] = medir_latencia_tela(cap, args.piscar)
+            lat = resultado['tela_para_frame']['latencia_ms']
+            print(f"💡 Tela -> frame: p50 {lat['p50']:.1f} ms | p95 {lat['p95']:.1f} ms "
+                  f"({resultado['tela_para_frame']['sem_resposta']} sem resposta)")
+    finally:
+        cap.release()
+
+    salvar_resultado({
+        'benchmark': 'camera',
+        'ambiente': metadados_execucao(),
+        'parametros': {'fonte': args.fonte, 'resolucao': [args.largura, args.altura], 'fps': args.fps,
+                       'fourcc': args.fourcc, 'buffer': args.buffer, 'frames': args.frames, 'piscar': args.piscar},
+        'resultados': resultado,
+    }, args.saida)
+    return 0
+
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmarks da Catraca Virtual")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('detectores', help="Latência e recall (ou concordância com o cadastro) dos backends de detecção")
+    p.add_argument('--pasta', default=USUARIOS_DIR, help="Pasta com imagens (padrão: usuarios/)")
+    p.add_argument('--caixas', help="JSON com caixas anotadas à mão por imagem (relativas a --pasta); "
+                                    "sem ele, compara com a caixa do cadastro")
+    p.add_argument('--detectores', nargs='+', default=list(DETECTORES), choices=list(DETECTORES))
+    p.add_argument('--escala', type=float, default=0.5)
+    p.add_argument('--upsample', type=int, default=0)
+    p.add_argument('--repeticoes', type=int, default=3)
+    p.add_argument('--saida', help="Arquivo JSON de saída")
+    p.set_defaults(funcao=comando_detectores)
+
+    p = sub.add_parser('encoding', help="Vazão do encoding + busca por tamanho de lote")
+    p.add_argument('--pasta', default=USUARIOS_DIR, help="Pasta com os chips dos usuários")
+    p.add_argument('--lotes', nargs='+', type=int, default=[1, 2, 4, 8, 16, 32])
+    p.add_argument('--galeria', type=int, default=1000, help="Nº de usuários sintéticos na galeria")
+    p.add_argument('--repeticoes', type=int, default=5)
+    p.add_argument('--saida', help="Arquivo JSON de saída")
+    p.set_defaults(funcao=comando_encoding)
+
+    p = sub.add_parser('codificadores', help="Velocidade x acurácia dos backends de encoding (dlib, SFace)")
+    p.add_argument('--pasta', default=USUARIOS_DIR, help="Pasta rotulada (uma subpasta por pessoa)")
+    p.add_argument('--codificadores', nargs='+', default=list(CODIFICADORES), choices=list(CODIFICADORES))
+    p.add_argument('--lote', type=int, default=16, help="Rostos por chamada na medição de velocidade")
+    p.add_argument('--repeticoes', type=int, default=5)
+    p.add_argument('--far-alvo', type=float, default=0.001)
+    p.add_argument('--saida', help="Arquivo JSON de saída")
+    p.set_defaults(funcao=comando_codificadores)
+
+    p = sub.add_parser('galeria', help="Inicialização da galeria: blobs do SQLite x arquivo mapeado")
+    p.add_argument('--tamanhos', nargs='+', type=int, default=[100, 1000, 10000, 100000])
+    p.add_argument('--templates', type=int, default=1, help="Templates por usuário")
+    p.add_argument('--repeticoes', type=int, default=3)
+    p.add_argument('--saida', help="Arquivo JSON de saída")
+    p.set_defaults(funcao=comando_galeria)
+
+    p = sub.add_parser('precisao', help="Acurácia x velocidade da galeria float32/float16/int8")
+    p.add_argument('--pasta', help="Pasta rotulada (uma subpasta por pessoa); sem ela, dados sintéticos")
+    p.add_argument('--identidades', type=int, default=1000, help="Identidades sintéticas")
+    p.add_argument('--amostras', type=int, default=3, help="Rostos por identidade sintética")
+    p.add_argument('--distratores', type=int, default=50000, help="Usuários extras na galeria")
+    p.add_argument('--limiar', type=float, default=0.6)
+    p.add_argument('--top-k', type=int, default=TOP_K_REORDENAR)
+    p.add_argument('--repeticoes', type=int, default=3)
+    p.add_argument('--saida', help="Arquivo JSON de saída")
+    p.set_defaults(funcao=comando_precisao)
+
+    p = sub.add_parser('pipeline', help="Pipeline completo da catraca sobre vídeo gravado ou sintético")
+    p.add_argument('--video', help="Vídeo gravado; sem ele, vídeo sintético com as fotos da pasta")
+    p.add_argument('--pasta', default=USUARIOS_DIR, help="Cadastros usados na galeria e no vídeo sintético")
+    p.add_argument('--frames', type=int, default=300, help="Frames do vídeo sintético")
+    p.add_argument('--largura', type=int, default=1280)
+    p.add_argument('--altura', type=int, default=720)
+    p.add_argument('--galeria', type=int, default=1000, help="Distratores sintéticos na galeria")
+    p.add_argument('--intervalo', type=float, default=0.0,
+                   help="Segundos (tempo do vídeo) entre frames processados; 0 processa todos")
+    p.add_argument('--cooldown', type=float, default=3.0, help="Segundos entre registros da mesma pessoa")
+    p.add_argument('--sem-desenho', action='store_true', help="Não mede o desenho da interface")
+    p.add_argument('--saida', help="Arquivo JSON de saída")
+    p.set_defaults(funcao=comando_pipeline)
+
+    p = sub.add_parser('interface', help="Desenho da interface: cópias do frame x Renderizador")
+    p.add_argument('--largura', type=int, default=1280)
+    p.add_argument('--altura', type=int, default=720)
+    p.add_argument('--rostos', type=int, default=1)
+    p.add_argument('--repeticoes', type=int, default=500)
+    p.add_argument('--saida', help="Arquivo JSON de saída")
+    p.set_defaults(funcao=comando_interface)
+
+    p = sub.add_parser('camera', help="Negociação com o driver, FPS real e latência da câmera")
+    p.add_argument('--fonte', default='0', help="Índice, /dev/videoN (v4l2loopback), arquivo ou URL")
+    p.add_argument('--largura', type=int, default=1280)
+    p.add_argument('--altura', type=int, default=720)
+    p.add_argument('--fps', type=float, default=30.0)
+    p.add_argument('--fourcc', default='MJPG', help="Formato pedido ao driver ('-' mantém o atual)")
+    p.add_argument('--buffer', type=int, default=1, help="CAP_PROP_BUFFERSIZE pedido")
+    p.add_argument('--frames', type=int, default=120, help="Frames lidos na sondagem")
+    p.add_argument('--piscar', type=int, default=0, metavar='CICLOS',
+                   help="Mede tela -> frame com a câmera apontada para uma janela piscando")
+    p.add_argument('--saida', help="Arquivo JSON de saída")
+    p.set_defaults(funcao=comando_camera)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = criar_parser().parse_args(argv)
+    return args.funcao(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
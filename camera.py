@@ -0,0 +1,342 @@
+# camera.py
+# Abertura de fontes de vídeo: webcam (índice), arquivo de vídeo ou URL (RTSP/HTTP),
+# e supervisão da captura (reconexão com backoff, descarte de frames velhos)
+
+import time
+import logging
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Union
+
+from metricas import ETAPAS_CATRACA, FRAMES_CATRACA, CAMERA_ATIVA, RECONEXOES_CAMERA
+from eventos import obter_logger, evento, evento_amostrado
+
+LARGURA_PADRAO = 1280
+ALTURA_PADRAO = 720
+INDICES_PROBE = 3  # Índices testados quando nenhuma fonte é informada
+
+# --- NEGOCIAÇÃO COM O DRIVER (webcams) ---
+FOURCC_PREFERIDO = "MJPG"       # Comprimido: 720p a 30 fps cabe no USB 2.0 (YUYV costuma cair p/ ~5-10 fps)
+FPS_DESEJADO = 30.0
+TAMANHO_BUFFER = 1              # Frames guardados pelo driver (menos buffer = frame mais novo)
+FRAMES_SONDAGEM = 30            # Frames lidos para medir o FPS real após abrir
+TOLERANCIA_FPS = 0.8            # Abaixo de 80% do FPS pedido, avisa no log
+
+# --- SUPERVISÃO DA CAPTURA ---
+FALHAS_PARA_RECONECTAR = 5      # Leituras falhas seguidas até reabrir a fonte
+ESPERA_FALHA = 0.05             # segundos de pausa após uma leitura falha (sem busy spin)
+ESPERA_RECONEXAO_MAX = 0.1      # Máximo que uma leitura espera durante o backoff (o laço segue responsivo)
+BACKOFF_INICIAL = 0.5           # segundos até a primeira nova tentativa de abrir a fonte
+BACKOFF_MAXIMO = 30.0
+MAX_DESCARTE = 4                # Frames velhos descartados do buffer do driver por leitura
+FPS_PRESUMIDO = 30.0            # Quando o driver não informa o FPS
+
+# Estados da câmera supervisionada
+ATIVA = "ativa"                 # Entregando frames
+INSTAVEL = "instavel"           # Falhas recentes, ainda sem reabrir
+RECONECTANDO = "reconectando"   # Fonte fechada, reabrindo com backoff exponencial
+ENCERRADA = "encerrada"         # Fim de arquivo de vídeo ou liberada
+
+log = obter_logger("camera")
+
+
+def normalizar_fonte(fonte: Union[int, str, None]) -> Union[int, str, None]:
+    """Converte '0', '1'... em índice de câmera; mantém caminhos e URLs."""
+    if isinstance(fonte, str) and fonte.strip().isdigit():
+        return int(fonte.strip())
+    return fonte
+
+
+def fonte_e_arquivo(fonte: Union[int, str, None]) -> bool:
+    """True para arquivos de vídeo locais (terminam em vez de falhar temporariamente)."""
+    fonte = normalizar_fonte(fonte)
+    return isinstance(fonte, str) and '://' not in fonte and not fonte.startswith('/dev/')
+
+
+def fonte_e_camera(fonte: Union[int, str, None]) -> bool:
+    """Webcam local: índice ou dispositivo /dev/videoN (inclusive v4l2loopback)."""
+    fonte = normalizar_fonte(fonte)
+    return isinstance(fonte, int) or (isinstance(fonte, str) and fonte.startswith('/dev/'))
+
+
+def fourcc_texto(valor: float) -> str:
+    """CAP_PROP_FOURCC (número) como texto, ex.: 'MJPG'."""
+    codigo = int(valor)
+    if codigo <= 0:
+        return "?"
+    return "".join(chr((codigo >> (8 * i)) & 0xFF) for i in range(4)).strip("\0") or "?"
+
+
+def negociar_formato(cap: cv2.VideoCapture, largura: int = LARGURA_PADRAO, altura: int = ALTURA_PADRAO,
+                     fps: float = FPS_DESEJADO, fourcc: Optional[str] = FOURCC_PREFERIDO,
+                     tamanho_buffer: int = TAMANHO_BUFFER) -> Dict:
+    """
+    Pede formato, resolução, FPS e buffer mínimo ao driver e devolve o que
+    ele de fato aceitou. A ordem importa no V4L2: o FOURCC vem antes da
+    resolução, senão o driver escolhe a resolução no formato atual (YUYV).
+    """
+    if fourcc:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, largura)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, altura)
+    if fps:
+        cap.set(cv2.CAP_PROP_FPS, fps)
+    buffer_aceito = cap.set(cv2.CAP_PROP_BUFFERSIZE, tamanho_buffer)
+
+    return {
+        'pedido': {'largura': largura, 'altura': altura, 'fps': fps, 'fourcc': fourcc, 'buffer': tamanho_buffer},
+        'largura': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        'altura': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        'fps_declarado': round(cap.get(cv2.CAP_PROP_FPS), 2),
+        'fourcc': fourcc_texto(cap.get(cv2.CAP_PROP_FOURCC)),
+        'buffer': int(cap.get(cv2.CAP_PROP_BUFFERSIZE)) if buffer_aceito else None,
+    }
+
+
+def sondar_captura(cap: cv2.VideoCapture, frames: int = FRAMES_SONDAGEM) -> Dict:
+    """
+    Lê alguns frames seguidos e mede o que a fonte entrega de verdade:
+    resolução, FPS real (mediana dos intervalos) e, quando o backend
+    informa o instante de captura do buffer (V4L2: CAP_PROP_POS_MSEC no
+    relógio monotônico), a idade do frame ao chegar no programa.
+    """
+    instantes: List[float] = []
+    idades_ms: List[float] = []
+    forma = None
+    for _ in range(frames):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        agora = time.monotonic()
+        instantes.append(agora)
+        forma = frame.shape
+        carimbo_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+        idade = agora * 1000.0 - carimbo_ms
+        if 0 <= idade < 10_000:  # Só quando o carimbo está no mesmo relógio (webcam V4L2)
+            idades_ms.append(idade)
+
+    intervalos = np.diff(instantes) if len(instantes) > 1 else np.array([])
+    resultado = {
+        'frames': len(instantes),
+        'resolucao': [forma[1], forma[0]] if forma else None,
+        'fps_real': round(1.0 / float(np.median(intervalos)), 2) if intervalos.size and np.median(intervalos) > 0 else None,
+        'intervalo_p95_ms': round(float(np.percentile(intervalos, 95)) * 1000.0, 2) if intervalos.size else None,
+    }
+    if idades_ms:
+        resultado['idade_frame_ms'] = {'p50': round(float(np.median(idades_ms)), 2),
+                                       'max': round(float(np.max(idades_ms)), 2)}
+    return resultado
+
+
+def abrir_fonte(fonte: Union[int, str, None] = None, largura: int = LARGURA_PADRAO,
+                altura: int = ALTURA_PADRAO, fps: float = FPS_DESEJADO,
+                fourcc: Optional[str] = FOURCC_PREFERIDO) -> Optional[cv2.VideoCapture]:
+    """
+    Abre a fonte de vídeo e confirma que ela entrega frames.
+
+    Sem fonte, testa as webcams 0..INDICES_PROBE-1 e usa a primeira que
+    funcionar. Webcams são negociadas (formato comprimido, resolução, FPS
+    e buffer mínimo); o que o driver aceitou vai para o log de eventos.
+    Retorna None se nada puder ser aberto.
+    """
+    fonte = normalizar_fonte(fonte)
+    candidatas = range(INDICES_PROBE) if fonte is None else [fonte]
+
+    for candidata in candidatas:
+        cap = cv2.VideoCapture(candidata)
+        if not cap.isOpened():
+            cap.release()
+            continue
+
+        if fonte_e_camera(candidata):
+            # Formato e resolução só fazem sentido para webcams
+            negociado = negociar_formato(cap, largura, altura, fps, fourcc)
+            evento(log, logging.INFO, "camera_negociada", fonte=candidata,
+                   **{chave: valor for chave, valor in negociado.items() if chave != 'pedido'})
+            if (negociado['largura'], negociado['altura']) != (largura, altura) or \
+                    (fourcc and negociado['fourcc'] != fourcc):
+                evento(log, logging.WARNING, "camera_formato_diferente", fonte=candidata,
+                       pedido=f"{largura}x{altura} {fourcc}",
+                       obtido=f"{negociado['largura']}x{negociado['altura']} {negociado['fourcc']}")
+        elif not fonte_e_arquivo(candidata):
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, TAMANHO_BUFFER)  # Streams: quando o backend suporta
+
+        ret, _ = cap.read()
+        if ret:
+            print(f"✅ Câmera {candidata} funcionando!")
+            return cap
+        cap.release()
+
+    return None
+
+
+class CameraSupervisionada:
+    """
+    VideoCapture com máquina de estados de saúde (ATIVA -> INSTAVEL ->
+    RECONECTANDO -> ATIVA). `read`/`grab` nunca giram em falso: uma falha
+    custa uma pausa curta e, após FALHAS_PARA_RECONECTAR seguidas, a fonte é
+    reaberta com backoff exponencial. Em fontes ao vivo, frames acumulados
+    no buffer do driver enquanto o laço processava são descartados, para
+    que o frame entregue seja o mais recente.
+
+    Arquivos de vídeo não são reabertos: a primeira falha é o fim (ENCERRADA).
+    """
+
+    def __init__(self, fonte: Union[int, str, None], catraca: str, largura: int = LARGURA_PADRAO,
+                 altura: int = ALTURA_PADRAO, sondar: bool = True):
+        self.fonte = fonte
+        self.catraca = catraca
+        self.largura = largura
+        self.altura = altura
+        self.sondar = sondar and (fonte is None or fonte_e_camera(fonte))  # Só webcams
+        self.sondagem: Optional[Dict] = None
+        self.ao_vivo = not fonte_e_arquivo(fonte)
+        self.cap: Optional[cv2.VideoCapture] = None
+        self.estado = RECONECTANDO
+        self.periodo = 1.0 / FPS_PRESUMIDO
+        self.falhas_seguidas = 0
+        self.backoff = BACKOFF_INICIAL
+        self.proxima_tentativa = 0.0
+        self.ultima_leitura: Optional[float] = None
+        self.contagem = {'frames': 0, 'falhas': 0, 'descartados': 0, 'reconexoes': 0}
+
+    @property
+    def encerrada(self) -> bool:
+        return self.estado == ENCERRADA
+
+    def _mudar_estado(self, estado: str, nivel: int = logging.WARNING, **campos) -> None:
+        if estado != self.estado:
+            evento(log, nivel, "camera_estado", catraca=self.catraca, de=self.estado, para=estado, **campos)
+            self.estado = estado
+        CAMERA_ATIVA.definir(int(estado == ATIVA), catraca=self.catraca)
+
+    def conectar(self) -> bool:
+        """Abre a fonte; em caso de falha agenda a próxima tentativa com o backoff atual."""
+        cap = abrir_fonte(self.fonte, self.largura, self.altura)
+        if cap is None:
+            RECONEXOES_CAMERA.inc(resultado="falha", catraca=self.catraca)
+            self.proxima_tentativa = time.monotonic() + self.backoff
+            evento(log, logging.WARNING, "camera_indisponivel", catraca=self.catraca, fonte=self.fonte,
+                   proxima_tentativa_s=self.backoff)
+            self._mudar_estado(RECONECTANDO)
+            self.backoff = min(self.backoff * 2, BACKOFF_MAXIMO)
+            return False
+
+        RECONEXOES_CAMERA.inc(resultado="ok", catraca=self.catraca)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if self.sondar:
+            # O FPS declarado pelo driver nem sempre é o entregue (ex.: YUYV 720p a ~5 fps)
+            self.sondagem = sondar_captura(cap)
+            evento(log, logging.INFO, "camera_sondada", catraca=self.catraca, **self.sondagem)
+            fps = self.sondagem['fps_real'] or fps
+            if fps and fps < FPS_DESEJADO * TOLERANCIA_FPS:
+                evento(log, logging.WARNING, "camera_fps_baixo", catraca=self.catraca, fps_real=fps,
+                       fps_desejado=FPS_DESEJADO)
+        self.periodo = 1.0 / fps if fps and fps > 1 else 1.0 / FPS_PRESUMIDO
+        self.cap = cap
+        self.falhas_seguidas = 0
+        self.ultima_leitura = None
+        self._mudar_estado(ATIVA, logging.INFO)
+        return True
+
+    def _disponivel(self) -> bool:
+        """Garante uma fonte aberta; durante o backoff espera um pouco e devolve False."""
+        if self.cap is not None:
+            return True
+        if self.estado == ENCERRADA:
+            return False
+
+        restante = self.proxima_tentativa - time.monotonic()
+        if restante > 0:
+            time.sleep(min(restante, ESPERA_RECONEXAO_MAX))
+            return False
+        self.contagem['reconexoes'] += 1
+        return self.conectar()
+
+    def _falha(self) -> None:
+        self.contagem['falhas'] += 1
+        self.falhas_seguidas += 1
+        FRAMES_CATRACA.inc(resultado="falha_captura", catraca=self.catraca)
+
+        if not self.ao_vivo:
+            self.release()
+            self._mudar_estado(ENCERRADA, logging.INFO)
+            return
+
+        evento_amostrado(log, logging.WARNING, "falha_captura", chave=f"falha_captura:{self.catraca}",
+                         catraca=self.catraca, seguidas=self.falhas_seguidas)
+        if self.falhas_seguidas >= FALHAS_PARA_RECONECTAR:
+            self.cap.release()
+            self.cap = None
+            self.proxima_tentativa = time.monotonic() + self.backoff
+            self._mudar_estado(RECONECTANDO, proxima_tentativa_s=self.backoff)
+            self.backoff = min(self.backoff * 2, BACKOFF_MAXIMO)
+        else:
+            self._mudar_estado(INSTAVEL)
+            time.sleep(ESPERA_FALHA)
+
+    def _capturar(self) -> bool:
+        """
+        grab() do frame mais recente. Se o laço ficou mais de dois períodos
+        sem ler, os grabs que voltam na hora vêm do buffer (frames velhos) e
+        são descartados; o primeiro que espera pelo sensor é fresco.
+        """
+        agora = time.monotonic()
+        drenar = (self.ao_vivo and self.ultima_leitura is not None
+                  and agora - self.ultima_leitura > 2 * self.periodo)
+
+        ok = self.cap.grab()
+        espera = time.monotonic() - agora
+        descartados = 0
+        while ok and drenar and descartados < MAX_DESCARTE and espera < self.periodo / 2:
+            inicio = time.monotonic()
+            ok = self.cap.grab()
+            espera = time.monotonic() - inicio
+            descartados += 1
+
+        if descartados:
+            self.contagem['descartados'] += descartados
+            FRAMES_CATRACA.inc(descartados, resultado="descartado", catraca=self.catraca)
+        self.ultima_leitura = time.monotonic()
+        return ok
+
+    def _ler(self, decodificar: bool, buffer=None):
+        if not self._disponivel():
+            return False, None
+
+        inicio = time.perf_counter()
+        ok = self._capturar()
+        frame = None
+        if ok and decodificar:
+            ok, frame = self.cap.retrieve(buffer)
+        ETAPAS_CATRACA.observar(time.perf_counter() - inicio, etapa="captura", catraca=self.catraca)
+
+        if not ok:
+            self._falha()
+            return False, None
+
+        self.contagem['frames'] += 1
+        self.falhas_seguidas = 0
+        self.backoff = BACKOFF_INICIAL
+        FRAMES_CATRACA.inc(resultado="capturado", catraca=self.catraca)
+        if self.estado != ATIVA:
+            self._mudar_estado(ATIVA, logging.INFO)
+        return True, frame
+
+    def read(self, buffer=None):
+        """Como VideoCapture.read (reaproveitando `buffer`); (False, None) em falha ou durante o backoff."""
+        return self._ler(True, buffer)
+
+    def grab(self) -> bool:
+        """Avança para o frame mais recente sem decodificá-lo."""
+        return self._ler(False)[0]
+
+    def estatisticas(self) -> Dict:
+        return dict(self.contagem, estado=self.estado, fps_fonte=round(1.0 / self.periodo, 2),
+                    sondagem=self.sondagem)
+
+    def release(self) -> None:
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        self._mudar_estado(ENCERRADA, logging.INFO)
@@ -0,0 +1,557 @@
+#!/usr/bin/env python3
+# catraca.py
+# Linha de comando não interativa: operação da catraca, cadastro, importação,
+# manutenção da galeria, exportação e estatísticas, para cron e systemd.
+#
+#   python catraca.py run-gate --fonte 0 --limiar 0.5
+#   python catraca.py enroll --nome "Maria" --equipe TI --matricula 123 --foto a.jpg --foto b.jpg
+#   python catraca.py enroll-kiosk --fila fila.csv --fonte 0
+#   python catraca.py rebuild-gallery
+#   python catraca.py audit-duplicates --json
+#   python catraca.py export --desde 2025-05-01 --saida maio.csv
+#
+# Códigos de saída (sysexits): 0 ok, 1 erro, 2 uso incorreto, 65 dados
+# inválidos, 66 arquivo de entrada ausente, 69 fonte de vídeo indisponível,
+# 130 interrompido
+
+import os
+import sys
+import csv
+import json
+import signal
+import sqlite3
+import argparse
+import contextlib
+from datetime import datetime
+from typing import Dict, List
+
+import catraca_virtual
+from codificacao import CODIFICADORES, codificador_ativo
+from eventos import configurar_eventos, NIVEL_EVENTOS, ARQUIVO_EVENTOS
+
+# --- CÓDIGOS DE SAÍDA ---
+SUCESSO = 0
+ERRO = 1
+USO_INCORRETO = 2          # argparse
+DADOS_INVALIDOS = 65       # EX_DATAERR: sem rosto na foto, matrícula ou rosto já cadastrado
+ENTRADA_AUSENTE = 66       # EX_NOINPUT: foto, CSV ou config inexistente
+FONTE_INDISPONIVEL = 69    # EX_UNAVAILABLE: câmera/vídeo não abriu
+INTERROMPIDO = 130         # Ctrl+C ou SIGTERM
+SAIDA_FECHADA = 141        # 128 + SIGPIPE: quem lia a saída fechou o pipe (ex.: `export | head`)
+
+COLUNAS_EXPORTACAO = {
+    'acessos': ('id', 'usuario_id', 'nome', 'equipe', 'cpf', 'data_hora', 'tipo', 'status', 'catraca'),
+    'usuarios': ('id', 'nome', 'equipe', 'cpf', 'foto_path', 'data_cadastro'),
+}
+
+
+def _encerrar_com_sigterm() -> None:
+    """SIGTERM (systemd stop) segue o mesmo caminho de limpeza do Ctrl+C."""
+    def interromper(*_):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, interromper)
+
+
+def aplicar_configuracao(args) -> None:
+    """Flags globais sobrescrevem as configurações de catraca_virtual antes de qualquer acesso ao banco."""
+    catraca_virtual.DB_FILE = args.db
+    catraca_virtual.USUARIOS_DIR = args.usuarios
+    catraca_virtual.ARQUIVO_GALERIA = args.galeria
+    catraca_virtual.configurar_codificador(args.codificador)  # Antes do --limiar, que vale na escala dele
+    if getattr(args, 'limiar', None) is not None:
+        catraca_virtual.FACE_MATCH_THRESHOLD = args.limiar
+    if getattr(args, 'detector', None) is not None:
+        catraca_virtual.DETECTOR_BACKEND = args.detector
+    if getattr(args, 'fonte', None) is not None:
+        catraca_virtual.FONTE_CAMERA = args.fonte
+
+
+def preparar_banco() -> None:
+    """setup_database com as mensagens no stderr: o stdout fica só com os dados (export, stats --json)."""
+    with contextlib.redirect_stdout(sys.stderr):
+        catraca_virtual.setup_database()
+
+
+# --- SUBCOMANDOS ---
+
+def comando_run_gate(args) -> int:
+    import multi_catraca
+    from modelos_face import aquecer_em_segundo_plano, aguardar_modelos
+    from metricas import iniciar_exportacao
+
+    try:
+        if args.config:
+            configs = multi_catraca.carregar_config_catracas(args.config)
+        else:
+            configs = [multi_catraca.config_catraca({
+                'nome': args.nome, 'fonte': args.fonte if args.fonte is not None else 0,
+                'roi': args.roi or catraca_virtual.ROI_CATRACA, 'direcao': args.direcao, 'exibir': args.exibir,
+            })]
+    except FileNotFoundError as e:
+        print(f"❌ Configuração não encontrada: {e.filename}", file=sys.stderr)
+        return ENTRADA_AUSENTE
+    except ValueError as e:
+        print(f"❌ Configuração inválida: {e}", file=sys.stderr)
+        return DADOS_INVALIDOS
+
+    aquecer_em_segundo_plano(configs[0]['detector'])
+    preparar_banco()
+    aguardar_modelos()
+    iniciar_exportacao()
+    if args.processos:
+        eventos = {'nivel': args.nivel_eventos, 'arquivo': args.log_eventos}
+        falhas = multi_catraca.ServicoProcessos(configs, eventos=eventos).executar()
+        return ERRO if falhas else SUCESSO
+
+    servico = multi_catraca.ServicoCatracas(configs)
+    servico.executar()
+    if all(p.fonte_indisponivel for p in servico.pipelines.values()):
+        return FONTE_INDISPONIVEL
+    return SUCESSO
+
+
+def comando_enroll(args) -> int:
+    import cv2
+    from PIL import UnidentifiedImageError
+    from chip_facial import gerar_chip, gravar_chip, listar_chips
+    from codificacao import codificar_chips
+    from modelos_face import carregar_imagem
+
+    nome, equipe = args.nome.strip(), args.equipe.strip()
+    matricula = catraca_virtual.sanitizar_matricula(args.matricula)
+    if not nome or not equipe or not matricula:
+        print("❌ Nome, equipe e matrícula são obrigatórios.", file=sys.stderr)
+        return DADOS_INVALIDOS
+
+    ausentes = [foto for foto in args.foto if not os.path.exists(foto)]
+    if ausentes:
+        print(f"❌ Foto(s) não encontrada(s): {', '.join(ausentes)}", file=sys.stderr)
+        return ENTRADA_AUSENTE
+
+    preparar_banco()
+    conn = sqlite3.connect(args.db)
+    try:
+        existente = conn.execute('SELECT nome FROM usuarios WHERE cpf = ?', (matricula,)).fetchone()
+    finally:
+        conn.close()
+    if existente:
+        print(f"❌ Pessoa '{existente[0]}' já cadastrada com a matrícula {matricula}.", file=sys.stderr)
+        return DADOS_INVALIDOS
+
+    # Um chip por foto com rosto (o maior rosto de cada uma); a primeira válida vira foto.jpg
+    caminho_usuario = os.path.join(args.usuarios, matricula)
+    foto_path = os.path.join(caminho_usuario, "foto.jpg")
+    primeira, chips = None, []
+    for foto in args.foto[:catraca_virtual.MAX_TEMPLATES_POR_USUARIO]:
+        try:
+            imagem = carregar_imagem(foto)
+        except UnidentifiedImageError:
+            print(f"❌ {foto} não é uma imagem válida.", file=sys.stderr)
+            return DADOS_INVALIDOS
+        resultado = gerar_chip(imagem)
+        if resultado is None:
+            print(f"⚠️ Nenhum rosto em {foto}")
+            continue
+        if primeira is None:
+            primeira = imagem
+        chips.append(resultado)
+
+    if not chips:
+        print("❌ Nenhuma foto com rosto detectado.", file=sys.stderr)
+        return DADOS_INVALIDOS
+
+    # Matrícula nova não garante pessoa nova: o rosto é comparado com a galeria inteira antes de gravar
+    encodings = codificar_chips([chip for chip, _ in chips])
+    with contextlib.redirect_stdout(sys.stderr):
+        galeria = catraca_virtual.carregar_galeria_db()
+    suspeitos = catraca_virtual.verificar_duplicatas(encodings, galeria)
+    for suspeito in suspeitos:
+        print(f"⚠️ Parecido com {suspeito['nome']} (matrícula {suspeito['cpf']}) - distância {suspeito['distancia']:.3f}",
+              file=sys.stderr)
+    if suspeitos and not args.permitir_duplicata:
+        print("❌ Provável cadastro duplicado; use --permitir-duplicata se forem pessoas diferentes.", file=sys.stderr)
+        return DADOS_INVALIDOS
+
+    os.makedirs(caminho_usuario, exist_ok=True)
+    cv2.imwrite(foto_path, cv2.cvtColor(primeira, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, 95])
+    for caminho_chip in listar_chips(caminho_usuario):
+        os.remove(caminho_chip)
+    for indice, (chip, dados) in enumerate(chips, start=1):
+        gravar_chip(caminho_usuario, chip, dados, indice)
+
+    if not catraca_virtual.salvar_usuario_db(nome, equipe, matricula, foto_path):
+        return ERRO
+    # Os encodings da verificação já viram os templates de cadastro
+    conn = sqlite3.connect(args.db)
+    try:
+        usuario_id = conn.execute('SELECT id FROM usuarios WHERE cpf = ?', (matricula,)).fetchone()[0]
+    finally:
+        conn.close()
+    catraca_virtual.salvar_templates_db(usuario_id, encodings, "cadastro")
+    print(f"✅ {nome} cadastrado(a) | matrícula {matricula} | {len(chips)} chip(s)")
+    return SUCESSO
+
+
+def comando_enroll_kiosk(args) -> int:
+    import quiosque
+
+    if args.fila:
+        if not os.path.exists(args.fila):
+            print(f"❌ Fila não encontrada: {args.fila}", file=sys.stderr)
+            return ENTRADA_AUSENTE
+        pessoas = quiosque.carregar_fila(args.fila)
+    elif args.nome and args.equipe and args.matricula:
+        pessoas = [{'nome': args.nome.strip(), 'equipe': args.equipe.strip(),
+                    'matricula': catraca_virtual.sanitizar_matricula(args.matricula)}]
+    else:
+        print("❌ Informe --fila ou --nome, --equipe e --matricula.", file=sys.stderr)
+        return USO_INCORRETO
+
+    preparar_banco()
+    cadastradas = quiosque.matriculas_cadastradas(args.db)
+    for pessoa in pessoas:
+        if pessoa['matricula'] in cadastradas:
+            print(f"⚠️ Matrícula {pessoa['matricula']} ({pessoa['nome']}) já cadastrada; pulando")
+    pessoas = [p for p in pessoas if p['matricula'] not in cadastradas]
+    if not pessoas:
+        print("❌ Ninguém a cadastrar.", file=sys.stderr)
+        return DADOS_INVALIDOS
+
+    resultados = quiosque.executar_quiosque(pessoas, catraca_virtual.FONTE_CAMERA, exibir=not args.sem_janela)
+    if resultados is None:
+        print("❌ Não foi possível abrir a câmera.", file=sys.stderr)
+        return FONTE_INDISPONIVEL
+    cadastrados = sum(1 for r in resultados if r['status'] == 'cadastrado')
+    print(f"✅ {cadastrados} de {len(pessoas)} pessoa(s) cadastrada(s)")
+    return SUCESSO if cadastrados == len(pessoas) else DADOS_INVALIDOS
+
+
+def comando_import(args) -> int:
+    from importacao import importar_legado
+
+    if not os.path.isdir(args.usuarios) and not os.path.exists(args.csv):
+        print(f"❌ Nada para importar: {args.usuarios}/ e {args.csv} não existem", file=sys.stderr)
+        return ENTRADA_AUSENTE
+
+    preparar_banco()
+    resumo = importar_legado(args.db, args.usuarios, args.csv, args.lote_usuarios, args.lote_acessos)
+    print(f"✅ Usuários: {resumo['usuarios_inseridos']} novo(s), {resumo['usuarios_existentes']} já no banco, "
+          f"{resumo['usuarios_invalidos']} inválido(s)")
+    print(f"✅ Acessos: {resumo['acessos_importados']} importado(s), {resumo['acessos_invalidos']} linha(s) inválida(s)")
+    return SUCESSO
+
+
+def comando_rebuild_gallery(args) -> int:
+    from chip_facial import encodings_do_usuario
+    from galeria_mapeada import salvar_galeria_mapeada
+
+    preparar_banco()
+    if args.recodificar:
+        # Templates de cadastro recalculados dos chips; os aprendidos na catraca são mantidos
+        conn = sqlite3.connect(args.db)
+        try:
+            usuarios = conn.execute('SELECT id, foto_path FROM usuarios').fetchall()
+            recodificados = 0
+            for usuario_id, foto_path in usuarios:
+                encodings = encodings_do_usuario(foto_path)
+                if not encodings:
+                    continue
+                with conn:
+                    conn.execute("DELETE FROM templates WHERE usuario_id = ? AND modelo = ? AND origem = 'cadastro'",
+                                 (usuario_id, codificador_ativo().versao))
+                catraca_virtual.salvar_templates_db(usuario_id, encodings, "cadastro")
+                recodificados += 1
+        finally:
+            conn.close()
+        print(f"🧬 Templates de cadastro ({codificador_ativo().versao}) recalculados para "
+              f"{recodificados} de {len(usuarios)} usuário(s)")
+
+    galeria, versao = catraca_virtual.montar_galeria_db()
+    try:
+        salvar_galeria_mapeada(galeria, versao, args.galeria)
+    except (OSError, sqlite3.Error) as e:
+        print(f"❌ Não foi possível gravar {args.galeria}: {e}", file=sys.stderr)
+        return ERRO
+    print(f"✅ {args.galeria}: {len(galeria)} usuário(s), {galeria.total_templates} template(s)")
+    return SUCESSO
+
+
+def _filtros_acessos(args):
+    condicoes, parametros = [], []
+    if args.desde:
+        condicoes.append('data_hora >= ?')
+        parametros.append(args.desde)
+    if args.ate:
+        # Data sem hora inclui o dia inteiro
+        condicoes.append('data_hora <= ?')
+        parametros.append(args.ate if len(args.ate) > 10 else f"{args.ate} 23:59:59")
+    if args.catraca:
+        condicoes.append('catraca = ?')
+        parametros.append(args.catraca)
+    return (" WHERE " + " AND ".join(condicoes) if condicoes else ""), parametros
+
+
+def comando_export(args) -> int:
+    colunas = COLUNAS_EXPORTACAO[args.tabela]
+    sql = f"SELECT {', '.join(colunas)} FROM {args.tabela}"
+    parametros: List = []
+    if args.tabela == 'acessos':
+        filtro, parametros = _filtros_acessos(args)
+        sql += filtro
+    sql += " ORDER BY id"
+
+    if not os.path.exists(args.db):
+        print(f"❌ Banco não encontrado: {args.db}", file=sys.stderr)
+        return ENTRADA_AUSENTE
+
+    conn = sqlite3.connect(args.db)
+    saida = open(args.saida, 'w', newline='', encoding='utf-8') if args.saida else sys.stdout
+    linhas = 0
+    try:
+        # Cursor em fluxo: não carrega a tabela inteira na memória
+        cursor = conn.execute(sql, parametros)
+        if args.formato == 'csv':
+            escritor = csv.writer(saida)
+            escritor.writerow(colunas)
+            for linha in cursor:
+                escritor.writerow(linha)
+                linhas += 1
+        else:
+            for linha in cursor:
+                saida.write(json.dumps(dict(zip(colunas, linha)), ensure_ascii=False) + "\n")
+                linhas += 1
+        saida.flush()
+    except BrokenPipeError:
+        if args.saida:
+            raise
+        # O leitor (head, less) já tem o que queria; stdout vai para /dev/null para o flush da saída não falhar de novo
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return SAIDA_FECHADA
+    finally:
+        conn.close()
+        if args.saida:
+            saida.close()
+
+    print(f"✅ {linhas} linha(s) de {args.tabela} exportada(s)", file=sys.stderr)
+    return SUCESSO
+
+
+def coletar_estatisticas(db_file: str, caminho_galeria: str) -> Dict:
+    """Contagens do banco e estado do arquivo da galeria (para o codificador ativo)."""
+    from galeria_mapeada import versao_banco, CABECALHO, MAGICO
+
+    conn = sqlite3.connect(db_file)
+    try:
+        def um(sql, *parametros):
+            return conn.execute(sql, parametros).fetchone()[0]
+
+        hoje = datetime.now().strftime('%Y-%m-%d')
+        modelo = codificador_ativo().versao
+        estatisticas = {
+            'usuarios': um('SELECT COUNT(*) FROM usuarios'),
+            'codificador': modelo,
+            'usuarios_sem_template': um('SELECT COUNT(*) FROM usuarios WHERE id NOT IN '
+                                        '(SELECT usuario_id FROM templates WHERE modelo = ?)', modelo),
+            'templates': dict(conn.execute('SELECT origem, COUNT(*) FROM templates WHERE modelo = ? GROUP BY origem',
+                                           (modelo,)).fetchall()),
+            'templates_por_modelo': dict(conn.execute('SELECT modelo, COUNT(*) FROM templates GROUP BY modelo').fetchall()),
+            'acessos': um('SELECT COUNT(*) FROM acessos'),
+            'acessos_hoje': um('SELECT COUNT(*) FROM acessos WHERE data_hora >= ?', hoje),
+            'acessos_por_status': dict(conn.execute('SELECT status, COUNT(*) FROM acessos GROUP BY status').fetchall()),
+            'acessos_por_catraca': {str(c): n for c, n in conn.execute(
+                'SELECT catraca, COUNT(*) FROM acessos GROUP BY catraca').fetchall()},
+            'ultimo_acesso': um('SELECT MAX(data_hora) FROM acessos'),
+        }
+    finally:
+        conn.close()
+
+    versao = versao_banco(db_file)
+    galeria = {'arquivo': caminho_galeria, 'versao_banco': versao, 'em_dia': False}
+    if os.path.exists(caminho_galeria):
+        with open(caminho_galeria, 'rb') as f:
+            cabecalho = f.read(CABECALHO.size)
+        if len(cabecalho) == CABECALHO.size and cabecalho.startswith(MAGICO):
+            _, versao_arquivo, linhas, usuarios, _, _, modelo_arquivo, _ = CABECALHO.unpack(cabecalho)
+            modelo_arquivo = modelo_arquivo.rstrip(b'\0').decode('ascii', errors='replace')
+            galeria.update(versao_arquivo=versao_arquivo, linhas=linhas, usuarios=usuarios, modelo=modelo_arquivo,
+                           em_dia=versao_arquivo == versao and modelo_arquivo == modelo,
+                           bytes=os.path.getsize(caminho_galeria))
+    estatisticas['galeria'] = galeria
+    return estatisticas
+
+
+def comando_stats(args) -> int:
+    if not os.path.exists(args.db):
+        print(f"❌ Banco não encontrado: {args.db}", file=sys.stderr)
+        return ENTRADA_AUSENTE
+    preparar_banco()  # Bancos antigos: tabelas de versão e índices
+    estatisticas = coletar_estatisticas(args.db, args.galeria)
+
+    if args.json:
+        print(json.dumps(estatisticas, ensure_ascii=False, indent=2))
+        return SUCESSO
+
+    galeria = estatisticas['galeria']
+    print(f"👥 Usuários: {estatisticas['usuarios']} ({estatisticas['usuarios_sem_template']} sem template)")
+    print(f"🧬 Templates {estatisticas['codificador']}: {sum(estatisticas['templates'].values())} "
+          f"{estatisticas['templates']} | por modelo: {estatisticas['templates_por_modelo']}")
+    print(f"🚪 Acessos: {estatisticas['acessos']} (hoje {estatisticas['acessos_hoje']}) "
+          f"| último {estatisticas['ultimo_acesso'] or '-'}")
+    print(f"   por status: {estatisticas['acessos_por_status']}")
+    print(f"   por catraca: {estatisticas['acessos_por_catraca']}")
+    print(f"🗂️ Galeria: {galeria['arquivo']} " +
+          ("em dia" if galeria['em_dia'] else "desatualizada (rebuild-gallery)") +
+          (f" | {galeria['usuarios']} usuário(s), {galeria['linhas']} linha(s)" if 'linhas' in galeria else ""))
+    return SUCESSO
+
+
+def comando_audit_duplicates(args) -> int:
+    if not os.path.exists(args.db):
+        print(f"❌ Banco não encontrado: {args.db}", file=sys.stderr)
+        return ENTRADA_AUSENTE
+    preparar_banco()
+    with contextlib.redirect_stdout(sys.stderr):
+        galeria = catraca_virtual.carregar_galeria_db()
+
+    limiar = args.limiar_duplicata if args.limiar_duplicata is not None else catraca_virtual.LIMIAR_DUPLICATA
+    pares = [{'distancia': round(distancia, 3),
+              'a': {c: galeria.usuarios[u].get(c) for c in ('id', 'nome', 'cpf')},
+              'b': {c: galeria.usuarios[v].get(c) for c in ('id', 'nome', 'cpf')}}
+             for u, v, distancia in galeria.pares_proximos(limiar)]
+
+    if args.json:
+        print(json.dumps({'limiar': limiar, 'usuarios': len(galeria), 'pares': pares}, ensure_ascii=False, indent=2))
+    else:
+        for par in pares:
+            a, b = par['a'], par['b']
+            print(f"{par['distancia']:.3f}  {a['nome']} ({a['cpf']})  ↔  {b['nome']} ({b['cpf']})")
+        print(f"🔎 {len(pares)} par(es) a até {limiar} entre {len(galeria)} usuário(s)", file=sys.stderr)
+    # Para o cron: saída 65 quando há suspeitos
+    return DADOS_INVALIDOS if pares else SUCESSO
+
+
+def comando_bench(args) -> int:
+    import benchmark
+    argumentos = args.argumentos[1:] if args.argumentos[:1] == ['--'] else args.argumentos
+    return benchmark.main(argumentos)
+
+
+def comando_serve(args) -> int:
+    import web_server
+    web_server.DB_FILE = args.db
+    web_server.USUARIOS_DIR = args.usuarios
+    preparar_banco()
+    web_server.run_local_server(args.porta)
+    return SUCESSO
+
+
+# --- PARSER ---
+
+def criar_parser() -> argparse.ArgumentParser:
+    comum = argparse.ArgumentParser(add_help=False)
+    comum.add_argument('--db', default=catraca_virtual.DB_FILE, help="Banco SQLite")
+    comum.add_argument('--usuarios', default=catraca_virtual.USUARIOS_DIR, help="Diretório dos cadastros")
+    comum.add_argument('--galeria', default=catraca_virtual.ARQUIVO_GALERIA, help="Arquivo da galeria mapeada")
+    comum.add_argument('--codificador', default=catraca_virtual.CODIFICADOR_BACKEND, choices=list(CODIFICADORES),
+                       help="Backend de encoding; cada um tem seus próprios templates")
+    comum.add_argument('--nivel-eventos', default=NIVEL_EVENTOS, help="Nível do log de eventos (DEBUG, INFO...)")
+    comum.add_argument('--log-eventos', default=ARQUIVO_EVENTOS, help="Arquivo JSON lines dos eventos")
+
+    parser = argparse.ArgumentParser(description="Catraca Virtual - linha de comando")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('run-gate', parents=[comum], help="Reconhecimento contínuo sem menu (systemd)")
+    p.add_argument('--fonte', help="Índice da webcam, arquivo de vídeo ou URL (padrão: 0)")
+    p.add_argument('--config', help="JSON com várias catracas (ver multi_catraca.py); ignora --fonte")
+    p.add_argument('--nome', default=catraca_virtual.NOME_CATRACA, help="Nome da catraca nos acessos e métricas")
+    p.add_argument('--direcao', default='AUTO', help="ENTRADA, SAÍDA ou AUTO")
+    p.add_argument('--roi', type=float, nargs=4, metavar=('X0', 'Y0', 'X1', 'Y1'))
+    p.add_argument('--limiar', type=float, help=f"Distância máxima do match (padrão: {catraca_virtual.FACE_MATCH_THRESHOLD} no dlib, "
+                                                  "o do codificador nos demais)")
+    p.add_argument('--detector', help=f"Backend de detecção (padrão {catraca_virtual.DETECTOR_BACKEND})")
+    p.add_argument('--exibir', action='store_true', help="Mostra a janela de vídeo")
+    p.add_argument('--processos', action='store_true', help="Uma catraca por processo (com --config)")
+    p.set_defaults(funcao=comando_run_gate)
+
+    p = sub.add_parser('enroll', parents=[comum], help="Cadastro a partir de fotos")
+    p.add_argument('--nome', required=True)
+    p.add_argument('--equipe', required=True)
+    p.add_argument('--matricula', required=True)
+    p.add_argument('--foto', required=True, action='append', help="Foto com o rosto (repita para mais templates)")
+    p.add_argument('--permitir-duplicata', action='store_true',
+                   help="Cadastra mesmo se o rosto for muito parecido com alguém já cadastrado")
+    p.set_defaults(funcao=comando_enroll)
+
+    p = sub.add_parser('enroll-kiosk', parents=[comum], help="Cadastro automático pela câmera, sem teclado")
+    p.add_argument('--fila', help="CSV com as colunas nome, equipe, matricula")
+    p.add_argument('--nome')
+    p.add_argument('--equipe')
+    p.add_argument('--matricula')
+    p.add_argument('--fonte', help="Índice da webcam, arquivo de vídeo ou URL")
+    p.add_argument('--detector', help=f"Backend de detecção (padrão {catraca_virtual.DETECTOR_BACKEND})")
+    p.add_argument('--sem-janela', action='store_true', help="Não mostra a janela (vídeo gravado, testes)")
+    p.set_defaults(funcao=comando_enroll_kiosk)
+
+    p = sub.add_parser('import', parents=[comum], help="Importa usuarios/*/dados.json e acessos.csv legados")
+    p.add_argument('--csv', default=catraca_virtual.LOG_FILE, help="Log de acessos legado")
+    p.add_argument('--lote-usuarios', type=int, default=500)
+    p.add_argument('--lote-acessos', type=int, default=5000)
+    p.set_defaults(funcao=comando_import)
+
+    p = sub.add_parser('rebuild-gallery', parents=[comum], help="Monta a galeria do banco e regrava o arquivo mapeado")
+    p.add_argument('--recodificar', action='store_true', help="Recalcula os templates de cadastro a partir dos chips")
+    p.set_defaults(funcao=comando_rebuild_gallery)
+
+    p = sub.add_parser('export', parents=[comum], help="Exporta acessos ou usuários em CSV/JSON lines")
+    p.add_argument('--tabela', choices=list(COLUNAS_EXPORTACAO), default='acessos')
+    p.add_argument('--formato', choices=['csv', 'jsonl'], default='csv')
+    p.add_argument('--desde', help="Data/hora inicial (AAAA-MM-DD [HH:MM:SS])")
+    p.add_argument('--ate', help="Data/hora final (AAAA-MM-DD [HH:MM:SS])")
+    p.add_argument('--catraca', help="Só acessos desta catraca")
+    p.add_argument('--saida', help="Arquivo de saída (padrão: stdout)")
+    p.set_defaults(funcao=comando_export)
+
+    p = sub.add_parser('stats', parents=[comum], help="Contagens do banco e estado da galeria")
+    p.add_argument('--json', action='store_true', help="Saída em JSON")
+    p.set_defaults(funcao=comando_stats)
+
+    p = sub.add_parser('audit-duplicates', parents=[comum], help="Pares de cadastros que parecem a mesma pessoa")
+    p.add_argument('--limiar', dest='limiar_duplicata', type=float,
+                   help=f"Distância máxima do par (padrão: {catraca_virtual.LIMIAR_DUPLICATA} no dlib, "
+                        "o do codificador nos demais)")
+    p.add_argument('--json', action='store_true', help="Saída em JSON")
+    p.set_defaults(funcao=comando_audit_duplicates)
+
+    p = sub.add_parser('bench', help="Repassa os argumentos para benchmark.py (ex.: bench pipeline --frames 100)")
+    p.add_argument('argumentos', nargs=argparse.REMAINDER)
+    p.set_defaults(funcao=comando_bench)
+
+    p = sub.add_parser('serve', parents=[comum], help="Servidor web de cadastro e /metrics")
+    p.add_argument('--porta', type=int, default=5000)
+    p.set_defaults(funcao=comando_serve)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = criar_parser().parse_args(argv)
+    if args.comando != 'bench':
+        try:
+            aplicar_configuracao(args)
+        except FileNotFoundError as e:
+            print(f"❌ {e}", file=sys.stderr)  # Modelo ONNX do codificador ausente
+            return ENTRADA_AUSENTE
+        configurar_eventos(args.nivel_eventos, args.log_eventos)
+    _encerrar_com_sigterm()
+    try:
+        return args.funcao(args)
+    except KeyboardInterrupt:
+        print("\n🛑 Interrompido.", file=sys.stderr)
+        return INTERROMPIDO
+    except sqlite3.Error as e:
+        print(f"❌ Erro no banco {getattr(args, 'db', '')}: {e}", file=sys.stderr)
+        return ERRO
+
+
+if __name__ == '__main__':
+    sys.exit(main())
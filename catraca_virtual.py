@@ -1,34 +1,74 @@
 # catraca_virtual.py
 # Sistema de Controle de Acesso com Reconhecimento Facial via Webcam
 
+import time
+INICIO_PROCESSO = time.perf_counter()  # Referência das fases de inicialização
+
 import cv2
-import face_recognition
 import os
-import json
 import numpy as np
 import re
+import shutil
 import sqlite3
-import threading
-import time
-import csv
+import logging
 from datetime import datetime
 from typing import List, Tuple, Optional, Dict
+from chip_facial import (gerar_chip, gravar_chip, encoding_do_chip, encodings_do_usuario, listar_chips,
+                         carregar_encodings_chips)
+from galeria import Galeria, MODO_MINIMO, PRECISAO_COMPLETA, encoding_para_blob, blob_para_encoding
+from galeria_mapeada import ARQUIVO_GALERIA, criar_versionamento, ler_versao, salvar_galeria_mapeada, abrir_galeria_mapeada
+from deteccao import DetectorAdaptativo, criar_detector, detectar_rostos
+from codificacao import (extrair_chips, chips_com_qualidade, codificar_chips, codificar_rostos, codificador_ativo,
+                         definir_codificador, CodificadorDlib)
+from qualidade import ORIENTACOES, registrar_descartes
+from camera import abrir_fonte, CameraSupervisionada
+from renderizacao import RENDERIZADOR
+from metricas import ETAPAS_CATRACA, FRAMES_CATRACA, ROSTOS_CATRACA, iniciar_exportacao
+from governador import GovernadorTaxa
+from movimento import DetectorMovimento
+from eventos import obter_logger, evento, evento_amostrado, configurar_eventos
+from modelos_face import localizar_rostos, aquecer_em_segundo_plano, aguardar_modelos
+from inicializacao import FasesInicializacao
+from importacao import criar_controle_importacao, importar_legado
 
 # --- CONFIGURAÇÕES GLOBAIS ---
 USUARIOS_DIR = "usuarios"
 DB_FILE = "catraca_virtual.db"
 LOG_FILE = "acessos.csv"
-FACE_MATCH_THRESHOLD = 0.6  # Nível de tolerância para reconhecimento (0.6 é o padrão)
+FONTE_CAMERA = None  # None = primeira webcam disponível; ou índice, arquivo de vídeo, URL
+NOME_CATRACA = "principal"  # Rótulo `catraca` nas métricas
+FACE_MATCH_THRESHOLD = 0.6  # Nível de tolerância para reconhecimento (0.6 é o padrão do dlib)
+CODIFICADOR_BACKEND = "dlib"  # dlib ou sface (ver codificacao.py); cada um tem seus templates e limiares
+FILTRO_QUALIDADE = True       # Descarta rostos borrados, de perfil, pequenos ou mal iluminados antes do encoding
+ROSTO_BAIXA_QUALIDADE = "Baixa qualidade"  # Nome exibido para rostos descartados pelo filtro
+
+# Templates por usuário
+MODO_AGREGACAO_TEMPLATES = MODO_MINIMO  # "minimo" ou "centroide" (1 linha por usuário)
+PRECISAO_GALERIA = PRECISAO_COMPLETA    # "float32", "float16" ou "int8" (varredura + reordenação em float32)
+TEMPLATES_POR_CADASTRO = 3              # Frames distintos salvos no cadastro
+MAX_TEMPLATES_POR_USUARIO = 5           # Limite por usuário (cadastro + catraca)
+LIMIAR_ADAPTACAO_TEMPLATE = 0.4         # Matches abaixo disso viram novos templates
+LIMIAR_DUPLICATA = 0.5                  # Cadastro novo tão perto de alguém já cadastrado: provável mesma pessoa
+INTERVALO_CANDIDATOS = 0.3              # segundos entre frames candidatos no cadastro
+
+# Detecção
+DETECTOR_BACKEND = "hog"                # hog, cnn, yunet, ssd ou haar (ver deteccao.py)
+ESCALA_CADASTRO = 0.5                   # Escala da detecção nas telas de cadastro
+ROI_CATRACA = (0.0, 0.0, 1.0, 1.0)      # (x0, y0, x1, y1) em frações do frame
+ESCALAS_BUSCA = (0.25,)                 # Escalas alternadas com a catraca vazia; (0.25, 0.4) acha rostos ao fundo a ~2,6x o custo nos ticks de 0.4
+REFINAR_DETECCAO = False                # Passo grosso-para-fino em resolução cheia
+SENSIBILIDADE_MOVIMENTO = 0.01          # Fração da ROI que precisa mudar para rodar a detecção
+LIMIAR_PIXEL_MOVIMENTO = 20             # Diferença de cinza para um pixel contar como mudança
 
 # Variáveis globais para controle da câmera
 camera_active = False
 camera_thread = None
-current_frame = None
-frame_lock = threading.Lock()
-known_face_encodings = []
-known_user_data = []
+galeria = Galeria(MODO_AGREGACAO_TEMPLATES, PRECISAO_GALERIA)
+templates_adaptados = False  # A galeria mapeada precisa ser regravada ao parar
 last_recognition_time = 0
 RECOGNITION_COOLDOWN = 3  # segundos entre reconhecimentos
+log = obter_logger("catraca_virtual")
+fases_inicializacao = FasesInicializacao(INICIO_PROCESSO)
 
 
 
@@ -72,16 +112,62 @@ def setup_database():
             data_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             tipo TEXT,
             status TEXT,
+            catraca TEXT,
             FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
         )
     ''')
     
-
+    # Bancos antigos: coluna da catraca (multi-câmera)
+    colunas = [coluna[1] for coluna in cursor.execute('PRAGMA table_info(acessos)')]
+    if 'catraca' not in colunas:
+        cursor.execute('ALTER TABLE acessos ADD COLUMN catraca TEXT')
+    # Último acesso de um CPF (entrada/saída) sem varrer o histórico
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_acessos_cpf ON acessos (cpf, status, data_hora)')
+    
+    # Tabela de templates (encodings float32) - vários por usuário, por modelo de encoding
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER NOT NULL,
+            encoding BLOB NOT NULL,
+            origem TEXT NOT NULL,
+            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            modelo TEXT NOT NULL DEFAULT '{CodificadorDlib.versao}',
+            FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+        )
+    ''')
+    
+    # Bancos antigos: todos os templates existentes vieram do dlib
+    colunas = [coluna[1] for coluna in cursor.execute('PRAGMA table_info(templates)')]
+    if 'modelo' not in colunas:
+        cursor.execute(f"ALTER TABLE templates ADD COLUMN modelo TEXT NOT NULL DEFAULT '{CodificadorDlib.versao}'")
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_templates_usuario ON templates (usuario_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_templates_modelo ON templates (modelo, usuario_id)')
+    
+    # Versão de usuarios/templates: diz se o arquivo da galeria mapeada está em dia
+    criar_versionamento(cursor)
+    
+    # Ponto de controle da importação do acessos.csv legado
+    criar_controle_importacao(cursor)
     
     conn.commit()
     conn.close()
     print("🗃️ Banco de dados configurado.")
 
+def configurar_codificador(nome: str) -> None:
+    """
+    Ativa o backend de encoding. Trocar de backend troca também os limiares
+    (a escala das distâncias muda); o `--limiar` da linha de comando vem depois.
+    """
+    global CODIFICADOR_BACKEND, FACE_MATCH_THRESHOLD, LIMIAR_ADAPTACAO_TEMPLATE, LIMIAR_DUPLICATA
+    anterior = codificador_ativo()
+    backend = definir_codificador(nome)
+    CODIFICADOR_BACKEND = backend.nome
+    if backend.versao != anterior.versao:
+        FACE_MATCH_THRESHOLD = backend.limiar
+        LIMIAR_ADAPTACAO_TEMPLATE = backend.limiar_adaptacao
+        LIMIAR_DUPLICATA = backend.limiar_duplicata
+
 def sanitizar_matricula(matricula: str) -> str:
     """Remove espaços em branco e normaliza matrícula."""
     return matricula.strip().upper()
@@ -139,8 +225,12 @@ def draw_face_landmarks(frame, face_location, color=(0, 255, 0), thickness=2):
 
 
 
-def draw_recognition_interface(frame, face_locations, face_names, distances, passage_times=None):
+def draw_recognition_interface(frame, face_locations, face_names, distances, passage_times=None,
+                               total_cadastrados=None):
     """Desenha a interface de identificação facial."""
+    if total_cadastrados is None:
+        total_cadastrados = len(galeria)
+    
     for i, ((top, right, bottom, left), name, distance) in enumerate(zip(face_locations, face_names, distances)):
         # Escalar coordenadas de volta para o frame original (se necessário)
         if hasattr(draw_recognition_interface, 'scale_factor'):
@@ -149,7 +239,12 @@ def draw_recognition_interface(frame, face_locations, face_names, distances, pas
             bottom *= 4
             left *= 4
         
-        if name != "Desconhecido":
+        if name == ROSTO_BAIXA_QUALIDADE:
+            # Rosto descartado pelo filtro de qualidade - cinza, sem decisão
+            color = (180, 180, 180)
+            draw_face_landmarks(frame, (top, right, bottom, left), color, 2)
+            RENDERIZADOR.texto(frame, "AJUSTE O ROSTO", (left + 6, bottom + 25), cv2.FONT_HERSHEY_DUPLEX, 0.7, color, 2)
+        elif name != "Desconhecido":
             # Usuário identificado - verde
             color = (0, 255, 0)
             status = "IDENTIFICADO"
@@ -160,8 +255,8 @@ def draw_recognition_interface(frame, face_locations, face_names, distances, pas
             
             # Texto do usuário identificado com horário
             cv2.putText(frame, f"PASSAGEM: {current_time}", (left + 6, top - 40), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-            cv2.putText(frame, name, (left + 6, top - 15), cv2.FONT_HERSHEY_DUPLEX, 0.8, color, 2)
-            cv2.putText(frame, status, (left + 6, bottom + 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+            RENDERIZADOR.texto(frame, name, (left + 6, top - 15), cv2.FONT_HERSHEY_DUPLEX, 0.8, color, 2)
+            RENDERIZADOR.texto(frame, status, (left + 6, bottom + 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
         else:
             # Usuário não identificado - amarelo (não é erro, apenas não cadastrado)
             color = (0, 255, 255)
@@ -169,17 +264,52 @@ def draw_recognition_interface(frame, face_locations, face_names, distances, pas
             draw_face_landmarks(frame, (top, right, bottom, left), color, 2)
             
             # Texto pessoa não cadastrada
-            cv2.putText(frame, status, (left + 6, bottom + 25), cv2.FONT_HERSHEY_DUPLEX, 0.7, color, 2)
+            RENDERIZADOR.texto(frame, status, (left + 6, bottom + 25), cv2.FONT_HERSHEY_DUPLEX, 0.7, color, 2)
+    
+    # Interface de status no topo (simplificada), escurecida no próprio frame
+    RENDERIZADOR.cabecalho(frame, "SISTEMA DE IDENTIFICACAO - CATRACA",
+                           f"Pessoas cadastradas: {total_cadastrados} | Rostos detectados: {len(face_locations)}")
+
+def atualizar_candidatos(candidatos: List[Dict], score: float, frame, face_location) -> None:
+    """
+    Mantém os TEMPLATES_POR_CADASTRO melhores frames do cadastro, espaçados
+    no tempo para que os templates não sejam praticamente idênticos.
+    """
+    agora = time.time()
+    recente = max(candidatos, key=lambda c: c['tempo']) if candidatos else None
+    
+    if recente is not None and agora - recente['tempo'] < INTERVALO_CANDIDATOS:
+        # Mesmo instante: fica só o melhor frame
+        if score <= recente['score']:
+            return
+        candidatos.remove(recente)
     
-    # Interface de status no topo (simplificada)
-    overlay = frame.copy()
-    cv2.rectangle(overlay, (0, 0), (frame.shape[1], 80), (0, 0, 0), -1)
-    cv2.addWeighted(overlay, 0.4, frame, 0.6, 0, frame)
+    candidatos.append({'score': score, 'frame': frame.copy(), 'location': face_location, 'tempo': agora})
+    candidatos.sort(key=lambda c: c['score'], reverse=True)
+    del candidatos[TEMPLATES_POR_CADASTRO:]
+
+def avaliar_qualidade_cadastro(frame, face_location) -> Dict:
+    """Qualidade do único rosto da tela de cadastro (mesmo filtro da catraca)."""
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    return chips_com_qualidade(rgb, [face_location])[1][0]
+
+def salvar_chips_captura(caminho_usuario: str, candidatos: List[Dict]) -> int:
+    """Gera os chips alinhados dos melhores frames (sem nova detecção) e valida seus encodings."""
+    for caminho_chip in listar_chips(caminho_usuario):
+        os.remove(caminho_chip)
+    
+    salvos = 0
+    for candidato in candidatos:
+        rgb_frame = cv2.cvtColor(candidato['frame'], cv2.COLOR_BGR2RGB)
+        resultado = gerar_chip(rgb_frame, candidato['location'])
+        if resultado is None:
+            continue
+        
+        chip, dados = resultado
+        if len(encoding_do_chip(chip)) > 0 and gravar_chip(caminho_usuario, chip, dados, salvos + 1):
+            salvos += 1
     
-    # Texto de status no topo
-    cv2.putText(frame, "SISTEMA DE IDENTIFICACAO - CATRACA", (20, 30), cv2.FONT_HERSHEY_DUPLEX, 0.8, (255, 255, 255), 2)
-    cv2.putText(frame, f"Pessoas cadastradas: {len(known_face_encodings)} | Rostos detectados: {len(face_locations)}", 
-                (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    return salvos
 
 def capturar_rosto_otimizado(matricula_sanitizada: str) -> bool:
     """
@@ -187,32 +317,17 @@ def capturar_rosto_otimizado(matricula_sanitizada: str) -> bool:
     """
     print("🎥 Iniciando captura de rosto...")
     
-    # Tentar diferentes índices de câmera
-    cap = None
-    for camera_idx in range(3):
-        cap = cv2.VideoCapture(camera_idx)
-        if cap.isOpened():
-            ret, test_frame = cap.read()
-            if ret:
-                print(f"✅ Câmera {camera_idx} funcionando!")
-                break
-            else:
-                cap.release()
-        cap = None
-    
+    cap = abrir_fonte(FONTE_CAMERA)
     if cap is None:
         print("❌ Erro: Não foi possível abrir a câmera.")
         return False
 
-    # Configurar câmera para melhor qualidade
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-    cap.set(cv2.CAP_PROP_FPS, 30)
-
+    backend = criar_detector(DETECTOR_BACKEND)
     print("📸 Posicione seu rosto no centro. Pressione ESPAÇO para capturar ou ESC para cancelar.")
     
     best_frame = None
     best_quality = 0
+    candidatos = []
     frames_captured = 0
     
     while True:
@@ -220,32 +335,36 @@ def capturar_rosto_otimizado(matricula_sanitizada: str) -> bool:
         if not ret:
             break
 
-        # Detectar rostos
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        face_locations = face_recognition.face_locations(rgb_frame)
+        # Detectar rostos (frame reduzido; caixas voltam na resolução original)
+        face_locations = detectar_rostos(frame, backend, ESCALA_CADASTRO)
         
-        # Interface simples de captura
-        display_frame = frame.copy()
+        # Interface simples de captura, desenhada no próprio frame: a melhor
+        # foto e os candidatos são copiados antes do desenho
+        display_frame = frame
         
         if len(face_locations) == 1:
             top, right, bottom, left = face_locations[0]
             
-            # Desenhar interface de reconhecimento
-            draw_face_landmarks(display_frame, face_locations[0], (0, 255, 0), 3)
+            # Qualidade do rosto (nitidez, pose, tamanho, exposição); só frames aprovados viram candidatos
+            qualidade = avaliar_qualidade_cadastro(frame, face_locations[0])
+            quality_score = qualidade['score']
             
-            # Calcular qualidade da detecção (baseado no tamanho do rosto)
-            face_size = (right - left) * (bottom - top)
-            quality_score = min(100, face_size / 10000 * 100)
+            if qualidade['aprovado']:
+                if quality_score > best_quality:
+                    best_quality = quality_score
+                    best_frame = frame.copy()
+                atualizar_candidatos(candidatos, quality_score, frame, face_locations[0])
             
-            if quality_score > best_quality:
-                best_quality = quality_score
-                best_frame = frame.copy()
+            # Desenhar interface de reconhecimento
+            color = (0, 255, 0) if qualidade['aprovado'] else (0, 165, 255)
+            draw_face_landmarks(display_frame, face_locations[0], color, 3)
             
             # Mostrar status
-            cv2.putText(display_frame, "ROSTO DETECTADO", (left, top - 10), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            status = "ROSTO DETECTADO" if qualidade['aprovado'] else ORIENTACOES[qualidade['motivo']]
+            cv2.putText(display_frame, status, (left, top - 10), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
             cv2.putText(display_frame, f"Qualidade: {quality_score:.0f}%", (left, bottom + 30), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
             cv2.putText(display_frame, "ESPACO: Capturar | ESC: Cancelar", (10, display_frame.shape[0] - 20), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
             
@@ -277,12 +396,11 @@ def capturar_rosto_otimizado(matricula_sanitizada: str) -> bool:
                 success = cv2.imwrite(caminho_foto, best_frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
                 
                 if success:
-                    # Testar encoding imediatamente
+                    # Gerar chip alinhado e testar encoding imediatamente
                     try:
-                        test_image = face_recognition.load_image_file(caminho_foto)
-                        encodings = face_recognition.face_encodings(test_image)
-                        if len(encodings) > 0:
-                            print(f"✅ Foto salva com sucesso! Qualidade: {best_quality:.0f}%")
+                        templates = salvar_chips_captura(caminho_usuario, candidatos)
+                        if templates > 0:
+                            print(f"✅ Foto salva com sucesso! Qualidade: {best_quality:.0f}% | Templates: {templates}")
                             cap.release()
                             cv2.destroyAllWindows()
                             return True
@@ -292,6 +410,8 @@ def capturar_rosto_otimizado(matricula_sanitizada: str) -> bool:
                         print(f"❌ Erro ao processar foto: {e}")
                 else:
                     print("❌ Erro ao salvar foto.")
+            elif len(face_locations) == 1:
+                print(f"❌ Nenhum frame com qualidade suficiente ainda: {ORIENTACOES[qualidade['motivo']].lower()}.")
             else:
                 print("❌ Posicione apenas um rosto no centro e tente novamente.")
 
@@ -303,106 +423,154 @@ def capturar_rosto(matricula_sanitizada: str) -> bool:
     """Função de compatibilidade."""
     return capturar_rosto_otimizado(matricula_sanitizada)
 
+def reconhecer_frame(frame, detector: DetectorAdaptativo, galeria_atual: Galeria, catraca: str = NOME_CATRACA):
+    """
+    Detecta, codifica e compara os rostos de um frame.
+
+    Retorna (face_locations, face_encodings, matches) com caixas já no frame
+    original e um (índice, distância) por rosto. Com FILTRO_QUALIDADE, rostos
+    reprovados continuam na lista (contam como presença) mas não são
+    codificados: encoding None e match (-1, inf).
+    """
+    # Detectar rostos só na ROI, em escala adaptativa (caixas já no frame original)
+    with ETAPAS_CATRACA.cronometrar(etapa="deteccao", catraca=catraca):
+        face_locations = detector.detectar(frame)
+    FRAMES_CATRACA.inc(resultado="processado", catraca=catraca)
+    if not face_locations:
+        return [], [], []
+    
+    # Alinhamento e filtro de qualidade (os mesmos 5 marcos servem aos dois)
+    with ETAPAS_CATRACA.cronometrar(etapa="qualidade", catraca=catraca):
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if FILTRO_QUALIDADE:
+            chips, qualidades = chips_com_qualidade(rgb_frame, face_locations)
+            aprovados = [i for i, q in enumerate(qualidades) if q['aprovado']]
+            registrar_descartes(qualidades, catraca)
+        else:
+            chips = extrair_chips(rgb_frame, face_locations)
+            aprovados = list(range(len(chips)))
+    
+    # Rostos aprovados do frame codificados numa única chamada em lote
+    with ETAPAS_CATRACA.cronometrar(etapa="encoding", catraca=catraca):
+        encodings = codificar_chips([chips[i] for i in aprovados])
+    
+    # Comparar todos os rostos do frame com a galeria de uma só vez
+    with ETAPAS_CATRACA.cronometrar(etapa="busca", catraca=catraca):
+        encontrados = galeria_atual.buscar(encodings)
+    
+    face_encodings = [None] * len(face_locations)
+    matches = [(-1, float('inf'))] * len(face_locations)
+    for i, encoding, match in zip(aprovados, encodings, encontrados):
+        face_encodings[i] = encoding
+        matches[i] = match
+    return face_locations, face_encodings, matches
+
 def iniciar_camera_continua():
     """Inicia a câmera em modo contínuo para reconhecimento."""
-    global camera_active, current_frame, frame_lock, known_face_encodings, known_user_data, last_recognition_time
+    global camera_active, galeria, last_recognition_time
     
     print("🎥 Iniciando câmera contínua...")
     
-    # Tentar diferentes índices de câmera
-    cap = None
-    for camera_idx in range(3):
-        cap = cv2.VideoCapture(camera_idx)
-        if cap.isOpened():
-            ret, test_frame = cap.read()
-            if ret:
-                print(f"✅ Câmera {camera_idx} funcionando!")
-                break
-            else:
-                cap.release()
-        else:
-            cap.release() if cap else None
-        cap = None
-    
-    if cap is None:
+    # Supervisão: reconecta com backoff e descarta frames velhos do buffer
+    camera = CameraSupervisionada(FONTE_CAMERA, NOME_CATRACA)
+    if not camera.conectar():
         print("❌ Erro: Não foi possível abrir a câmera.")
         return False
-    
-    # Configurar resolução da câmera
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+    fases_inicializacao.marcar("camera")
     
     camera_active = True
+    detector = DetectorAdaptativo(ROI_CATRACA, ESCALAS_BUSCA, REFINAR_DETECCAO, criar_detector(DETECTOR_BACKEND))
+    governador = GovernadorTaxa(NOME_CATRACA)
+    movimento = DetectorMovimento(ROI_CATRACA, SENSIBILIDADE_MOVIMENTO, LIMIAR_PIXEL_MOVIMENTO)
+    buffer_frame = None  # cap.read reaproveita a memória do frame anterior
+    aguardar_modelos()  # Normalmente já prontos: o aquecimento correu junto com a abertura da câmera
+    fases_inicializacao.marcar("espera_modelos")
     print("✅ Câmera ativa! Sistema de reconhecimento iniciado.")
     
     while camera_active:
-        ret, frame = cap.read()
-        if not ret:
-            print("❌ Erro ao capturar frame")
-            continue
+        # O governador decide se este frame é processado e/ou exibido
+        current_time = time.time()
+        processar = governador.deve_processar(current_time)
+        exibir = governador.deve_exibir(current_time) or processar
         
-        # Atualizar frame global
-        with frame_lock:
-            current_frame = frame.copy()
+        if processar or exibir:
+            ret, frame = camera.read(buffer_frame)
+        else:
+            # Frame descartado: só avança o buffer, sem decodificar
+            ret, frame = camera.grab(), None
+        if not ret:
+            if camera.encerrada:
+                break  # Fim do arquivo de vídeo
+            # Câmera instável ou reconectando: a leitura já esperou; só atende as teclas
+            processar = exibir = False
+        elif frame is not None:
+            buffer_frame = frame
         
-        # Processamento de reconhecimento facial
-        current_time = time.time()
-        if current_time - last_recognition_time > 0.5:  # Processar a cada 0.5 segundos
-            # Redimensionar para processamento mais rápido
-            small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-            rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-            
-            # Detectar rostos
-            face_locations = face_recognition.face_locations(rgb_small_frame)
-            face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
+        # Processamento de reconhecimento facial, na cadência do governador
+        if processar:
+            inicio_processamento = time.time()
+            with ETAPAS_CATRACA.cronometrar(etapa="movimento", catraca=NOME_CATRACA):
+                ha_movimento = movimento.verificar(frame, forcar=governador.presenca(inicio_processamento))
+            if ha_movimento:
+                face_locations, face_encodings, matches = reconhecer_frame(frame, detector, galeria)
+                governador.registrar(inicio_processamento, time.time() - inicio_processamento, len(face_locations))
+                if fases_inicializacao.marcar("primeiro_reconhecimento") is not None:
+                    apos_galeria = fases_inicializacao.desde("galeria") or 0.0
+                    print(f"⏱️ Inicialização: {fases_inicializacao.resumo()} "
+                          f"(primeiro reconhecimento {apos_galeria:.2f} s após a galeria)")
+                    fases_inicializacao.registrar(catraca=NOME_CATRACA, apos_galeria_ms=round(apos_galeria * 1000, 1))
+            else:
+                # Cena parada e ninguém na catraca: sem detecção nem encoding
+                FRAMES_CATRACA.inc(resultado="sem_movimento", catraca=NOME_CATRACA)
+                face_locations, face_encodings, matches = [], [], []
+                governador.pular(time.time())
             
             face_names = []
             face_distances = []
             
-            for face_encoding in face_encodings:
-                if len(known_face_encodings) > 0:
-                    # Comparar com rostos conhecidos
-                    distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-                    best_match_index = np.argmin(distances)
+            for face_encoding, (best_match_index, distance) in zip(face_encodings, matches):
+                if face_encoding is None:
+                    # Descartado pelo filtro de qualidade (já contado em registrar_descartes)
+                    face_names.append(ROSTO_BAIXA_QUALIDADE)
+                    face_distances.append(distance)
+                elif best_match_index >= 0 and distance <= FACE_MATCH_THRESHOLD:
+                    # Usuário reconhecido
+                    ROSTOS_CATRACA.inc(resultado="reconhecido", catraca=NOME_CATRACA)
+                    user_data = galeria.usuarios[best_match_index]
+                    face_names.append(user_data['nome'])
+                    face_distances.append(distance)
                     
-                    if distances[best_match_index] <= FACE_MATCH_THRESHOLD:
-                        # Usuário reconhecido
-                        user_data = known_user_data[best_match_index]
-                        face_names.append(user_data['nome'])
-                        face_distances.append(distances[best_match_index])
-                        
-                        # Registrar passagem (com cooldown)
-                        if current_time - last_recognition_time > RECOGNITION_COOLDOWN:
+                    # Registrar passagem (com cooldown)
+                    if current_time - last_recognition_time > RECOGNITION_COOLDOWN:
+                        with ETAPAS_CATRACA.cronometrar(etapa="registro", catraca=NOME_CATRACA):
                             tipo = determinar_tipo_acesso_db(user_data['cpf'])
                             registrar_acesso_db(user_data, "Identificado", tipo)
-                            print(f"👤 Pessoa identificada: {user_data['nome']} ({user_data['equipe']}) - {tipo}")
-                            last_recognition_time = current_time
-                    else:
-                        face_names.append("Desconhecido")
-                        face_distances.append(distances[best_match_index])
+                        evento(log, logging.INFO, "pessoa_identificada", catraca=NOME_CATRACA, pessoa=user_data['nome'],
+                               equipe=user_data['equipe'], tipo=tipo, distancia=round(float(distance), 3))
+                        last_recognition_time = current_time
+                        
+                        # Match de alta confiança vira template extra do usuário
+                        if distance <= LIMIAR_ADAPTACAO_TEMPLATE:
+                            adaptar_templates_usuario(best_match_index, face_encoding)
                 else:
+                    ROSTOS_CATRACA.inc(resultado="desconhecido", catraca=NOME_CATRACA)
                     face_names.append("Desconhecido")
-                    face_distances.append(1.0)
-            
-            # Escalar coordenadas de volta para frame original
-            face_locations = [(top * 4, right * 4, bottom * 4, left * 4) 
-                            for (top, right, bottom, left) in face_locations]
+                    face_distances.append(distance)
             
             # Desenhar interface de reconhecimento
+            inicio_desenho = time.perf_counter()
             if face_locations:
                 draw_recognition_interface(frame, face_locations, face_names, face_distances)
             else:
                 # Interface quando nenhum rosto detectado - apenas cabeçalho
-                overlay = frame.copy()
-                cv2.rectangle(overlay, (0, 0), (frame.shape[1], 80), (0, 0, 0), -1)
-                cv2.addWeighted(overlay, 0.4, frame, 0.6, 0, frame)
-                
-                cv2.putText(frame, "SISTEMA DE IDENTIFICACAO - CATRACA", (20, 30), cv2.FONT_HERSHEY_DUPLEX, 0.8, (255, 255, 255), 2)
-                cv2.putText(frame, f"Pessoas cadastradas: {len(known_face_encodings)} | Aguardando passagem...", 
-                            (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+                RENDERIZADOR.cabecalho(frame, "SISTEMA DE IDENTIFICACAO - CATRACA",
+                                       f"Pessoas cadastradas: {len(galeria)} | Aguardando passagem...", (255, 255, 0))
+            ETAPAS_CATRACA.observar(time.perf_counter() - inicio_desenho, etapa="desenho", catraca=NOME_CATRACA)
         
         # Mostrar frame
-        cv2.imshow('Catraca Virtual - Sistema Ativo', frame)
+        if exibir:
+            with ETAPAS_CATRACA.cronometrar(etapa="exibicao", catraca=NOME_CATRACA):
+                cv2.imshow('Catraca Virtual - Sistema Ativo', frame)
         
         # Verificar teclas
         key = cv2.waitKey(1) & 0xFF
@@ -411,7 +579,7 @@ def iniciar_camera_continua():
         elif key == ord('c') or key == ord('C'):
             # Parar câmera completamente para cadastro
             camera_active = False
-            cap.release()
+            camera.release()
             cv2.destroyAllWindows()
             print("\n📷 Câmera fechada para cadastro...")
             
@@ -426,7 +594,8 @@ def iniciar_camera_continua():
             parar_camera()
             break
     
-    cap.release()
+    camera.release()
+    evento(log, logging.INFO, "camera_estatisticas", catraca=NOME_CATRACA, **camera.estatisticas())
     cv2.destroyAllWindows()
     return True
 
@@ -460,49 +629,191 @@ def salvar_usuario_db(nome: str, equipe: str, cpf: str, foto_path: str) -> bool:
         print(f"❌ Erro ao salvar usuário no banco: {e}")
         return False
 
+def salvar_templates_db(usuario_id: int, encodings, origem: str, modelo: Optional[str] = None) -> None:
+    """
+    Salva encodings como templates do usuário (do modelo ativo, se `modelo`
+    não for informado), mantendo no máximo MAX_TEMPLATES_POR_USUARIO por modelo.
+    """
+    modelo = modelo or codificador_ativo().versao
+    try:
+        conn = sqlite3.connect(DB_FILE)
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT INTO templates (usuario_id, encoding, origem, modelo)
+            VALUES (?, ?, ?, ?)
+        ''', [(usuario_id, encoding_para_blob(e), origem, modelo) for e in encodings])
+        
+        # Descartar os templates mais antigos capturados na catraca (cadastro é preservado)
+        cursor.execute('''
+            DELETE FROM templates WHERE id IN (
+                SELECT id FROM templates
+                WHERE usuario_id = ? AND modelo = ? AND origem != 'cadastro'
+                ORDER BY id DESC LIMIT -1 OFFSET MAX(0, ? - (
+                    SELECT COUNT(*) FROM templates WHERE usuario_id = ? AND modelo = ? AND origem = 'cadastro'
+                ))
+            )
+        ''', (usuario_id, modelo, MAX_TEMPLATES_POR_USUARIO, usuario_id, modelo))
+        
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        print(f"❌ Erro ao salvar templates: {e}")
+
+def carregar_templates_db(usuario_id: Optional[int] = None, modelo: Optional[str] = None,
+                          conn: Optional[sqlite3.Connection] = None) -> Dict[int, List[np.ndarray]]:
+    """
+    Carrega os templates de um modelo (o ativo, por padrão) agrupados por
+    usuario_id. Com `conn`, lê dentro da transação aberta nela.
+    """
+    modelo = modelo or codificador_ativo().versao
+    templates = {}
+    propria = conn is None
+    if propria:
+        conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    if usuario_id is None:
+        cursor.execute('SELECT usuario_id, encoding FROM templates WHERE modelo = ? ORDER BY usuario_id, id', (modelo,))
+    else:
+        cursor.execute('SELECT usuario_id, encoding FROM templates WHERE modelo = ? AND usuario_id = ? ORDER BY id',
+                       (modelo, usuario_id))
+    
+    for uid, blob in cursor.fetchall():
+        templates.setdefault(uid, []).append(blob_para_encoding(blob))
+    if propria:
+        conn.close()
+    return templates
+
+def adaptar_templates_usuario(indice: int, encoding) -> None:
+    """Adiciona um match de alta confiança da catraca aos templates do usuário."""
+    global templates_adaptados
+    user_data = galeria.usuarios[indice]
+    salvar_templates_db(user_data['id'], [encoding], "catraca")
+    templates_adaptados = True
+    
+    # Galeria mapeada é somente leitura: o template novo entra quando o
+    # arquivo for regravado (atualizar_galeria_mapeada)
+    templates = carregar_templates_db(user_data['id']).get(user_data['id'])
+    if templates and galeria.templates:
+        galeria.substituir_templates(indice, templates)
+
+def verificar_duplicatas(encodings, galeria_atual: Optional[Galeria] = None) -> List[Dict]:
+    """
+    Compara os encodings de um cadastro novo com toda a galeria (busca
+    vetorizada) e retorna quem está a até LIMIAR_DUPLICATA, do mais próximo:
+    a matrícula é nova, mas o rosto provavelmente já está cadastrado.
+    """
+    galeria_atual = galeria if galeria_atual is None else galeria_atual
+    suspeitos = []
+    for indice, distancia in galeria_atual.suspeitos(encodings, LIMIAR_DUPLICATA):
+        usuario = galeria_atual.usuarios[indice]
+        suspeitos.append({**usuario, 'distancia': round(distancia, 3)})
+        evento(log, logging.WARNING, "possivel_duplicata", usuario_id=usuario.get('id'), cpf=usuario.get('cpf'),
+               distancia=round(distancia, 3), limiar=LIMIAR_DUPLICATA)
+    return suspeitos
+
 def carregar_usuarios_db():
     """Carrega usuários do banco de dados."""
-    global known_face_encodings, known_user_data
+    global galeria
+    galeria = carregar_galeria_db()
+
+def carregar_galeria_db() -> Galeria:
+    """
+    Abre a galeria direto do arquivo mapeado quando ele está em dia com o
+    banco e foi gerado pelo codificador ativo; senão monta a galeria do
+    banco e regrava o arquivo.
+    """
+    inicio = time.perf_counter()
+    galeria_mapeada = abrir_galeria_mapeada(ARQUIVO_GALERIA, DB_FILE, MODO_AGREGACAO_TEMPLATES,
+                                            precisao=PRECISAO_GALERIA, modelo=codificador_ativo().versao)
+    if galeria_mapeada is not None:
+        print(f"⚡ Galeria mapeada: {len(galeria_mapeada)} usuário(s) em "
+              f"{(time.perf_counter() - inicio) * 1000:.1f} ms")
+        return galeria_mapeada
     
-    known_face_encodings = []
-    known_user_data = []
+    return regravar_galeria_mapeada()
+
+def regravar_galeria_mapeada() -> Galeria:
+    """Monta a galeria do banco e regrava o arquivo mapeado com ela."""
+    galeria_nova, versao = montar_galeria_db()
+    try:
+        salvar_galeria_mapeada(galeria_nova, versao, ARQUIVO_GALERIA)
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ Não foi possível gravar {ARQUIVO_GALERIA}: {e}")
+    return galeria_nova
+
+def atualizar_galeria_mapeada() -> None:
+    """
+    Regrava o arquivo mapeado se a catraca adaptou templates nesta execução.
+    Esses templates não mudam a versão do banco (ver GATILHOS_VERSAO): sem
+    isso o arquivo continuaria valendo sem eles.
+    """
+    global templates_adaptados
+    if templates_adaptados:
+        templates_adaptados = False
+        print("💾 Atualizando a galeria mapeada com os templates adaptados...")
+        regravar_galeria_mapeada()
+
+def montar_galeria_db() -> Tuple[Galeria, int]:
+    """
+    Monta uma galeria nova com os usuários e os templates do codificador
+    ativo e retorna junto a versão do banco que ela reflete. Quem ainda não
+    tem templates desse modelo é codificado a partir dos chips do cadastro.
+    """
+    galeria_nova = Galeria(MODO_AGREGACAO_TEMPLATES, PRECISAO_GALERIA, modelo=codificador_ativo().versao)
+    versao = -1  # Nunca bate com o banco: se a leitura falhar, o arquivo não vale
     
     try:
+        # Versão, usuários e templates numa transação só: o que foi lido é
+        # exatamente o que a versão descreve, mesmo com cadastros em paralelo.
+        # Templates gerados abaixo mudam a versão; a próxima carga remonta uma vez
         conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT nome, equipe, cpf, foto_path FROM usuarios')
-        usuarios = cursor.fetchall()
-        conn.close()
+        try:
+            conn.execute('BEGIN')
+            versao = ler_versao(conn)
+            usuarios = conn.execute('SELECT id, nome, equipe, cpf, foto_path FROM usuarios').fetchall()
+            templates_db = carregar_templates_db(conn=conn)
+            conn.commit()
+        finally:
+            conn.close()
         
         print(f"📊 Carregando {len(usuarios)} usuário(s) do banco...")
         
-        for nome, equipe, cpf, foto_path in usuarios:
+        for usuario_id, nome, equipe, cpf, foto_path in usuarios:
             try:
-                if os.path.exists(foto_path):
-                    imagem = face_recognition.load_image_file(foto_path)
-                    encodings = face_recognition.face_encodings(imagem)
+                templates = templates_db.get(usuario_id)
+                
+                if not templates:
+                    if not os.path.exists(foto_path):
+                        evento(log, logging.WARNING, "foto_nao_encontrada", usuario_id=usuario_id, foto=foto_path)
+                        continue
                     
-                    if len(encodings) > 0:
-                        known_face_encodings.append(encodings[0])
-                        known_user_data.append({
-                            'nome': nome,
-                            'equipe': equipe, 
-                            'cpf': cpf,
-                            'foto_path': foto_path
-                        })
-                        print(f"✅ {nome} carregado")
-                    else:
-                        print(f"⚠️ Nenhum rosto encontrado na foto de {nome}")
+                    # Usa os chips alinhados (sem detecção); gera o chip na primeira carga
+                    templates = encodings_do_usuario(foto_path)
+                    if templates:
+                        salvar_templates_db(usuario_id, templates, "cadastro")
+                
+                if templates:
+                    galeria_nova.adicionar_usuario({
+                        'id': usuario_id,
+                        'nome': nome,
+                        'equipe': equipe, 
+                        'cpf': cpf,
+                        'foto_path': foto_path
+                    }, templates)
+                    evento(log, logging.DEBUG, "usuario_carregado", usuario_id=usuario_id, templates=len(templates))
                 else:
-                    print(f"❌ Foto não encontrada: {foto_path}")
-            except Exception as e:
-                print(f"❌ Erro ao carregar {nome}: {e}")
+                    evento(log, logging.WARNING, "usuario_sem_rosto", usuario_id=usuario_id, pessoa=nome)
+            except Exception:
+                evento(log, logging.ERROR, "erro_carregar_usuario", exc_info=True, usuario_id=usuario_id, pessoa=nome)
         
-        print(f"✅ {len(known_face_encodings)} usuário(s) prontos para reconhecimento")
+        print(f"✅ {len(galeria_nova)} usuário(s) prontos para reconhecimento")
         
     except Exception as e:
         print(f"❌ Erro ao carregar usuários do banco: {e}")
+    
+    return galeria_nova, versao
 
 def registrar_acesso_db(dados_usuario: dict, status: str, tipo: str = "N/A"):
     """Registra acesso no banco de dados."""
@@ -544,8 +855,8 @@ def determinar_tipo_acesso_db(cpf: str) -> str:
         
         cursor.execute('''
             SELECT tipo FROM acessos 
-            WHERE cpf = ? AND status = "Identificado"
-            ORDER BY data_hora DESC LIMIT 1
+            WHERE cpf = ? AND status = 'Identificado'
+            ORDER BY data_hora DESC, id DESC LIMIT 1
         ''', (cpf,))
         
         result = cursor.fetchone()
@@ -611,6 +922,17 @@ def cadastrar_usuario_db():
     if capturar_foto_simples(matricula_sanitizada, nome):
         foto_path = os.path.join(USUARIOS_DIR, matricula_sanitizada, "foto.jpg")
         
+        # Matrícula nova não garante pessoa nova: o rosto é comparado com a galeria inteira
+        suspeitos = verificar_duplicatas(carregar_encodings_chips(os.path.dirname(foto_path)))
+        if suspeitos:
+            print("⚠️ Este rosto é muito parecido com pessoa(s) já cadastrada(s):")
+            for suspeito in suspeitos:
+                print(f"   • {suspeito['nome']} (matrícula {suspeito['cpf']}) - distância {suspeito['distancia']:.3f}")
+            if input("Cadastrar mesmo assim? (s/N): ").strip().lower() != 's':
+                shutil.rmtree(os.path.dirname(foto_path), ignore_errors=True)
+                print("❌ Cadastro cancelado.")
+                return False
+        
         # Salvar no banco de dados
         if salvar_usuario_db(nome, equipe, matricula_sanitizada, foto_path):
             print(f"\n✅ {nome} cadastrado com sucesso!")
@@ -629,55 +951,56 @@ def capturar_foto_simples(matricula_sanitizada: str, nome: str) -> bool:
     """Captura foto de forma mais simples e direta."""
     print("🎥 Abrindo câmera...")
     
-    # Abrir câmera
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
+    # Abrir câmera (formato, resolução e buffer negociados em abrir_fonte)
+    cap = abrir_fonte(FONTE_CAMERA)
+    if cap is None:
         print("❌ Erro: Não foi possível abrir a câmera.")
         return False
 
-    # Configurar câmera
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-
+    backend = criar_detector(DETECTOR_BACKEND)
     print("📸 Câmera aberta! Posicione seu rosto e pressione ESPAÇO para capturar")
     print("🚫 Pressione ESC para cancelar")
     
     melhor_foto = None
     melhor_score = 0
+    candidatos = []
     
     while True:
         ret, frame = cap.read()
         if not ret:
             break
 
-        # Detectar rostos
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        face_locations = face_recognition.face_locations(rgb_frame)
+        # Detectar rostos (frame reduzido; caixas voltam na resolução original)
+        face_locations = detectar_rostos(frame, backend, ESCALA_CADASTRO)
         
-        # Preparar frame para exibição
-        display_frame = frame.copy()
+        # Preparar frame para exibição (desenho no próprio frame, depois das cópias)
+        display_frame = frame
         
         if len(face_locations) == 1:
             top, right, bottom, left = face_locations[0]
             
-            # Desenhar retângulo ao redor do rosto
-            cv2.rectangle(display_frame, (left, top), (right, bottom), (0, 255, 0), 3)
+            # Score de qualidade do rosto; frames reprovados não entram no cadastro
+            qualidade = avaliar_qualidade_cadastro(frame, face_locations[0])
+            score = qualidade['score']
             
-            # Calcular score baseado no tamanho do rosto
-            face_size = (right - left) * (bottom - top)
-            score = min(100, face_size / 15000 * 100)
+            if qualidade['aprovado']:
+                if score > melhor_score:
+                    melhor_score = score
+                    melhor_foto = frame.copy()
+                atualizar_candidatos(candidatos, score, frame, face_locations[0])
             
-            if score > melhor_score:
-                melhor_score = score
-                melhor_foto = frame.copy()
+            # Desenhar retângulo ao redor do rosto
+            color = (0, 255, 0) if qualidade['aprovado'] else (0, 165, 255)
+            cv2.rectangle(display_frame, (left, top), (right, bottom), color, 3)
             
             # Mostrar informações
+            status = "ROSTO DETECTADO" if qualidade['aprovado'] else ORIENTACOES[qualidade['motivo']]
             cv2.putText(display_frame, f"{nome}", (left, top - 40), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-            cv2.putText(display_frame, "ROSTO DETECTADO", (left, top - 10), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+            cv2.putText(display_frame, status, (left, top - 10), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
             cv2.putText(display_frame, f"Qualidade: {score:.0f}%", (left, bottom + 30), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
             
             # Instruções
             cv2.putText(display_frame, "ESPACO: Capturar Foto | ESC: Cancelar", 
@@ -711,12 +1034,11 @@ def capturar_foto_simples(matricula_sanitizada: str, nome: str) -> bool:
                 success = cv2.imwrite(caminho_foto, melhor_foto, [cv2.IMWRITE_JPEG_QUALITY, 95])
                 
                 if success:
-                    # Testar se o reconhecimento funciona
+                    # Gerar chip alinhado e testar se o reconhecimento funciona
                     try:
-                        test_image = face_recognition.load_image_file(caminho_foto)
-                        encodings = face_recognition.face_encodings(test_image)
-                        if len(encodings) > 0:
-                            print("✅ Foto processada com sucesso!")
+                        templates = salvar_chips_captura(caminho_usuario, candidatos)
+                        if templates > 0:
+                            print(f"✅ Foto processada com sucesso! Templates: {templates}")
                             cap.release()
                             cv2.destroyAllWindows()
                             return True
@@ -726,6 +1048,8 @@ def capturar_foto_simples(matricula_sanitizada: str, nome: str) -> bool:
                         print(f"❌ Erro ao processar foto: {e}")
                 else:
                     print("❌ Erro ao salvar foto.")
+            elif len(face_locations) == 1:
+                print(f"❌ Nenhum frame com qualidade suficiente ainda: {ORIENTACOES[qualidade['motivo']].lower()}.")
             else:
                 print("❌ Posicione apenas um rosto e tente novamente.")
 
@@ -738,98 +1062,29 @@ def cadastrar_usuario():
     cadastrar_usuario_db()
 
 
-def carregar_dados_usuarios():
-    """Carrega os encodings faciais e dados de todos os usuários cadastrados."""
-    known_face_encodings = []
-    known_user_data = []
-
-    if not os.path.exists(USUARIOS_DIR):
-        print(f"⚠️ Diretório {USUARIOS_DIR} não existe")
-        return known_face_encodings, known_user_data
-
-    usuarios_encontrados = os.listdir(USUARIOS_DIR)
-    print(f"📁 Verificando diretórios em {USUARIOS_DIR}: {usuarios_encontrados}")
-
-    for cpf_dir in usuarios_encontrados:
-        caminho_usuario = os.path.join(USUARIOS_DIR, cpf_dir)
-        if os.path.isdir(caminho_usuario):
-            print(f"👤 Processando usuário: {cpf_dir}")
-            try:
-                caminho_foto = os.path.join(caminho_usuario, "foto.jpg")
-                caminho_json = os.path.join(caminho_usuario, "dados.json")
-
-                # Verificar se os arquivos existem
-                if not os.path.exists(caminho_foto):
-                    print(f"❌ Foto não encontrada: {caminho_foto}")
-                    continue
-                    
-                if not os.path.exists(caminho_json):
-                    print(f"❌ Dados não encontrados: {caminho_json}")
-                    continue
-
-                # Carregar dados JSON
-                with open(caminho_json, 'r', encoding='utf-8') as f:
-                    dados = json.load(f)
-                print(f"✅ Dados carregados: {dados}")
-                
-                # Carregar e processar imagem
-                print(f"📸 Carregando foto: {caminho_foto}")
-                imagem = face_recognition.load_image_file(caminho_foto)
-                encodings = face_recognition.face_encodings(imagem)
-                
-                if len(encodings) == 0:
-                    print(f"❌ Nenhum rosto encontrado na foto de {dados.get('nome', cpf_dir)}")
-                    continue
-                elif len(encodings) > 1:
-                    print(f"⚠️ Múltiplos rostos encontrados na foto de {dados.get('nome', cpf_dir)}, usando o primeiro")
-                
-                encoding = encodings[0]
-                
-                known_face_encodings.append(encoding)
-                known_user_data.append(dados)
-                print(f"✅ Usuário {dados.get('nome', cpf_dir)} carregado com sucesso")
-                
-            except Exception as e:
-                print(f"❌ Erro ao carregar dados do usuário {cpf_dir}: {e}")
-                import traceback
-                traceback.print_exc()
-
-    print(f"📊 Total de usuários carregados: {len(known_face_encodings)}")
-    return known_face_encodings, known_user_data
+def carregar_dados_usuarios() -> Galeria:
+    """
+    Importa os cadastros legados (usuarios/*/dados.json e acessos.csv) que
+    ainda não estão no banco e carrega a galeria a partir dele.
+    """
+    resumo = importar_legado(DB_FILE, USUARIOS_DIR, LOG_FILE)
+    if resumo['usuarios_inseridos'] or resumo['acessos_importados']:
+        print(f"📥 Importados do legado: {resumo['usuarios_inseridos']} usuário(s), "
+              f"{resumo['acessos_importados']} acesso(s)")
+    
+    galeria_legado = carregar_galeria_db()
+    print(f"📊 Total de usuários carregados: {len(galeria_legado)}")
+    return galeria_legado
 
 def registrar_acesso(dados_usuario, status, tipo="N/A"):
-    """Registra uma tentativa de acesso (autorizada ou negada) no arquivo CSV."""
+    """Registra uma tentativa de acesso (autorizada ou negada); o acessos.csv legado só é lido pela importação."""
+    registrar_acesso_db(dados_usuario, status, tipo)
     agora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    nome = dados_usuario.get('nome', 'Desconhecido')
-    equipe = dados_usuario.get('equipe', 'N/A')
-    cpf = dados_usuario.get('cpf', 'N/A')
-
-    with open(LOG_FILE, mode='a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow([nome, equipe, cpf, agora, tipo, status])
-    
-    print(f"Registro de acesso: {status} para {nome} às {agora}")
+    print(f"Registro de acesso: {status} para {dados_usuario.get('nome', 'Desconhecido')} às {agora}")
 
 def determinar_tipo_acesso(cpf: str) -> str:
-    """Verifica o último acesso do usuário para determinar se é ENTRADA ou SAÍDA."""
-    ultimo_tipo = "SAÍDA" # Default para primeiro acesso
-    try:
-        with open(LOG_FILE, mode='r', newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            logs_usuario = [
-                row for row in reader 
-                if row["CPF"] == cpf and row["Status"] == "Identificado"
-            ]
-            if logs_usuario:
-                ultimo_log = logs_usuario[-1]
-                if ultimo_log["Tipo"] == "ENTRADA":
-                    ultimo_tipo = "ENTRADA"
-
-    except FileNotFoundError:
-        return "ENTRADA"
-
-    return "SAÍDA" if ultimo_tipo == "ENTRADA" else "ENTRADA"
+    """Verifica o último acesso do usuário para determinar se é ENTRADA ou SAÍDA (consulta indexada)."""
+    return determinar_tipo_acesso_db(cpf)
 
 
 def validar_acesso():
@@ -837,13 +1092,13 @@ def validar_acesso():
     print("\n--- Validando Acesso ---")
     print("Carregando dados dos usuários...")
     
-    known_face_encodings, known_user_data = carregar_dados_usuarios()
+    galeria_legado = carregar_dados_usuarios()
 
-    if not known_face_encodings:
+    if not len(galeria_legado):
         print("❌ Nenhum usuário cadastrado. Cadastre alguém primeiro.")
         return
     
-    print(f"✅ {len(known_face_encodings)} usuário(s) carregado(s)")
+    print(f"✅ {len(galeria_legado)} usuário(s) carregado(s)")
 
     print("Tentando abrir a webcam...")
     
@@ -877,19 +1132,19 @@ def validar_acesso():
     while True:
         ret, frame = cap.read()
         if not ret:
-            print("❌ Erro ao capturar frame da câmera")
+            evento(log, logging.ERROR, "falha_captura")
             break
 
         # Processamento mais rápido - reduzir tamanho
         rgb_small_frame = cv2.cvtColor(cv2.resize(frame, (0, 0), fx=0.25, fy=0.25), cv2.COLOR_BGR2RGB)
         
-        face_locations = face_recognition.face_locations(rgb_small_frame)
-        face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
+        face_locations = localizar_rostos(rgb_small_frame)
+        face_encodings = codificar_rostos(rgb_small_frame, face_locations)
 
         # Mostrar status na tela
         status_text = f"Rostos detectados: {len(face_locations)}"
         cv2.putText(frame, status_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        cv2.putText(frame, f"Usuarios cadastrados: {len(known_face_encodings)}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.putText(frame, f"Usuarios cadastrados: {len(galeria_legado)}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
 
         if len(face_locations) == 0:
             frames_sem_rosto += 1
@@ -897,26 +1152,25 @@ def validar_acesso():
         else:
             frames_sem_rosto = 0
 
-        for face_encoding, face_location in zip(face_encodings, face_locations):
-            # Calcular distâncias para todos os usuários conhecidos
-            distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-            melhor_match_idx = np.argmin(distances)
-            melhor_distancia = distances[melhor_match_idx]
+        for (melhor_match_idx, melhor_distancia), face_location in zip(galeria_legado.buscar(face_encodings),
+                                                                       face_locations):
             
             # Escalar coordenadas de volta para o frame original
             top, right, bottom, left = [i * 4 for i in face_location]
             
-            print(f"Distância do melhor match: {melhor_distancia:.3f} (threshold: {FACE_MATCH_THRESHOLD})")
+            evento_amostrado(log, logging.DEBUG, "distancia_melhor_match", distancia=round(float(melhor_distancia), 3),
+                             limiar=FACE_MATCH_THRESHOLD)
             
             if melhor_distancia <= FACE_MATCH_THRESHOLD:
-                dados_usuario = known_user_data[melhor_match_idx]
+                dados_usuario = galeria_legado.usuarios[melhor_match_idx]
                 
                 # Desenha um retângulo verde e exibe o nome
                 cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 3)
                 cv2.putText(frame, dados_usuario['nome'], (left + 6, bottom - 6), cv2.FONT_HERSHEY_DUPLEX, 0.8, (0, 255, 0), 2)
                 cv2.putText(frame, f"Match: {melhor_distancia:.3f}", (left + 6, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
                 
-                print(f"✅ Usuário reconhecido: {dados_usuario['nome']} (distância: {melhor_distancia:.3f})")
+                evento(log, logging.INFO, "usuario_reconhecido", pessoa=dados_usuario['nome'],
+                       distancia=round(float(melhor_distancia), 3))
                 tipo = determinar_tipo_acesso(dados_usuario['cpf'])
                 registrar_acesso(dados_usuario, "Identificado", tipo)
                 print(f"🚪 Acesso Liberado! Tipo: {tipo}")
@@ -1080,9 +1334,16 @@ def menu_sistema():
 
 def main():
     """Função principal do sistema."""
+    configurar_eventos()
+    fases_inicializacao.marcar("importacoes")
     print("🚀 Iniciando Sistema de Identificação - Catraca...")
+    configurar_codificador(CODIFICADOR_BACKEND)
+    aquecer_em_segundo_plano(DETECTOR_BACKEND)  # Modelos do dlib carregam enquanto banco, galeria e câmera sobem
     setup()
+    fases_inicializacao.marcar("banco")
     carregar_usuarios_db()
+    fases_inicializacao.marcar("galeria")
+    iniciar_exportacao()  # Snapshot das métricas para o /metrics do servidor web
     
     print("\n✅ Sistema pronto!")
     print("💡 A câmera ficará ativa para identificação automática de pessoas.")
@@ -1107,6 +1368,7 @@ def main():
         menu_sistema()
     finally:
         parar_camera()
+        atualizar_galeria_mapeada()
         print("👋 Sistema finalizado.")
 
 # Funções de compatibilidade para manter compatibilidade com versão anterior
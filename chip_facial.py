@@ -0,0 +1,130 @@
+# chip_facial.py
+# Chip facial alinhado (estilo dlib, 150x150) e marcos faciais por usuário
+
+import os
+import glob
+import json
+import cv2
+import numpy as np
+from typing import List, Optional, Tuple
+
+from modelos_face import localizar_rostos, carregar_imagem, preditor_5_pontos
+
+# --- CONFIGURAÇÕES DO CHIP ---
+CHIP_TAMANHO = 150          # Mesmo tamanho usado internamente pelo encoder do dlib
+CHIP_PADDING = 0.25         # Mesmo padding usado pelo compute_face_descriptor
+CHIP_ARQUIVO = "rosto.jpg"
+LANDMARKS_ARQUIVO = "landmarks.json"
+CHIP_QUALIDADE_JPEG = 95
+
+
+def _nome_arquivo(nome_base: str, indice: int) -> str:
+    """rosto.jpg para o chip principal; rosto_2.jpg, rosto_3.jpg... para os extras."""
+    if indice <= 1:
+        return nome_base
+    raiz, extensao = os.path.splitext(nome_base)
+    return f"{raiz}_{indice}{extensao}"
+
+
+def gerar_chip(imagem_rgb: np.ndarray, face_location: Optional[Tuple[int, int, int, int]] = None):
+    """
+    Gera o chip facial alinhado a partir de uma imagem RGB.
+
+    Se `face_location` (top, right, bottom, left) não for informado, roda a
+    detecção uma única vez. Retorna (chip_rgb, dados_landmarks) ou None.
+    """
+    if face_location is None:
+        face_locations = localizar_rostos(imagem_rgb)
+        if len(face_locations) == 0:
+            return None
+        # Usar o maior rosto encontrado
+        face_location = max(face_locations, key=lambda l: (l[1] - l[3]) * (l[2] - l[0]))
+
+    import dlib
+    top, right, bottom, left = [int(v) for v in face_location]
+    shape = preditor_5_pontos()(imagem_rgb, dlib.rectangle(left, top, right, bottom))
+    chip = dlib.get_face_chip(imagem_rgb, shape, size=CHIP_TAMANHO, padding=CHIP_PADDING)
+
+    dados = {
+        'tamanho': CHIP_TAMANHO,
+        'padding': CHIP_PADDING,
+        'face_location': [top, right, bottom, left],
+        'pontos': [[shape.part(i).x, shape.part(i).y] for i in range(shape.num_parts)],
+        'dimensoes_origem': list(imagem_rgb.shape[:2]),
+    }
+    return chip, dados
+
+
+def salvar_chip(caminho_usuario: str, imagem_rgb: np.ndarray,
+                face_location: Optional[Tuple[int, int, int, int]] = None,
+                indice: int = 1) -> bool:
+    """Salva rosto.jpg (chip alinhado) e landmarks.json no diretório do usuário."""
+    resultado = gerar_chip(imagem_rgb, face_location)
+    if resultado is None:
+        return False
+
+    chip, dados = resultado
+    return gravar_chip(caminho_usuario, chip, dados, indice)
+
+
+def gravar_chip(caminho_usuario: str, chip: np.ndarray, dados: dict, indice: int = 1) -> bool:
+    """Grava um chip já gerado e seus marcos faciais em disco."""
+    os.makedirs(caminho_usuario, exist_ok=True)
+
+    caminho_chip = os.path.join(caminho_usuario, _nome_arquivo(CHIP_ARQUIVO, indice))
+    chip_bgr = cv2.cvtColor(chip, cv2.COLOR_RGB2BGR)
+    if not cv2.imwrite(caminho_chip, chip_bgr, [cv2.IMWRITE_JPEG_QUALITY, CHIP_QUALIDADE_JPEG]):
+        return False
+
+    caminho_landmarks = os.path.join(caminho_usuario, _nome_arquivo(LANDMARKS_ARQUIVO, indice))
+    with open(caminho_landmarks, 'w', encoding='utf-8') as f:
+        json.dump(dados, f)
+
+    return True
+
+
+def listar_chips(caminho_usuario: str) -> List[str]:
+    """Lista os chips do usuário (principal primeiro)."""
+    principal = os.path.join(caminho_usuario, CHIP_ARQUIVO)
+    raiz, extensao = os.path.splitext(CHIP_ARQUIVO)
+    extras = sorted(glob.glob(os.path.join(caminho_usuario, f"{raiz}_*{extensao}")))
+    return ([principal] if os.path.exists(principal) else []) + extras
+
+
+def encoding_do_chip(chip_rgb: np.ndarray) -> np.ndarray:
+    """Calcula o encoding de um chip já alinhado (sem detecção nem landmarks) no codificador ativo."""
+    from codificacao import codificar_chips  # codificacao importa este módulo
+    return codificar_chips([chip_rgb])[0]
+
+
+def carregar_encodings_chips(caminho_usuario: str) -> List[np.ndarray]:
+    """Carrega todos os chips do usuário e retorna seus encodings (uma chamada em lote)."""
+    from codificacao import codificar_chips
+    chips = [carregar_imagem(c) for c in listar_chips(caminho_usuario)]
+    return list(codificar_chips([c for c in chips if c.shape[:2] == (CHIP_TAMANHO, CHIP_TAMANHO)]))
+
+
+def encodings_do_usuario(foto_path: str) -> List[np.ndarray]:
+    """
+    Retorna os encodings do usuário dono de `foto_path` (um por chip).
+
+    Usa os chips alinhados quando existem; caso contrário detecta o rosto na
+    foto completa uma única vez e já grava o chip para as próximas cargas.
+    """
+    caminho_usuario = os.path.dirname(foto_path)
+
+    encodings = carregar_encodings_chips(caminho_usuario)
+    if encodings:
+        return encodings
+
+    if not os.path.exists(foto_path):
+        return []
+
+    imagem = carregar_imagem(foto_path)
+    resultado = gerar_chip(imagem)
+    if resultado is None:
+        return []
+
+    chip, dados = resultado
+    gravar_chip(caminho_usuario, chip, dados)
+    return [encoding_do_chip(chip)]
@@ -0,0 +1,242 @@
+# codificacao.py
+# Backends de encoding selecionáveis (ResNet do dlib, SFace do OpenCV) e
+# encoding em lote: junta rostos de vários frames/rastros e calcula os
+# embeddings numa única chamada, entregando o lote inteiro à galeria
+
+import os
+import cv2
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+from chip_facial import CHIP_TAMANHO, CHIP_PADDING
+from modelos_face import preditor_5_pontos, codificador
+from galeria import Galeria, DIMENSAO_ENCODING
+from qualidade import avaliar_rosto
+from deteccao import MODELOS_DIR
+
+# --- MODELOS DOS BACKENDS OPENCV ---
+MODELO_SFACE = os.path.join(MODELOS_DIR, "face_recognition_sface_2021dec.onnx")
+SFACE_TAMANHO = 112
+
+# Olhos no recorte 112x112 do ArcFace, em que o SFace foi treinado
+OLHOS_ARCFACE = np.array([[38.2946, 51.6963], [73.5318, 51.5014]])
+
+# Cantos dos olhos do preditor de 5 pontos no chip do dlib (get_face_chip_details),
+# em frações da face antes do padding: pontos 0-1 à direita da imagem, 2-3 à esquerda
+CANTOS_OLHOS_DLIB = np.array([[0.8595674595992, 0.2134981538014], [0.6460604764104, 0.2289674387677],
+                              [0.1205750620789, 0.2137274526848], [0.3340850613712, 0.2290642403242]])
+
+
+# --- BACKENDS DE ENCODING ---
+
+class CodificadorRostos:
+    """
+    Interface comum dos encoders: recebe chips RGB alinhados pelo dlib
+    (CHIP_TAMANHO, com CHIP_PADDING, o mesmo formato gravado no cadastro) e
+    devolve uma matriz B x DIMENSAO_ENCODING.
+
+    `versao` identifica o modelo nos templates e na galeria mapeada:
+    encodings de versões diferentes não são comparáveis e nunca se misturam.
+    `limiar`, `limiar_adaptacao` e `limiar_duplicata` (cadastros que parecem
+    ser a mesma pessoa) estão na escala de distância do backend.
+    """
+
+    nome = "base"
+    versao = "base"
+    limiar = 0.6
+    limiar_adaptacao = 0.4
+    limiar_duplicata = 0.5
+
+    def codificar(self, chips: List[np.ndarray]) -> np.ndarray:
+        raise NotImplementedError
+
+    def aquecer(self) -> None:
+        """Carrega o modelo e roda um encoding de descarte."""
+        self.codificar([np.zeros((CHIP_TAMANHO, CHIP_TAMANHO, 3), np.uint8)])
+
+
+class CodificadorDlib(CodificadorRostos):
+    """ResNet do dlib (o mesmo encoder do face_recognition), distância euclidiana."""
+
+    nome = "dlib"
+    versao = "dlib_resnet_v1"
+    limiar = 0.6
+    limiar_adaptacao = 0.4
+    limiar_duplicata = 0.5
+
+    def codificar(self, chips: List[np.ndarray]) -> np.ndarray:
+        return np.array([np.array(d) for d in codificador().compute_face_descriptor(chips)])
+
+
+class CodificadorSFace(CodificadorRostos):
+    """
+    SFace (ONNX) pelo módulo DNN do OpenCV na CPU. Os chips do dlib são
+    reamostrados para o recorte 112x112 do ArcFace pelos olhos; como o chip
+    corta a testa, o topo do recorte fica preto, igual no cadastro e na
+    catraca. Os embeddings saem normalizados: a distância euclidiana é
+    sqrt(2 - 2·cosseno), e o limiar 1.128 equivale ao cosseno 0.363
+    recomendado para o modelo.
+    """
+
+    nome = "sface"
+    versao = "sface_2021dec"
+    limiar = 1.128
+    limiar_adaptacao = 0.9
+    limiar_duplicata = 1.0  # Cosseno 0.5
+
+    def __init__(self, modelo: str = MODELO_SFACE):
+        if not os.path.exists(modelo):
+            raise FileNotFoundError(f"Modelo SFace não encontrado: {modelo}")
+        self.rede = cv2.FaceRecognizerSF.create(modelo, "")
+        self.transformacao = self._transformacao_chip()
+
+    @staticmethod
+    def _transformacao_chip() -> np.ndarray:
+        """Similaridade (escala, rotação, translação) que leva os olhos do chip do dlib aos do ArcFace."""
+        cantos = (CANTOS_OLHOS_DLIB + CHIP_PADDING) / (2 * CHIP_PADDING + 1) * CHIP_TAMANHO
+        olhos = np.array([cantos[2:].mean(axis=0), cantos[:2].mean(axis=0)])  # Esquerdo, direito na imagem
+        # Pontos como complexos: escala * rotação vira uma única multiplicação
+        origem = olhos[:, 0] + 1j * olhos[:, 1]
+        destino = OLHOS_ARCFACE[:, 0] + 1j * OLHOS_ARCFACE[:, 1]
+        escala = (destino[1] - destino[0]) / (origem[1] - origem[0])
+        deslocamento = destino[0] - escala * origem[0]
+        return np.array([[escala.real, -escala.imag, deslocamento.real],
+                         [escala.imag, escala.real, deslocamento.imag]])
+
+    def codificar(self, chips: List[np.ndarray]) -> np.ndarray:
+        encodings = np.empty((len(chips), DIMENSAO_ENCODING), dtype=np.float64)
+        for i, chip in enumerate(chips):
+            recorte = cv2.warpAffine(chip, self.transformacao, (SFACE_TAMANHO, SFACE_TAMANHO))
+            encodings[i] = self.rede.feature(cv2.cvtColor(recorte, cv2.COLOR_RGB2BGR)).ravel()
+        return encodings / np.linalg.norm(encodings, axis=1, keepdims=True)
+
+
+CODIFICADORES: Dict[str, type] = {
+    CodificadorDlib.nome: CodificadorDlib,
+    CodificadorSFace.nome: CodificadorSFace,
+}
+
+_ativo: Optional[CodificadorRostos] = None
+
+
+def criar_codificador(nome: str = "dlib") -> CodificadorRostos:
+    """Instancia o backend de encoding pelo nome (dlib, sface)."""
+    if nome not in CODIFICADORES:
+        raise ValueError(f"Codificador desconhecido: {nome}. Opções: {', '.join(CODIFICADORES)}")
+    return CODIFICADORES[nome]()
+
+
+def definir_codificador(nome: str) -> CodificadorRostos:
+    """Troca o backend usado por codificar_chips/codificar_rostos neste processo."""
+    global _ativo
+    if _ativo is None or _ativo.nome != nome:
+        _ativo = criar_codificador(nome)
+    return _ativo
+
+
+def codificador_ativo() -> CodificadorRostos:
+    """Backend em uso (dlib até alguém chamar definir_codificador)."""
+    return _ativo if _ativo is not None else definir_codificador(CodificadorDlib.nome)
+
+
+# --- ENCODING EM LOTE ---
+
+
+def extrair_chips_com_pontos(imagem_rgb: np.ndarray, face_locations) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+    """Como extrair_chips, devolvendo também os 5 marcos (x, y) de cada rosto no frame."""
+    if not face_locations:
+        return [], []
+
+    import dlib
+    preditor = preditor_5_pontos()
+    shapes = dlib.full_object_detections()
+    for top, right, bottom, left in face_locations:
+        shapes.append(preditor(imagem_rgb, dlib.rectangle(int(left), int(top), int(right), int(bottom))))
+    chips = list(dlib.get_face_chips(imagem_rgb, shapes, size=CHIP_TAMANHO, padding=CHIP_PADDING))
+    pontos = [np.array([(p.x, p.y) for p in shape.parts()], dtype=np.float64) for shape in shapes]
+    return chips, pontos
+
+
+def extrair_chips(imagem_rgb: np.ndarray, face_locations) -> List[np.ndarray]:
+    """Alinha cada rosto (landmarks de 5 pontos) e devolve os chips 150x150."""
+    return extrair_chips_com_pontos(imagem_rgb, face_locations)[0]
+
+
+def chips_com_qualidade(imagem_rgb: np.ndarray, face_locations) -> Tuple[List[np.ndarray], List[Dict]]:
+    """Chips alinhados e a avaliação de qualidade de cada rosto (reaproveita os mesmos marcos)."""
+    chips, pontos = extrair_chips_com_pontos(imagem_rgb, face_locations)
+    return chips, [avaliar_rosto(chip, p, loc) for chip, p, loc in zip(chips, pontos, face_locations)]
+
+
+def codificar_chips(chips: List[np.ndarray], backend: Optional[CodificadorRostos] = None) -> np.ndarray:
+    """Calcula os encodings de vários chips numa única chamada (matriz B x 128)."""
+    if not chips:
+        return np.empty((0, DIMENSAO_ENCODING), dtype=np.float64)
+    return (backend or codificador_ativo()).codificar(chips)
+
+
+def codificar_rostos(imagem_rgb: np.ndarray, face_locations,
+                     backend: Optional[CodificadorRostos] = None) -> np.ndarray:
+    """Equivalente em lote de face_recognition.face_encodings(imagem, face_locations)."""
+    return codificar_chips(extrair_chips(imagem_rgb, face_locations), backend)
+
+
+class LoteEncoding:
+    """
+    Acumula rostos de vários frames (ou câmeras) e processa tudo de uma vez:
+    um único encoding em lote e uma única busca vetorizada na galeria.
+
+    Cada rosto carrega um `contexto` livre (ex.: id do frame, câmera, rastro)
+    que volta junto do resultado. Com `filtrar`, rostos reprovados pelo
+    filtro de qualidade não entram no lote.
+    """
+
+    def __init__(self, tamanho_maximo: int = 16, filtrar: bool = True):
+        self.tamanho_maximo = tamanho_maximo
+        self.filtrar = filtrar
+        self.chips: List[np.ndarray] = []
+        self.itens: List[Tuple[Any, Tuple[int, int, int, int]]] = []
+
+    def __len__(self):
+        return len(self.chips)
+
+    @property
+    def cheio(self) -> bool:
+        return len(self.chips) >= self.tamanho_maximo
+
+    def adicionar(self, imagem_rgb: np.ndarray, face_locations, contexto: Any = None) -> List[Dict]:
+        """
+        Extrai os chips dos rostos do frame e enfileira os aprovados no lote.
+        Retorna a avaliação de qualidade de todos os rostos (vazia sem filtro).
+        """
+        if not self.filtrar:
+            self.chips.extend(extrair_chips(imagem_rgb, face_locations))
+            self.itens.extend((contexto, tuple(loc)) for loc in face_locations)
+            return []
+
+        chips, qualidades = chips_com_qualidade(imagem_rgb, face_locations)
+        for chip, qualidade, loc in zip(chips, qualidades, face_locations):
+            if qualidade['aprovado']:
+                self.chips.append(chip)
+                self.itens.append((contexto, tuple(loc)))
+        return qualidades
+
+    def processar(self, galeria: Galeria) -> List[Dict]:
+        """Codifica o lote, compara com a galeria e esvazia a fila."""
+        if not self.chips:
+            return []
+
+        encodings = codificar_chips(self.chips)
+        matches = galeria.buscar(encodings)
+
+        resultados = [{
+            'contexto': contexto,
+            'location': location,
+            'encoding': encoding,
+            'indice': indice,
+            'distancia': distancia,
+        } for (contexto, location), encoding, (indice, distancia) in zip(self.itens, encodings, matches)]
+
+        self.chips = []
+        self.itens = []
+        return resultados
@@ -0,0 +1,249 @@
+# deteccao.py
+# Detectores de rosto selecionáveis (HOG, CNN, YuNet, SSD, Haar) e detecção
+# restrita à região da catraca (ROI) com escala adaptativa
+
+import os
+import cv2
+import numpy as np
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from modelos_face import localizar_rostos
+
+# --- MODELOS DOS BACKENDS OPENCV ---
+MODELOS_DIR = "modelos"
+MODELO_YUNET = os.path.join(MODELOS_DIR, "face_detection_yunet_2023mar.onnx")
+MODELO_SSD_PROTOTXT = os.path.join(MODELOS_DIR, "deploy.prototxt")
+MODELO_SSD_PESOS = os.path.join(MODELOS_DIR, "res10_300x300_ssd_iter_140000.caffemodel")
+CONFIANCA_MINIMA = 0.6             # Score mínimo para YuNet e SSD
+
+# --- CONFIGURAÇÕES DE DETECÇÃO ---
+ROI_PADRAO = (0.0, 0.0, 1.0, 1.0)  # (x0, y0, x1, y1) em frações do frame
+ESCALAS_BUSCA = (0.25,)            # Alternadas com a catraca vazia (com upsample); 0.4 custa ~2,6x, só se quiser pegar rostos ao fundo
+ESCALA_MIN = 0.15                  # Limites da escala escolhida a partir dos rostos
+ESCALA_MAX = 0.75
+TAMANHO_ALVO_ROSTO = 100           # Altura (px) desejada do rosto na imagem reduzida
+HISTORICO_ROSTOS = 8               # Nº de detecções recentes consideradas
+TICKS_PARA_BUSCA = 3               # Detecções vazias seguidas até voltar à busca
+MARGEM_REFINO = 0.3                # Margem do recorte usado no refinamento
+
+
+# --- BACKENDS DE DETECÇÃO ---
+
+class DetectorRostos:
+    """
+    Interface comum dos detectores: recebe uma imagem BGR e devolve caixas
+    (top, right, bottom, left) nas coordenadas dessa imagem.
+
+    `upsample` segue a semântica do face_recognition: cada passo dobra a
+    resolução para achar rostos menores.
+    """
+
+    nome = "base"
+
+    def detectar(self, imagem_bgr, upsample: int = 0) -> List[Tuple[int, int, int, int]]:
+        fator = 2 ** upsample
+        if fator > 1:
+            imagem_bgr = cv2.resize(imagem_bgr, (0, 0), fx=fator, fy=fator, interpolation=cv2.INTER_LINEAR)
+
+        altura, largura = imagem_bgr.shape[:2]
+        caixas = []
+        for (x, y, w, h) in self._caixas_xywh(imagem_bgr):
+            top, left = max(0, int(y)), max(0, int(x))
+            bottom, right = min(altura, int(y + h)), min(largura, int(x + w))
+            if bottom > top and right > left:
+                caixas.append((top // fator, right // fator, bottom // fator, left // fator))
+        return caixas
+
+    def _caixas_xywh(self, imagem_bgr):
+        raise NotImplementedError
+
+
+class DetectorHOG(DetectorRostos):
+    """HOG + SVM do dlib (padrão do face_recognition)."""
+
+    nome = "hog"
+    modelo_dlib = "hog"
+
+    def detectar(self, imagem_bgr, upsample: int = 0) -> List[Tuple[int, int, int, int]]:
+        rgb = cv2.cvtColor(imagem_bgr, cv2.COLOR_BGR2RGB)
+        return localizar_rostos(rgb, upsample, self.modelo_dlib)
+
+
+class DetectorCNN(DetectorHOG):
+    """CNN MMOD do dlib na CPU: mais robusto a pose, bem mais lento que o HOG."""
+
+    nome = "cnn"
+    modelo_dlib = "cnn"
+
+
+class DetectorYuNet(DetectorRostos):
+    """Detector YuNet do OpenCV (cv2.FaceDetectorYN, modelo ONNX)."""
+
+    nome = "yunet"
+
+    def __init__(self, modelo: str = MODELO_YUNET, confianca: float = CONFIANCA_MINIMA):
+        if not os.path.exists(modelo):
+            raise FileNotFoundError(f"Modelo YuNet não encontrado: {modelo}")
+        self.rede = cv2.FaceDetectorYN.create(modelo, "", (320, 320), confianca)
+
+    def _caixas_xywh(self, imagem_bgr):
+        altura, largura = imagem_bgr.shape[:2]
+        self.rede.setInputSize((largura, altura))
+        _, faces = self.rede.detect(imagem_bgr)
+        return [] if faces is None else [f[:4] for f in faces]
+
+
+class DetectorSSD(DetectorRostos):
+    """SSD ResNet-10 300x300 do módulo DNN do OpenCV (Caffe)."""
+
+    nome = "ssd"
+
+    def __init__(self, prototxt: str = MODELO_SSD_PROTOTXT, pesos: str = MODELO_SSD_PESOS,
+                 confianca: float = CONFIANCA_MINIMA):
+        for caminho in (prototxt, pesos):
+            if not os.path.exists(caminho):
+                raise FileNotFoundError(f"Modelo SSD não encontrado: {caminho}")
+        self.rede = cv2.dnn.readNetFromCaffe(prototxt, pesos)
+        self.confianca = confianca
+
+    def _caixas_xywh(self, imagem_bgr):
+        altura, largura = imagem_bgr.shape[:2]
+        blob = cv2.dnn.blobFromImage(imagem_bgr, 1.0, (300, 300), (104.0, 177.0, 123.0))
+        self.rede.setInput(blob)
+        deteccoes = self.rede.forward()[0, 0]
+        deteccoes = deteccoes[deteccoes[:, 2] >= self.confianca]
+        caixas = deteccoes[:, 3:7] * np.array([largura, altura, largura, altura])
+        return [(x0, y0, x1 - x0, y1 - y0) for (x0, y0, x1, y1) in caixas]
+
+
+class DetectorHaar(DetectorRostos):
+    """Cascata de Haar do OpenCV: a mais barata e a menos precisa."""
+
+    nome = "haar"
+
+    def __init__(self, cascata: str = "haarcascade_frontalface_default.xml"):
+        self.classificador = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, cascata))
+        if self.classificador.empty():
+            raise FileNotFoundError(f"Cascata de Haar não encontrada: {cascata}")
+
+    def _caixas_xywh(self, imagem_bgr):
+        cinza = cv2.cvtColor(imagem_bgr, cv2.COLOR_BGR2GRAY)
+        return self.classificador.detectMultiScale(cinza, scaleFactor=1.1, minNeighbors=5, minSize=(40, 40))
+
+
+DETECTORES: Dict[str, type] = {
+    DetectorHOG.nome: DetectorHOG,
+    DetectorCNN.nome: DetectorCNN,
+    DetectorYuNet.nome: DetectorYuNet,
+    DetectorSSD.nome: DetectorSSD,
+    DetectorHaar.nome: DetectorHaar,
+}
+
+
+def criar_detector(nome: str = "hog") -> DetectorRostos:
+    """Instancia o backend de detecção pelo nome (hog, cnn, yunet, ssd, haar)."""
+    if nome not in DETECTORES:
+        raise ValueError(f"Detector desconhecido: {nome}. Opções: {', '.join(DETECTORES)}")
+    return DETECTORES[nome]()
+
+
+def detectar_rostos(frame_bgr, backend: DetectorRostos, escala: float = 1.0,
+                    upsample: int = 0) -> List[Tuple[int, int, int, int]]:
+    """Detecta rostos numa versão reduzida do frame e devolve caixas no frame original."""
+    if escala == 1.0:
+        return backend.detectar(frame_bgr, upsample)
+
+    pequena = cv2.resize(frame_bgr, (0, 0), fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+    return [(int(t / escala), int(r / escala), int(b / escala), int(l / escala))
+            for (t, r, b, l) in backend.detectar(pequena, upsample)]
+
+
+# --- DETECÇÃO ADAPTATIVA NA CATRACA ---
+
+class DetectorAdaptativo:
+    """
+    Detector (HOG por padrão) que roda apenas sobre a ROI da catraca e escolhe a escala a
+    partir do tamanho dos rostos vistos recentemente.
+
+    - Catraca vazia: alterna as escalas de busca com upsample (0.25 equivale
+      ao fx=0.25 antigo), só na ROI. Incluir 0.4 alcança quem está mais ao
+      fundo, mas cada passada a 0.4 custa ~2,6x a de 0.25.
+    - Rostos presentes: escala tal que o menor rosto recente fique com
+      ~TAMANHO_ALVO_ROSTO px, sem upsample (bem mais barato).
+    - `refinar=True`: passo grosso-para-fino; cada rosto é re-localizado num
+      recorte em resolução cheia para obter uma caixa mais precisa.
+    """
+
+    def __init__(self, roi: Tuple[float, float, float, float] = ROI_PADRAO,
+                 escalas_busca: Tuple[float, ...] = ESCALAS_BUSCA, refinar: bool = False,
+                 backend: Optional[DetectorRostos] = None):
+        x0, y0, x1, y1 = roi
+        if not (0.0 <= x0 < x1 <= 1.0 and 0.0 <= y0 < y1 <= 1.0):
+            raise ValueError(f"ROI inválida: {roi}")
+        self.roi = roi
+        self.backend = backend or DetectorHOG()
+        self.escalas_busca = tuple(escalas_busca)
+        self.refinar = refinar
+        self.alturas = deque(maxlen=HISTORICO_ROSTOS)
+        self.ticks_sem_rosto = TICKS_PARA_BUSCA
+        self.escala = self.escalas_busca[0]
+        self.upsample = 1
+
+    def recorte_roi(self, frame) -> Tuple[int, int, int, int]:
+        """Retorna a ROI em pixels (x0, y0, x1, y1) para o frame informado."""
+        altura, largura = frame.shape[:2]
+        x0, y0, x1, y1 = self.roi
+        return int(x0 * largura), int(y0 * altura), int(x1 * largura), int(y1 * altura)
+
+    def _escolher_escala(self) -> None:
+        """Atualiza escala e upsample a partir do histórico de rostos."""
+        if self.ticks_sem_rosto >= TICKS_PARA_BUSCA or not self.alturas:
+            self.escala = self.escalas_busca[self.ticks_sem_rosto % len(self.escalas_busca)]
+            self.upsample = 1
+            return
+
+        menor_altura = min(self.alturas)
+        self.escala = min(ESCALA_MAX, max(ESCALA_MIN, TAMANHO_ALVO_ROSTO / menor_altura))
+        self.upsample = 0
+
+    def _localizar(self, imagem_bgr, escala: float, upsample: int) -> List[Tuple[int, int, int, int]]:
+        """Roda o backend numa imagem reduzida e devolve caixas na escala da imagem original."""
+        return detectar_rostos(imagem_bgr, self.backend, escala, upsample)
+
+    def _refinar(self, frame, location) -> Optional[Tuple[int, int, int, int]]:
+        """Re-localiza um rosto num recorte em resolução cheia ao redor da caixa grossa."""
+        top, right, bottom, left = location
+        altura_frame, largura_frame = frame.shape[:2]
+        margem = int((bottom - top) * MARGEM_REFINO)
+        y0, y1 = max(0, top - margem), min(altura_frame, bottom + margem)
+        x0, x1 = max(0, left - margem), min(largura_frame, right + margem)
+
+        escala = min(1.0, TAMANHO_ALVO_ROSTO / max(1, bottom - top))
+        candidatos = self._localizar(frame[y0:y1, x0:x1], escala, 0)
+        if len(candidatos) != 1:
+            return None
+
+        t, r, b, l = candidatos[0]
+        return t + y0, r + x0, b + y0, l + x0
+
+    def detectar(self, frame) -> List[Tuple[int, int, int, int]]:
+        """Detecta rostos na ROI e retorna caixas (top, right, bottom, left) no frame original."""
+        self._escolher_escala()
+        x0, y0, x1, y1 = self.recorte_roi(frame)
+
+        locations = [(t + y0, r + x0, b + y0, l + x0)
+                     for (t, r, b, l) in self._localizar(frame[y0:y1, x0:x1], self.escala, self.upsample)]
+
+        if self.refinar:
+            locations = [self._refinar(frame, loc) or loc for loc in locations]
+
+        if locations:
+            self.ticks_sem_rosto = 0
+            self.alturas.append(min(b - t for (t, r, b, l) in locations))
+        else:
+            self.ticks_sem_rosto += 1
+            if self.ticks_sem_rosto == TICKS_PARA_BUSCA:
+                self.alturas.clear()
+
+        return locations
@@ -0,0 +1,172 @@
+# eventos.py
+# Log estruturado do sistema: eventos com nível e campos, formatados e
+# gravados como JSON lines por uma thread própria (QueueHandler/QueueListener),
+# com amostragem para mensagens que se repetem a cada frame
+
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+from metricas import EVENTOS_DESCARTADOS
+
+# --- CONFIGURAÇÕES ---
+ARQUIVO_EVENTOS = "eventos_catraca.jsonl"  # JSON lines, um evento por linha
+NIVEL_EVENTOS = "INFO"                     # DEBUG inclui distâncias por frame e carga por usuário
+NIVEL_CONSOLE = "INFO"                     # Eventos que também aparecem no terminal
+TAMANHO_FILA_EVENTOS = 10000               # Cheia: o evento é descartado, o laço nunca espera
+INTERVALO_AMOSTRAGEM = 1.0                 # segundos entre eventos amostrados da mesma chave
+
+RAIZ = "catraca"
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por evento: horário, nível, origem, evento e campos."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        linha = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'origem': record.name,
+            'processo': record.processName,
+            'thread': record.threadName,
+            'evento': record.getMessage(),
+        }
+        linha.update(getattr(record, 'campos', {}))
+        if record.exc_info:
+            linha['excecao'] = self.formatException(record.exc_info)
+        return json.dumps(linha, ensure_ascii=False, default=str)
+
+
+class FormatadorConsole(logging.Formatter):
+    """Formato curto para o terminal: `HH:MM:SS NIVEL evento campo=valor ...`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        campos = " ".join(f"{chave}={valor}" for chave, valor in getattr(record, 'campos', {}).items())
+        texto = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {record.getMessage()} {campos}".rstrip()
+        if record.exc_info:
+            texto += "\n" + self.formatException(record.exc_info)
+        return texto
+
+
+class FilaSemBloqueio(QueueHandler):
+    """
+    QueueHandler que nunca bloqueia quem loga: a formatação fica para a
+    thread do listener e, com a fila cheia, o evento é descartado e contado.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Só resolve a mensagem; JSON e traceback são montados no listener
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            EVENTOS_DESCARTADOS.inc()
+
+
+class Amostrador:
+    """
+    Limita eventos repetitivos (ex.: distância do melhor match a cada frame)
+    a um por `intervalo` segundos por chave, contando os suprimidos.
+    """
+
+    def __init__(self, intervalo: float = INTERVALO_AMOSTRAGEM):
+        self.intervalo = intervalo
+        self._estado: Dict[str, Tuple[float, int]] = {}  # chave -> (último envio, suprimidos)
+        self._lock = threading.Lock()
+
+    def permitir(self, chave: str) -> Optional[int]:
+        """Retorna quantos eventos da chave foram suprimidos desde o último, ou None se este também deve ser."""
+        agora = time.monotonic()
+        with self._lock:
+            ultimo, suprimidos = self._estado.get(chave, (float('-inf'), 0))
+            if agora - ultimo < self.intervalo:
+                self._estado[chave] = (ultimo, suprimidos + 1)
+                return None
+            self._estado[chave] = (agora, 0)
+            return suprimidos
+
+
+AMOSTRADOR = Amostrador()
+
+
+def obter_logger(nome: str) -> logging.Logger:
+    """Logger filho da raiz do sistema (`catraca.<nome>`)."""
+    return logging.getLogger(f"{RAIZ}.{nome}")
+
+
+def evento(logger: logging.Logger, nivel: int, nome: str, exc_info=None, **campos) -> None:
+    """Registra um evento com campos estruturados; custa só uma comparação se o nível estiver desligado."""
+    if logger.isEnabledFor(nivel):
+        logger.log(nivel, nome, exc_info=exc_info, extra={'campos': campos})
+
+
+def evento_amostrado(logger: logging.Logger, nivel: int, nome: str, chave: Optional[str] = None,
+                     amostrador: Amostrador = AMOSTRADOR, **campos) -> None:
+    """Como `evento`, mas no máximo um por intervalo do amostrador para cada chave."""
+    if not logger.isEnabledFor(nivel):
+        return
+    suprimidos = amostrador.permitir(chave or f"{logger.name}:{nome}")
+    if suprimidos is None:
+        return
+    if suprimidos:
+        campos['suprimidos'] = suprimidos
+    logger.log(nivel, nome, extra={'campos': campos})
+
+
+def configurar_eventos(nivel: str = NIVEL_EVENTOS, arquivo: Optional[str] = ARQUIVO_EVENTOS,
+                       nivel_console: Optional[str] = NIVEL_CONSOLE,
+                       tamanho_fila: int = TAMANHO_FILA_EVENTOS) -> None:
+    """
+    Liga a raiz `catraca` a uma fila limitada; a thread do listener grava o
+    arquivo JSON lines e o terminal. Chamar de novo não duplica handlers.
+    Processos filhos (spawn) precisam chamar no próprio processo.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        destinos = []
+        if arquivo:
+            handler_arquivo = logging.FileHandler(arquivo, encoding='utf-8')
+            handler_arquivo.setFormatter(FormatadorJSON())
+            destinos.append(handler_arquivo)
+        if nivel_console:
+            handler_console = logging.StreamHandler(sys.stdout)
+            handler_console.setLevel(nivel_console)
+            handler_console.setFormatter(FormatadorConsole())
+            destinos.append(handler_console)
+
+        fila = queue.Queue(tamanho_fila)
+        raiz = logging.getLogger(RAIZ)
+        raiz.setLevel(nivel)
+        for handler in [h for h in raiz.handlers if isinstance(h, FilaSemBloqueio)]:
+            raiz.removeHandler(handler)
+        raiz.addHandler(FilaSemBloqueio(fila))
+        raiz.propagate = False
+
+        _listener = QueueListener(fila, *destinos, respect_handler_level=True)
+        _listener.start()
+        atexit.register(encerrar_eventos)
+
+
+def encerrar_eventos() -> None:
+    """Esvazia a fila e para a thread do listener."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
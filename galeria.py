@@ -0,0 +1,296 @@
+# galeria.py
+# Galeria de encodings com múltiplos templates por usuário e busca vetorizada
+
+import numpy as np
+from typing import List, Tuple, Dict, Optional
+
+# --- MODOS DE AGREGAÇÃO ---
+MODO_MINIMO = "minimo"        # Menor distância entre todos os templates do usuário
+MODO_CENTROIDE = "centroide"  # Distância ao centroide dos templates (1 linha por usuário)
+
+CODIGOS_MODO = {MODO_MINIMO: 0, MODO_CENTROIDE: 1}  # Modo gravado nos formatos binários
+
+# --- PRECISÃO DA VARREDURA ---
+PRECISAO_COMPLETA = "float32"  # Varredura direta na matriz float32
+PRECISAO_FLOAT16 = "float16"   # Cópia float16 para a varredura (metade da memória)
+PRECISAO_INT8 = "int8"         # int8 com escala por dimensão (um quarto da memória)
+PRECISOES = (PRECISAO_COMPLETA, PRECISAO_FLOAT16, PRECISAO_INT8)
+CODIGOS_PRECISAO = {PRECISAO_COMPLETA: 0, PRECISAO_FLOAT16: 1, PRECISAO_INT8: 2}  # Gravada nos formatos binários
+TIPOS_PRECISAO = {PRECISAO_FLOAT16: np.float16, PRECISAO_INT8: np.int8}
+TOP_K_REORDENAR = 8            # Candidatos por rosto reordenados em precisão completa
+BLOCO_VARREDURA = 8192         # Linhas convertidas para float32 por vez na varredura
+BLOCO_AUDITORIA = 2048         # Lado do bloco (linhas x linhas) na busca de pares próximos
+
+DIMENSAO_ENCODING = 128
+
+
+def encoding_para_blob(encoding) -> bytes:
+    """Serializa um encoding como float32 (512 bytes) para o banco."""
+    return np.asarray(encoding, dtype=np.float32).tobytes()
+
+
+def blob_para_encoding(blob: bytes) -> np.ndarray:
+    """Desserializa um encoding salvo com `encoding_para_blob`."""
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+class Galeria:
+    """
+    Matriz contígua float32 com os templates de todos os usuários.
+
+    Os templates de cada usuário ficam em linhas consecutivas; `inicios[i]`
+    marca a primeira linha do usuário i. No modo centroide cada usuário ocupa
+    uma única linha, então o custo da busca não cresce com o nº de templates.
+
+    Com precisão reduzida (float16 ou int8) a varredura de todas as linhas
+    usa uma cópia quantizada da matriz, e só os `top_k` usuários mais
+    próximos de cada rosto têm a distância recalculada em float32.
+
+    `modelo` é a versão do codificador que gerou os templates (ver
+    codificacao.py); sondas devem vir do mesmo modelo.
+    """
+
+    def __init__(self, modo: str = MODO_MINIMO, precisao: str = PRECISAO_COMPLETA,
+                 top_k: int = TOP_K_REORDENAR, modelo: Optional[str] = None):
+        if modo not in (MODO_MINIMO, MODO_CENTROIDE):
+            raise ValueError(f"Modo de agregação inválido: {modo}")
+        if precisao not in PRECISOES:
+            raise ValueError(f"Precisão inválida: {precisao}")
+        self.modo = modo
+        self.precisao = precisao
+        self.top_k = top_k
+        self.modelo = modelo
+        self.usuarios: List[Dict] = []
+        self.templates: List[np.ndarray] = []
+        self._reconstruir()
+
+    @classmethod
+    def de_arrays(cls, matriz: np.ndarray, normas: np.ndarray, inicios: np.ndarray,
+                  usuarios: List[Dict], modo: str = MODO_MINIMO,
+                  precisao: str = PRECISAO_COMPLETA, modelo: Optional[str] = None,
+                  reduzida: Optional[np.ndarray] = None, normas_reduzidas: Optional[np.ndarray] = None,
+                  escalas: Optional[np.ndarray] = None) -> 'Galeria':
+        """
+        Galeria somente leitura sobre arrays já montados (ex.: views de memória
+        compartilhada ou de um arquivo mapeado), sem copiá-los. Com `reduzida`
+        (já na `precisao`) a varredura usa a cópia quantizada publicada e a
+        matriz float32 só é lida nas linhas reordenadas; sem ela, cada
+        processo quantiza a sua cópia no primeiro uso.
+        """
+        galeria = cls(modo, precisao, modelo=modelo)
+        galeria.usuarios = usuarios
+        galeria.matriz = matriz
+        galeria.normas = normas
+        galeria.inicios = inicios
+        if reduzida is not None:
+            galeria.reduzida, galeria.normas_reduzidas, galeria.escalas = reduzida, normas_reduzidas, escalas
+        galeria._sujo = False
+        return galeria
+
+    def __len__(self):
+        return len(self.usuarios)
+
+    def preparar(self) -> None:
+        """Monta a matriz de busca (e a cópia quantizada) agora, se houver alterações pendentes."""
+        if self._sujo:
+            self._reconstruir()
+        if self.precisao != PRECISAO_COMPLETA and self.reduzida is None:
+            self._quantizar()
+
+    @property
+    def bytes_varredura(self) -> int:
+        """Memória da matriz percorrida a cada busca."""
+        self.preparar()
+        return (self.matriz if self.reduzida is None else self.reduzida).nbytes
+
+    @property
+    def total_templates(self) -> int:
+        return sum(len(t) for t in self.templates)
+
+    def adicionar_usuario(self, dados_usuario: Dict, templates) -> None:
+        """Adiciona um usuário com um ou mais templates (k x 128)."""
+        templates = np.atleast_2d(np.asarray(templates, dtype=np.float32))
+        if templates.shape[0] == 0:
+            return
+        self.usuarios.append(dados_usuario)
+        self.templates.append(templates)
+        self._sujo = True
+
+    def substituir_templates(self, indice: int, templates) -> None:
+        """Troca os templates de um usuário já carregado."""
+        self.templates[indice] = np.atleast_2d(np.asarray(templates, dtype=np.float32))
+        self._sujo = True
+
+    def _reconstruir(self) -> None:
+        """Remonta a matriz de busca a partir dos templates por usuário."""
+        if not self.templates:
+            self.matriz = np.empty((0, DIMENSAO_ENCODING), dtype=np.float32)
+            self.inicios = np.empty(0, dtype=np.intp)
+        elif self.modo == MODO_CENTROIDE:
+            self.matriz = np.stack([t.mean(axis=0) for t in self.templates]).astype(np.float32)
+            self.inicios = np.arange(len(self.templates), dtype=np.intp)
+        else:
+            self.matriz = np.ascontiguousarray(np.concatenate(self.templates), dtype=np.float32)
+            tamanhos = np.array([len(t) for t in self.templates], dtype=np.intp)
+            self.inicios = np.concatenate(([0], np.cumsum(tamanhos)[:-1]))
+        self.normas = np.einsum('ij,ij->i', self.matriz, self.matriz)
+        self.reduzida = None
+        self._sujo = False
+
+    def _quantizar(self) -> None:
+        """Gera a cópia float16/int8 da matriz e as normas dos valores já quantizados."""
+        if self.precisao == PRECISAO_FLOAT16:
+            self.escalas = None
+            self.reduzida = self.matriz.astype(np.float16)
+        else:
+            maximos = np.abs(self.matriz).max(axis=0) if len(self.matriz) else np.ones(self.matriz.shape[1])
+            self.escalas = (np.where(maximos > 0, maximos, 1.0) / 127.0).astype(np.float32)
+            self.reduzida = np.round(self.matriz / self.escalas).astype(np.int8)
+
+        # Normas da matriz reconstruída: a distância aproximada fica consistente
+        self.normas_reduzidas = np.empty(len(self.reduzida), dtype=np.float32)
+        for inicio, bloco in self._blocos_reduzidos():
+            if self.escalas is not None:
+                bloco *= self.escalas
+            self.normas_reduzidas[inicio:inicio + len(bloco)] = np.einsum('ij,ij->i', bloco, bloco)
+
+    def _blocos_reduzidos(self):
+        """
+        Percorre a matriz quantizada em blocos convertidos para float32 num
+        buffer reaproveitado. No int8 os valores saem sem a escala, que é
+        aplicada uma vez nas sondas.
+        """
+        buffer = np.empty((min(BLOCO_VARREDURA, len(self.reduzida)), self.reduzida.shape[1]), dtype=np.float32)
+        for inicio in range(0, len(self.reduzida), BLOCO_VARREDURA):
+            bloco = buffer[:len(self.reduzida[inicio:inicio + BLOCO_VARREDURA])]
+            bloco[:] = self.reduzida[inicio:inicio + len(bloco)]
+            yield inicio, bloco
+
+    def _agregar(self, distancias: np.ndarray) -> np.ndarray:
+        """Distâncias por linha (P x L) -> por usuário (P x N)."""
+        if self.modo == MODO_MINIMO:
+            return np.minimum.reduceat(distancias, self.inicios, axis=1)
+        return distancias
+
+    def _distancias_exatas(self, sondas: np.ndarray, linhas: np.ndarray) -> np.ndarray:
+        """Distâncias float32 de cada sonda para as linhas indicadas."""
+        matriz = self.matriz[linhas]
+        quadrados = (np.einsum('ij,ij->i', sondas, sondas)[:, None]
+                     + self.normas[linhas][None, :]
+                     - 2.0 * sondas @ matriz.T)
+        return np.sqrt(np.maximum(quadrados, 0.0))
+
+    def _reordenar(self, sondas: np.ndarray, aproximadas: np.ndarray):
+        """
+        Recalcula em precisão completa os `top_k` usuários de cada sonda.
+        Retorna (candidatos P x k, distâncias exatas P x k).
+        """
+        k = min(self.top_k, aproximadas.shape[1])
+        candidatos = np.argpartition(aproximadas, k - 1, axis=1)[:, :k]
+        fins = np.append(self.inicios[1:], len(self.matriz))
+
+        exatas = np.empty(candidatos.shape, dtype=np.float32)
+        for p, usuarios in enumerate(candidatos):
+            tamanhos = fins[usuarios] - self.inicios[usuarios]
+            linhas = np.concatenate([np.arange(self.inicios[u], fins[u]) for u in usuarios])
+            por_linha = self._distancias_exatas(sondas[p:p + 1], linhas)[0]
+            exatas[p] = np.minimum.reduceat(por_linha, np.concatenate(([0], np.cumsum(tamanhos)[:-1])))
+        return candidatos, exatas
+
+    def _varrer(self, sondas: np.ndarray) -> np.ndarray:
+        """Distâncias (P x N) de todas as linhas: exatas em float32, aproximadas na precisão reduzida."""
+        if self.reduzida is None:
+            # ||a - b||² = ||a||² + ||b||² - 2ab, calculado para todas as linhas de uma vez
+            return self._agregar(self._distancias_exatas(sondas, slice(None)))
+
+        # (s * escala) . q == s . (q * escala): a escala do int8 vai para as sondas
+        escaladas = sondas if self.escalas is None else sondas * self.escalas
+        produtos = np.empty((len(sondas), len(self.reduzida)), dtype=np.float32)
+        for inicio, bloco in self._blocos_reduzidos():
+            produtos[:, inicio:inicio + len(bloco)] = escaladas @ bloco.T
+        quadrados = np.einsum('ij,ij->i', sondas, sondas)[:, None] + self.normas_reduzidas[None, :] - 2.0 * produtos
+        return self._agregar(np.sqrt(np.maximum(quadrados, 0.0)))
+
+    def distancias(self, encodings) -> np.ndarray:
+        """
+        Distância euclidiana (a mesma de face_distance) de cada encoding para
+        cada usuário, já agregada por usuário. Retorna matriz (P x N).
+
+        Em precisão reduzida, só os `top_k` usuários de cada encoding têm a
+        distância exata; os demais ficam com o valor aproximado.
+        """
+        self.preparar()
+
+        sondas = np.atleast_2d(np.asarray(encodings, dtype=np.float32))
+        if len(self.usuarios) == 0 or sondas.shape[0] == 0:
+            return np.empty((sondas.shape[0], len(self.usuarios)), dtype=np.float32)
+
+        distancias = self._varrer(sondas)
+        if self.reduzida is not None:
+            candidatos, exatas = self._reordenar(sondas, distancias)
+            np.put_along_axis(distancias, candidatos, exatas, axis=1)
+        return distancias
+
+    def buscar(self, encodings) -> List[Tuple[int, float]]:
+        """Retorna (índice do usuário, distância) do melhor match para cada encoding."""
+        self.preparar()
+
+        sondas = np.atleast_2d(np.asarray(encodings, dtype=np.float32))
+        if len(self.usuarios) == 0:
+            return [(-1, 1.0) for _ in range(sondas.shape[0])]
+        if sondas.shape[0] == 0:
+            return []
+
+        distancias = self._varrer(sondas)
+        if self.reduzida is None:
+            melhores = np.argmin(distancias, axis=1)
+            return [(int(i), float(distancias[p, i])) for p, i in enumerate(melhores)]
+
+        # O vencedor sai só entre os candidatos reordenados em float32
+        candidatos, exatas = self._reordenar(sondas, distancias)
+        melhores = np.argmin(exatas, axis=1)
+        return [(int(candidatos[p, j]), float(exatas[p, j])) for p, j in enumerate(melhores)]
+
+    def suspeitos(self, encodings, limiar: float, maximo: int = 5) -> List[Tuple[int, float]]:
+        """
+        Usuários a até `limiar` de qualquer um dos encodings (ex.: os templates
+        de um cadastro novo), do mais próximo ao mais distante: (índice, distância).
+        """
+        distancias = self.distancias(encodings)
+        if distancias.size == 0:
+            return []
+        por_usuario = distancias.min(axis=0)
+        proximos = np.flatnonzero(por_usuario <= limiar)
+        ordem = proximos[np.argsort(por_usuario[proximos])][:maximo]
+        return [(int(i), float(por_usuario[i])) for i in ordem]
+
+    def pares_proximos(self, limiar: float, bloco: int = BLOCO_AUDITORIA) -> List[Tuple[int, int, float]]:
+        """
+        Pares de usuários diferentes a até `limiar` um do outro (no modo mínimo,
+        o par de templates mais próximo), ordenados pela distância.
+
+        A matriz L x L nunca existe inteira: as distâncias saem em blocos
+        `bloco` x `bloco` do triângulo superior, sempre em float32, e só as
+        entradas abaixo do limiar são guardadas.
+        """
+        self.preparar()
+        total = len(self.matriz)
+        fins = np.append(self.inicios[1:], total)
+        donos = np.repeat(np.arange(len(self.inicios)), fins - self.inicios)
+        melhores: Dict[Tuple[int, int], float] = {}
+
+        for i in range(0, total, bloco):
+            linhas = self.matriz[i:i + bloco]
+            for j in range(i, total, bloco):
+                quadrados = (self.normas[i:i + bloco][:, None] + self.normas[j:j + bloco][None, :]
+                             - 2.0 * linhas @ self.matriz[j:j + bloco].T)
+                a, b = np.nonzero(quadrados <= limiar * limiar)
+                u, v = donos[i + a], donos[j + b]
+                diferentes = u != v  # Templates do mesmo usuário (e a diagonal) não contam
+                distancias = np.sqrt(np.maximum(quadrados[a, b][diferentes], 0.0))
+                for x, y, distancia in zip(u[diferentes], v[diferentes], distancias):
+                    par = (int(min(x, y)), int(max(x, y)))
+                    if distancia < melhores.get(par, np.inf):
+                        melhores[par] = float(distancia)
+
+        return sorted(((u, v, d) for (u, v), d in melhores.items()), key=lambda par: par[2])
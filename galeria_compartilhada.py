@@ -0,0 +1,220 @@
+# galeria_compartilhada.py
+# Galeria publicada em memória compartilhada (multiprocessing.shared_memory)
+# para workers em processos separados, com gerações versionadas. A cópia
+# quantizada (float16/int8) é publicada junto: nenhum worker quantiza a sua
+
+import json
+import struct
+import logging
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+
+from galeria import Galeria, CODIGOS_MODO, CODIGOS_PRECISAO, TIPOS_PRECISAO, PRECISAO_COMPLETA, PRECISAO_INT8
+from eventos import obter_logger, evento
+
+NOME_PADRAO = "catraca_galeria"
+MAGICO = b"CATRGAL2"
+CABECALHO = struct.Struct("<8sqqqqqqq")  # mágico, geração, linhas, usuários, dimensão, modo, precisão, bytes de metadados
+CONTROLE = struct.Struct("<q")           # geração atual
+ALINHAMENTO = 64
+
+log = obter_logger("galeria_compartilhada")
+
+
+def _alinhar(valor: int) -> int:
+    return (valor + ALINHAMENTO - 1) // ALINHAMENTO * ALINHAMENTO
+
+
+def _layout(linhas: int, usuarios: int, dimensao: int, bytes_meta: int,
+            precisao: str = PRECISAO_COMPLETA) -> Dict[str, int]:
+    """Offsets de cada bloco dentro do segmento de uma geração (os da cópia quantizada ficam vazios em float32)."""
+    tamanho_reduzido = np.dtype(TIPOS_PRECISAO[precisao]).itemsize if precisao in TIPOS_PRECISAO else 0
+    matriz = _alinhar(CABECALHO.size)
+    normas = _alinhar(matriz + linhas * dimensao * 4)
+    inicios = _alinhar(normas + linhas * 4)
+    reduzida = _alinhar(inicios + usuarios * 8)
+    normas_reduzidas = _alinhar(reduzida + linhas * dimensao * tamanho_reduzido)
+    escalas = _alinhar(normas_reduzidas + (linhas * 4 if tamanho_reduzido else 0))
+    meta = _alinhar(escalas + (dimensao * 4 if precisao == PRECISAO_INT8 else 0))
+    return {'matriz': matriz, 'normas': normas, 'inicios': inicios, 'reduzida': reduzida,
+            'normas_reduzidas': normas_reduzidas, 'escalas': escalas, 'meta': meta,
+            'total': max(1, meta + bytes_meta)}
+
+
+def _nome_geracao(nome_base: str, geracao: int) -> str:
+    return f"{nome_base}_g{geracao}"
+
+
+def _criar(nome: str, tamanho: int) -> shared_memory.SharedMemory:
+    """
+    Cria o segmento. Um segmento com o mesmo nome só pode ter sobrado de uma
+    execução morta sem `fechar()` (ex.: SIGKILL): é removido e criado de novo.
+    """
+    try:
+        return shared_memory.SharedMemory(name=nome, create=True, size=tamanho)
+    except FileExistsError:
+        orfao = shared_memory.SharedMemory(name=nome)
+        orfao.close()
+        orfao.unlink()
+        evento(log, logging.WARNING, "segmento_orfao_removido", segmento=nome)
+        return shared_memory.SharedMemory(name=nome, create=True, size=tamanho)
+
+
+def _anexar(nome: str) -> shared_memory.SharedMemory:
+    """
+    Anexa a um segmento existente. Workers iniciados pelo multiprocessing
+    compartilham o resource_tracker do processo principal; um processo
+    avulso tem o seu e precisa sair dele, senão o segmento seria removido
+    quando esse processo terminasse.
+    """
+    segmento = shared_memory.SharedMemory(name=nome)
+    if multiprocessing.parent_process() is None:
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(segmento._name, "shared_memory")
+        except Exception:
+            pass
+    return segmento
+
+
+def _fechar(segmento: shared_memory.SharedMemory) -> None:
+    """Fecha o mapeamento; se alguém ainda segura views da geração antiga, o GC fecha depois."""
+    try:
+        segmento.close()
+    except BufferError:
+        pass
+
+
+class PublicadorGaleria:
+    """
+    Lado do processo principal: publica cada versão da galeria num segmento
+    novo (uma geração) e só então troca o número da geração no segmento de
+    controle. Workers nunca veem uma galeria pela metade.
+    """
+
+    def __init__(self, nome_base: str = NOME_PADRAO):
+        self.nome_base = nome_base
+        self.geracao = 0
+        self.segmento: Optional[shared_memory.SharedMemory] = None
+        self.controle = _criar(f"{nome_base}_ctl", CONTROLE.size)
+        CONTROLE.pack_into(self.controle.buf, 0, 0)
+
+    def publicar(self, galeria: Galeria) -> int:
+        """
+        Copia a galeria (e a cópia quantizada, na precisão dela) para uma
+        nova geração e a torna a atual. Retorna a geração.
+        """
+        galeria.preparar()
+        matriz = np.ascontiguousarray(galeria.matriz, dtype=np.float32)
+        normas = np.ascontiguousarray(galeria.normas, dtype=np.float32)
+        inicios = np.ascontiguousarray(galeria.inicios, dtype=np.int64)
+        meta = json.dumps(list(galeria.usuarios), ensure_ascii=False).encode('utf-8')
+
+        linhas, dimensao = matriz.shape
+        layout = _layout(linhas, len(galeria.usuarios), dimensao, len(meta), galeria.precisao)
+        geracao = self.geracao + 1
+
+        novo = _criar(_nome_geracao(self.nome_base, geracao), layout['total'])
+        CABECALHO.pack_into(novo.buf, 0, MAGICO, geracao, linhas, len(galeria.usuarios), dimensao,
+                            CODIGOS_MODO[galeria.modo], CODIGOS_PRECISAO[galeria.precisao], len(meta))
+        np.ndarray(matriz.shape, np.float32, novo.buf, layout['matriz'])[:] = matriz
+        np.ndarray(normas.shape, np.float32, novo.buf, layout['normas'])[:] = normas
+        np.ndarray(inicios.shape, np.int64, novo.buf, layout['inicios'])[:] = inicios
+        if galeria.reduzida is not None:
+            np.ndarray(galeria.reduzida.shape, galeria.reduzida.dtype, novo.buf, layout['reduzida'])[:] = galeria.reduzida
+            np.ndarray((linhas,), np.float32, novo.buf, layout['normas_reduzidas'])[:] = galeria.normas_reduzidas
+            if galeria.escalas is not None:
+                np.ndarray((dimensao,), np.float32, novo.buf, layout['escalas'])[:] = galeria.escalas
+        novo.buf[layout['meta']:layout['meta'] + len(meta)] = meta
+
+        # Troca atômica: workers passam a anexar à nova geração
+        CONTROLE.pack_into(self.controle.buf, 0, geracao)
+
+        # Quem ainda está mapeado na geração antiga continua lendo normalmente
+        if self.segmento is not None:
+            self.segmento.close()
+            self.segmento.unlink()
+        self.segmento = novo
+        self.geracao = geracao
+        return geracao
+
+    def fechar(self) -> None:
+        """Remove todos os segmentos publicados."""
+        for segmento in (self.segmento, self.controle):
+            if segmento is not None:
+                segmento.close()
+                segmento.unlink()
+        self.segmento = None
+
+
+class GaleriaCompartilhada:
+    """
+    Lado do worker: anexa à geração atual sem copiar a matriz de encodings
+    (views numpy direto sobre o segmento) e troca de geração em `atualizar()`.
+    """
+
+    def __init__(self, nome_base: str = NOME_PADRAO, precisao: str = PRECISAO_COMPLETA):
+        self.nome_base = nome_base
+        self.precisao = precisao
+        self.controle = _anexar(f"{nome_base}_ctl")
+        self.segmento: Optional[shared_memory.SharedMemory] = None
+        self.geracao = 0
+        self.galeria = Galeria()
+        self.atualizar()
+
+    def geracao_publicada(self) -> int:
+        return CONTROLE.unpack_from(self.controle.buf, 0)[0]
+
+    def atualizar(self) -> bool:
+        """Anexa a uma geração mais nova, se houver. Custa a leitura de 8 bytes quando não há."""
+        geracao = self.geracao_publicada()
+        if geracao == self.geracao or geracao == 0:
+            return False
+
+        try:
+            segmento = _anexar(_nome_geracao(self.nome_base, geracao))
+        except FileNotFoundError:
+            return False  # Geração substituída durante a troca; tenta de novo no próximo tick
+
+        magico, geracao, linhas, usuarios, dimensao, modo, precisao, bytes_meta = CABECALHO.unpack_from(segmento.buf, 0)
+        if magico != MAGICO:
+            segmento.close()
+            raise ValueError("Segmento de galeria inválido")
+
+        modo_nome = next(nome for nome, valor in CODIGOS_MODO.items() if valor == modo)
+        precisao_nome = next(nome for nome, valor in CODIGOS_PRECISAO.items() if valor == precisao)
+        layout = _layout(linhas, usuarios, dimensao, bytes_meta, precisao_nome)
+        reduzidos = {}
+        if precisao_nome == self.precisao and precisao_nome in TIPOS_PRECISAO:
+            # Varredura na cópia publicada; a matriz float32 só é lida na reordenação
+            reduzidos = {
+                'reduzida': np.ndarray((linhas, dimensao), TIPOS_PRECISAO[precisao_nome], segmento.buf,
+                                       layout['reduzida']),
+                'normas_reduzidas': np.ndarray((linhas,), np.float32, segmento.buf, layout['normas_reduzidas']),
+                'escalas': (np.ndarray((dimensao,), np.float32, segmento.buf, layout['escalas'])
+                            if precisao_nome == PRECISAO_INT8 else None),
+            }
+        galeria = Galeria.de_arrays(
+            np.ndarray((linhas, dimensao), np.float32, segmento.buf, layout['matriz']),
+            np.ndarray((linhas,), np.float32, segmento.buf, layout['normas']),
+            np.ndarray((usuarios,), np.int64, segmento.buf, layout['inicios']),
+            json.loads(bytes(segmento.buf[layout['meta']:layout['meta'] + bytes_meta]).decode('utf-8')),
+            modo_nome,
+            self.precisao,
+            **reduzidos,
+        )
+
+        anterior = self.segmento
+        self.galeria, self.segmento, self.geracao = galeria, segmento, geracao
+        if anterior is not None:
+            _fechar(anterior)
+        return True
+
+    def fechar(self) -> None:
+        self.galeria = Galeria()
+        for segmento in (self.segmento, self.controle):
+            if segmento is not None:
+                _fechar(segmento)
+        self.segmento = None
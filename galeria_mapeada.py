@@ -0,0 +1,221 @@
+# galeria_mapeada.py
+# Galeria gravada num arquivo binário (cabeçalho + matriz float32 + índice de
+# ids de largura fixa + cópia quantizada, se houver) aberto com np.memmap: a
+# inicialização não decodifica nem quantiza nenhum encoding, só mapeia o arquivo
+
+import os
+import struct
+import sqlite3
+import numpy as np
+from typing import Dict, Iterator, Optional, Sequence
+
+from galeria import Galeria, CODIGOS_MODO, CODIGOS_PRECISAO, TIPOS_PRECISAO, PRECISAO_COMPLETA, PRECISAO_INT8
+
+ARQUIVO_GALERIA = "galeria.bin"
+MAGICO = b"CATRMAP3"
+CABECALHO = struct.Struct("<8sqqqqq32sq")  # mágico, versão do banco, linhas, usuários, dimensão, modo, modelo, precisão
+ALINHAMENTO = 64
+COLUNAS_USUARIO = ('id', 'nome', 'equipe', 'cpf', 'foto_path')
+
+# Toda alteração em usuarios/templates incrementa a versão (ver setup_database),
+# menos a dos templates que a catraca adapta sozinha: com eles o arquivo ficaria
+# velho a cada reinício; a catraca regrava o arquivo ao parar
+TABELA_VERSAO = '''
+    CREATE TABLE IF NOT EXISTS galeria_versao (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        versao INTEGER NOT NULL
+    )
+'''
+CONDICOES_VERSAO = {
+    ('templates', 'INSERT'): "WHEN NEW.origem != 'catraca'",
+    ('templates', 'UPDATE'): "WHEN NEW.origem != 'catraca' OR OLD.origem != 'catraca'",
+    ('templates', 'DELETE'): "WHEN OLD.origem != 'catraca'",
+}
+GATILHOS_VERSAO = {
+    f'galeria_{tabela}_{evento.lower()}':
+        f'''CREATE TRIGGER galeria_{tabela}_{evento.lower()} AFTER {evento} ON {tabela}
+        {CONDICOES_VERSAO.get((tabela, evento), '')}
+        BEGIN UPDATE galeria_versao SET versao = versao + 1; END'''
+    for tabela in ('usuarios', 'templates') for evento in ('INSERT', 'UPDATE', 'DELETE')
+}
+
+
+def criar_versionamento(cursor) -> None:
+    """Cria a tabela de versão e os gatilhos que a mantêm em dia com o banco."""
+    cursor.execute(TABELA_VERSAO)
+    cursor.execute('INSERT OR IGNORE INTO galeria_versao (id, versao) VALUES (1, 0)')
+    for nome, gatilho in GATILHOS_VERSAO.items():
+        cursor.execute(f'DROP TRIGGER IF EXISTS {nome}')  # Recria: bancos antigos têm gatilhos sem condição
+        cursor.execute(gatilho)
+
+
+def ler_versao(conn: sqlite3.Connection) -> int:
+    """Versão de usuarios/templates vista pela conexão (e pela transação aberta nela)."""
+    linha = conn.execute('SELECT versao FROM galeria_versao WHERE id = 1').fetchone()
+    return linha[0] if linha else 0
+
+
+def versao_banco(db_file: str) -> int:
+    """Versão atual de usuarios/templates (uma leitura de uma linha)."""
+    conn = sqlite3.connect(db_file)
+    try:
+        return ler_versao(conn)
+    finally:
+        conn.close()
+
+
+def _alinhar(valor: int) -> int:
+    return (valor + ALINHAMENTO - 1) // ALINHAMENTO * ALINHAMENTO
+
+
+def _layout(linhas: int, usuarios: int, dimensao: int, precisao: str = PRECISAO_COMPLETA) -> Dict[str, int]:
+    """Offsets de cada bloco dentro do arquivo (os da cópia quantizada só nas precisões reduzidas)."""
+    tamanho_reduzido = np.dtype(TIPOS_PRECISAO[precisao]).itemsize if precisao in TIPOS_PRECISAO else 0
+    matriz = _alinhar(CABECALHO.size)
+    normas = _alinhar(matriz + linhas * dimensao * 4)
+    inicios = _alinhar(normas + linhas * 4)
+    ids = _alinhar(inicios + usuarios * 8)
+    total = ids + usuarios * 8
+    layout = {'matriz': matriz, 'normas': normas, 'inicios': inicios, 'ids': ids}
+    if tamanho_reduzido:
+        layout['reduzida'] = _alinhar(total)
+        layout['normas_reduzidas'] = _alinhar(layout['reduzida'] + linhas * dimensao * tamanho_reduzido)
+        total = layout['normas_reduzidas'] + linhas * 4
+    if precisao == PRECISAO_INT8:
+        layout['escalas'] = _alinhar(total)
+        total = layout['escalas'] + dimensao * 4
+    layout['total'] = total
+    return layout
+
+
+class UsuariosMapeados(Sequence):
+    """
+    Lista de usuários da galeria mapeada: só os ids ficam no arquivo; nome,
+    equipe etc. são lidos do banco quando um usuário é reconhecido (e
+    guardados em cache), em vez de montar N dicionários na inicialização.
+    """
+
+    def __init__(self, ids: np.ndarray, db_file: str):
+        self.ids = ids
+        self.db_file = db_file
+        self._cache: Dict[int, Dict] = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(len(self)))]
+
+        usuario_id = int(self.ids[indice])
+        if usuario_id not in self._cache:
+            conn = sqlite3.connect(self.db_file)
+            try:
+                linha = conn.execute(f'SELECT {", ".join(COLUNAS_USUARIO)} FROM usuarios WHERE id = ?',
+                                     (usuario_id,)).fetchone()
+            finally:
+                conn.close()
+            self._cache[usuario_id] = (dict(zip(COLUNAS_USUARIO, linha)) if linha
+                                       else {'id': usuario_id, 'nome': 'Desconhecido', 'equipe': 'N/A', 'cpf': 'N/A'})
+        return self._cache[usuario_id]
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Materializa todos os usuários numa única consulta (ex.: para publicar a galeria)."""
+        conn = sqlite3.connect(self.db_file)
+        try:
+            linhas = conn.execute(f'SELECT {", ".join(COLUNAS_USUARIO)} FROM usuarios').fetchall()
+        finally:
+            conn.close()
+        por_id = {linha[0]: dict(zip(COLUNAS_USUARIO, linha)) for linha in linhas}
+        for usuario_id in self.ids.tolist():
+            yield por_id.get(usuario_id, {'id': usuario_id, 'nome': 'Desconhecido', 'equipe': 'N/A', 'cpf': 'N/A'})
+
+
+def salvar_galeria_mapeada(galeria: Galeria, versao: int, caminho: str = ARQUIVO_GALERIA) -> None:
+    """
+    Grava a galeria no formato mapeável, com a cópia quantizada da precisão
+    da galeria. Escreve num temporário e troca com os.replace, então um
+    leitor nunca abre um arquivo pela metade.
+    """
+    galeria.preparar()
+    matriz = np.ascontiguousarray(galeria.matriz, dtype=np.float32)
+    linhas, dimensao = matriz.shape
+    ids = np.array([u['id'] for u in galeria.usuarios], dtype=np.int64)
+    layout = _layout(linhas, len(ids), dimensao, galeria.precisao)
+
+    blocos = [
+        ('matriz', matriz),
+        ('normas', np.ascontiguousarray(galeria.normas, dtype=np.float32)),
+        ('inicios', np.ascontiguousarray(galeria.inicios, dtype=np.int64)),
+        ('ids', ids),
+    ]
+    if galeria.reduzida is not None:
+        blocos += [
+            ('reduzida', np.ascontiguousarray(galeria.reduzida)),
+            ('normas_reduzidas', np.ascontiguousarray(galeria.normas_reduzidas, dtype=np.float32)),
+        ]
+        if galeria.escalas is not None:
+            blocos.append(('escalas', np.ascontiguousarray(galeria.escalas, dtype=np.float32)))
+
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'wb') as f:
+        f.write(CABECALHO.pack(MAGICO, versao, linhas, len(ids), dimensao, CODIGOS_MODO[galeria.modo],
+                               (galeria.modelo or "").encode('ascii'), CODIGOS_PRECISAO[galeria.precisao]))
+        for nome, array in blocos:
+            f.write(b'\0' * (layout[nome] - f.tell()))
+            f.write(array.tobytes())
+    os.replace(temporario, caminho)
+
+
+def abrir_galeria_mapeada(caminho: str, db_file: str, modo: str, versao: Optional[int] = None,
+                          precisao: str = PRECISAO_COMPLETA, modelo: Optional[str] = None) -> Optional[Galeria]:
+    """
+    Mapeia o arquivo e devolve uma Galeria somente leitura sobre ele.
+    Retorna None se o arquivo não existir, for de outro formato/modo, de
+    outro modelo de encoding ou estiver desatualizado em relação ao banco.
+    Se o arquivo tem a cópia quantizada na `precisao` pedida, a varredura
+    usa o mapeamento direto e só as linhas reordenadas da matriz float32
+    são lidas do disco.
+    """
+    if not os.path.exists(caminho) or os.path.getsize(caminho) < CABECALHO.size:
+        return None
+
+    with open(caminho, 'rb') as f:
+        magico, versao_arquivo, linhas, usuarios, dimensao, codigo_modo, modelo_arquivo, codigo_precisao = \
+            CABECALHO.unpack(f.read(CABECALHO.size))
+    modelo_arquivo = modelo_arquivo.rstrip(b'\0').decode('ascii') or None
+    precisao_arquivo = next((nome for nome, codigo in CODIGOS_PRECISAO.items() if codigo == codigo_precisao), None)
+
+    if versao is None:
+        versao = versao_banco(db_file)
+    if magico != MAGICO or codigo_modo != CODIGOS_MODO[modo] or versao_arquivo != versao:
+        return None
+    if modelo is not None and modelo_arquivo != modelo:
+        return None
+
+    if precisao_arquivo is None:
+        return None
+
+    layout = _layout(linhas, usuarios, dimensao, precisao_arquivo)
+    if os.path.getsize(caminho) < layout['total']:
+        return None
+
+    mapa = np.memmap(caminho, dtype=np.uint8, mode='r')
+    reduzidos = {}
+    if precisao == precisao_arquivo and precisao in TIPOS_PRECISAO:
+        reduzidos = {
+            'reduzida': np.ndarray((linhas, dimensao), TIPOS_PRECISAO[precisao], mapa, layout['reduzida']),
+            'normas_reduzidas': np.ndarray((linhas,), np.float32, mapa, layout['normas_reduzidas']),
+            'escalas': (np.ndarray((dimensao,), np.float32, mapa, layout['escalas'])
+                        if precisao == PRECISAO_INT8 else None),
+        }
+    return Galeria.de_arrays(
+        np.ndarray((linhas, dimensao), np.float32, mapa, layout['matriz']),
+        np.ndarray((linhas,), np.float32, mapa, layout['normas']),
+        np.ndarray((usuarios,), np.int64, mapa, layout['inicios']),
+        UsuariosMapeados(np.ndarray((usuarios,), np.int64, mapa, layout['ids']), db_file),
+        modo,
+        precisao,
+        modelo_arquivo,
+        **reduzidos,
+    )
@@ -0,0 +1,108 @@
+# governador.py
+# Cadência adaptativa do processamento de frames: com rostos na catraca
+# processa o mais rápido que a CPU permite; vazia, cai para uma cadência de
+# baixo consumo que ainda detecta quem chega dentro do SLO de latência
+
+import threading
+
+from metricas import TAXA_PROCESSAMENTO, CUSTO_PROCESSAMENTO, PRESENCA_CATRACA
+
+# --- CONFIGURAÇÕES ---
+LATENCIA_ALVO = 1.0            # SLO: segundos até processar o primeiro frame de quem chega
+INTERVALO_MINIMO = 0.05        # Menor intervalo entre processamentos (com rostos)
+INTERVALO_OCIOSO_MAX = 0.8     # Maior intervalo com a catraca vazia
+CICLO_MAXIMO = 0.6             # Fração máxima do tempo gasta processando (sobra p/ captura e janela)
+JANELA_PRESENCA = 2.0          # segundos sem rostos até voltar à cadência ociosa
+SUAVIZACAO_CUSTO = 0.2         # Peso da última medida na média móvel do custo
+TAXA_EXIBICAO_OCIOSA = 10.0    # fps da janela com a catraca vazia (com rostos: todo frame)
+
+
+class GovernadorTaxa:
+    """
+    Decide a cada frame capturado se ele deve ser processado e/ou exibido.
+
+    O custo de processar um frame é acompanhado por média móvel. Com a
+    catraca vazia o intervalo é o maior que ainda cumpre o SLO
+    (intervalo + custo <= LATENCIA_ALVO); com rostos, o menor possível. Nos
+    dois casos o processamento não passa de CICLO_MAXIMO do tempo, então
+    sob pressão de CPU a cadência cai sozinha em vez de acumular atraso.
+
+    Quando o encoding e a busca rodam em outra thread (reconhecedor em lote
+    do multi_catraca), a parte deles no custo chega depois, por
+    `registrar_reconhecimento`.
+    """
+
+    def __init__(self, catraca: str, latencia_alvo: float = LATENCIA_ALVO,
+                 intervalo_minimo: float = INTERVALO_MINIMO, intervalo_ocioso_max: float = INTERVALO_OCIOSO_MAX,
+                 ciclo_maximo: float = CICLO_MAXIMO, janela_presenca: float = JANELA_PRESENCA,
+                 taxa_exibicao_ociosa: float = TAXA_EXIBICAO_OCIOSA):
+        self.catraca = catraca
+        self.latencia_alvo = latencia_alvo
+        self.intervalo_minimo = intervalo_minimo
+        self.intervalo_ocioso_max = intervalo_ocioso_max
+        self.ciclo_maximo = ciclo_maximo
+        self.janela_presenca = janela_presenca
+        self.taxa_exibicao_ociosa = taxa_exibicao_ociosa
+
+        self.custo = 0.0
+        self.intervalo = intervalo_minimo  # Processa o primeiro frame logo
+        self.fim_ultimo = float('-inf')
+        self.ultimo_rosto = float('-inf')
+        self.ultima_exibicao = float('-inf')
+        self._lock = threading.Lock()
+
+    def presenca(self, agora: float) -> bool:
+        return agora - self.ultimo_rosto <= self.janela_presenca
+
+    def deve_processar(self, agora: float) -> bool:
+        return agora - self.fim_ultimo >= self.intervalo
+
+    def deve_exibir(self, agora: float) -> bool:
+        """Com rostos, todo frame; vazia, no máximo TAXA_EXIBICAO_OCIOSA por segundo."""
+        if self.presenca(agora) or agora - self.ultima_exibicao >= 1.0 / self.taxa_exibicao_ociosa:
+            self.ultima_exibicao = agora
+            return True
+        return False
+
+    def pular(self, agora: float) -> None:
+        """Tick sem detecção (ex.: cena parada): conta para o intervalo, não para o custo."""
+        with self._lock:
+            self.fim_ultimo = agora
+            self._recalcular(agora)
+
+    def registrar(self, inicio: float, duracao: float, rostos: int) -> None:
+        """Informa um processamento (início, duração e rostos encontrados) e recalcula o intervalo."""
+        with self._lock:
+            if self.custo == 0.0:
+                self.custo = duracao
+            else:
+                self.custo += SUAVIZACAO_CUSTO * (duracao - self.custo)
+
+            fim = inicio + duracao
+            self.fim_ultimo = fim
+            if rostos:
+                self.ultimo_rosto = fim
+            self._recalcular(fim)
+
+    def registrar_reconhecimento(self, duracao: float, agora: float) -> None:
+        """
+        Soma ao último processamento a parte dele no encoding e na busca
+        feitos fora desta thread. Na média móvel, somar `duracao` à última
+        medida equivale a somar SUAVIZACAO_CUSTO * duracao ao custo.
+        """
+        with self._lock:
+            self.custo += duracao if self.custo == 0.0 else SUAVIZACAO_CUSTO * duracao
+            self._recalcular(agora)
+
+    def _recalcular(self, agora: float) -> None:
+        presente = self.presenca(agora)
+        if presente:
+            alvo = self.intervalo_minimo
+        else:
+            alvo = min(self.intervalo_ocioso_max, self.latencia_alvo - self.custo)
+        limite_cpu = self.custo * (1.0 / self.ciclo_maximo - 1.0)
+        self.intervalo = max(alvo, limite_cpu, self.intervalo_minimo)
+
+        TAXA_PROCESSAMENTO.definir(1.0 / (self.intervalo + self.custo), catraca=self.catraca)
+        CUSTO_PROCESSAMENTO.definir(self.custo, catraca=self.catraca)
+        PRESENCA_CATRACA.definir(int(presente), catraca=self.catraca)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# importacao.py
+# Migração em lote do armazenamento legado (usuarios/*/dados.json e
+# acessos.csv) para as tabelas usuarios/acessos do SQLite. Os arquivos são
+# lidos em fluxo e gravados em transações por lote; o CSV avança por um ponto
+# de controle (offset em bytes) gravado na mesma transação de cada lote, então
+# uma importação interrompida continua de onde parou sem duplicar acessos
+
+import os
+import csv
+import sys
+import json
+import time
+import sqlite3
+import logging
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from eventos import obter_logger, evento, evento_amostrado
+
+# --- CONFIGURAÇÕES ---
+LOTE_USUARIOS = 500               # Perfis por transação
+LOTE_ACESSOS = 5000               # Linhas do CSV por transação
+CABECALHO_CSV = ("Nome", "Equipe", "CPF", "DataHora", "Tipo", "Status")
+ARQUIVO_DADOS = "dados.json"
+ARQUIVO_FOTO = "foto.jpg"
+
+log = obter_logger("importacao")
+
+TABELA_CONTROLE = '''
+    CREATE TABLE IF NOT EXISTS importacoes (
+        origem TEXT PRIMARY KEY,
+        posicao INTEGER NOT NULL,
+        linhas INTEGER NOT NULL,
+        atualizado TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+INSERIR_ACESSO = '''
+    INSERT INTO acessos (usuario_id, nome, equipe, cpf, data_hora, tipo, status)
+    SELECT CASE WHEN ? = 'Identificado' THEN (SELECT id FROM usuarios WHERE cpf = ?) END, ?, ?, ?, ?, ?, ?
+'''
+
+
+def criar_controle_importacao(cursor) -> None:
+    """Tabela com o ponto de controle de cada arquivo importado (ver setup_database)."""
+    cursor.execute(TABELA_CONTROLE)
+
+
+def _perfis_legados(usuarios_dir: str) -> Iterator[Tuple[str, Optional[Tuple[str, str, str, str]]]]:
+    """Percorre usuarios/*/dados.json em fluxo; None quando o perfil é inválido."""
+    with os.scandir(usuarios_dir) as entradas:
+        for entrada in entradas:
+            caminho_json = os.path.join(entrada.path, ARQUIVO_DADOS)
+            if not entrada.is_dir() or not os.path.exists(caminho_json):
+                continue
+            try:
+                with open(caminho_json, 'r', encoding='utf-8') as f:
+                    dados = json.load(f)
+                nome = str(dados.get('nome') or '').strip()
+                cpf = str(dados.get('cpf') or entrada.name).strip()
+            except (OSError, ValueError, AttributeError):
+                evento(log, logging.WARNING, "perfil_invalido", exc_info=True, usuario=entrada.name)
+                yield entrada.name, None
+                continue
+
+            foto_path = os.path.join(usuarios_dir, entrada.name, ARQUIVO_FOTO)
+            if not nome or not cpf or not os.path.exists(foto_path):
+                evento(log, logging.WARNING, "perfil_incompleto", usuario=entrada.name, foto=os.path.exists(foto_path))
+                yield entrada.name, None
+                continue
+            yield entrada.name, (nome, str(dados.get('equipe') or 'N/A').strip(), cpf, foto_path)
+
+
+def importar_usuarios(conn: sqlite3.Connection, usuarios_dir: str, lote: int = LOTE_USUARIOS) -> Dict[str, int]:
+    """
+    Insere os perfis legados que ainda não estão no banco (cpf é UNIQUE, então
+    repetir a importação é seguro). Os templates são gerados a partir da foto
+    na próxima carga da galeria.
+    """
+    contagem = {'inseridos': 0, 'existentes': 0, 'invalidos': 0}
+    if not os.path.isdir(usuarios_dir):
+        return contagem
+
+    pendentes: List[Tuple[str, str, str, str]] = []
+
+    def gravar():
+        with conn:
+            inseridos = conn.executemany('INSERT OR IGNORE INTO usuarios (nome, equipe, cpf, foto_path) '
+                                         'VALUES (?, ?, ?, ?)', pendentes).rowcount
+        contagem['inseridos'] += inseridos
+        contagem['existentes'] += len(pendentes) - inseridos
+        pendentes.clear()
+
+    for _, perfil in _perfis_legados(usuarios_dir):
+        if perfil is None:
+            contagem['invalidos'] += 1
+            continue
+        pendentes.append(perfil)
+        if len(pendentes) >= lote:
+            gravar()
+    if pendentes:
+        gravar()
+    return contagem
+
+
+def _linha_acesso(campos: List[str]) -> Optional[Tuple]:
+    """Parâmetros do INSERT para uma linha `Nome, Equipe, CPF, DataHora, Tipo, Status`."""
+    if len(campos) != len(CABECALHO_CSV):
+        return None
+    nome, equipe, cpf, data_hora, tipo, status = (c.strip() for c in campos)
+    if not data_hora or not status:
+        return None
+    return (status, cpf, nome, equipe, cpf, data_hora, tipo, status)
+
+
+def importar_acessos(conn: sqlite3.Connection, caminho_csv: str, lote: int = LOTE_ACESSOS) -> Dict[str, int]:
+    """
+    Importa o acessos.csv a partir do último ponto de controle. Cada lote e o
+    novo offset são gravados na mesma transação: interrompida, a importação
+    retoma sem perder nem repetir linhas. Linhas acrescentadas ao CSV depois
+    entram na próxima chamada.
+    """
+    contagem = {'importados': 0, 'invalidos': 0}
+    if not os.path.exists(caminho_csv):
+        return contagem
+
+    origem = os.path.abspath(caminho_csv)
+    linha = conn.execute('SELECT posicao, linhas FROM importacoes WHERE origem = ?', (origem,)).fetchone()
+    posicao, linhas_total = linha if linha else (0, 0)
+    if posicao > os.path.getsize(caminho_csv):
+        # Arquivo substituído ou truncado: o offset não vale mais
+        evento(log, logging.WARNING, "csv_reiniciado", arquivo=caminho_csv, posicao=posicao)
+        posicao, linhas_total = 0, 0
+
+    pendentes: List[Tuple] = []
+    with open(caminho_csv, 'rb') as f:
+        f.seek(posicao)
+
+        def linhas_completas():
+            # Em bytes, para o offset ser exato; o csv recebe as linhas já decodificadas
+            nonlocal posicao
+            for bruta in f:
+                if not bruta.endswith(b'\n'):
+                    break  # Linha ainda sendo escrita: fica para a próxima importação
+                posicao += len(bruta)
+                yield bruta.decode('utf-8', errors='replace')
+
+        def gravar():
+            nonlocal linhas_total
+            linhas_total += len(pendentes)
+            with conn:
+                conn.executemany(INSERIR_ACESSO, pendentes)
+                conn.execute('INSERT OR REPLACE INTO importacoes (origem, posicao, linhas) VALUES (?, ?, ?)',
+                             (origem, posicao, linhas_total))
+            contagem['importados'] += len(pendentes)
+            evento(log, logging.DEBUG, "lote_acessos", arquivo=caminho_csv, linhas=len(pendentes), posicao=posicao)
+            pendentes.clear()
+
+        for campos in csv.reader(linhas_completas()):
+            if campos:
+                campos[0] = campos[0].lstrip('\ufeff')  # BOM de CSV salvo pelo Excel
+            if not campos or tuple(c.strip() for c in campos) == CABECALHO_CSV:
+                continue
+            parametros = _linha_acesso(campos)
+            if parametros is None:
+                contagem['invalidos'] += 1
+                evento_amostrado(log, logging.WARNING, "linha_csv_invalida", arquivo=caminho_csv, campos=len(campos))
+                continue
+            pendentes.append(parametros)
+            if len(pendentes) >= lote:
+                gravar()
+        # Último lote (mesmo vazio): o offset cobre cabeçalho e linhas inválidas do fim
+        gravar()
+    return contagem
+
+
+def importar_legado(db_file: str, usuarios_dir: str, caminho_csv: str, lote_usuarios: int = LOTE_USUARIOS,
+                    lote_acessos: int = LOTE_ACESSOS) -> Dict[str, int]:
+    """Perfis primeiro (os acessos identificados apontam para o usuario_id), depois o CSV."""
+    inicio = time.perf_counter()
+    conn = sqlite3.connect(db_file)
+    try:
+        usuarios = importar_usuarios(conn, usuarios_dir, lote_usuarios)
+        acessos = importar_acessos(conn, caminho_csv, lote_acessos)
+    finally:
+        conn.close()
+
+    resumo = {f"usuarios_{chave}": valor for chave, valor in usuarios.items()}
+    resumo.update({f"acessos_{chave}": valor for chave, valor in acessos.items()})
+    evento(log, logging.INFO, "importacao_legado", ms=round((time.perf_counter() - inicio) * 1000, 1), **resumo)
+    return resumo
+
+
+def main(argv=None) -> int:
+    # Mesmos argumentos de `catraca.py import`
+    from catraca import main as cli
+    return cli(['import', *(sys.argv[1:] if argv is None else argv)])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+# inicializacao.py
+# Cronômetro das fases da inicialização (importações, banco, galeria,
+# modelos, câmera, primeiro reconhecimento), exportado como evento e métrica
+
+import time
+import logging
+from typing import Dict, Optional
+
+from metricas import INICIALIZACAO
+from eventos import obter_logger, evento
+
+log = obter_logger("inicializacao")
+
+
+class FasesInicializacao:
+    """
+    Marca o fim de cada fase em relação à anterior. Cada fase é medida uma
+    vez só: marcar de novo (ex.: câmera reiniciada depois de um cadastro)
+    não sobrescreve a medida da subida.
+    """
+
+    def __init__(self, inicio: Optional[float] = None):
+        self.inicio = time.perf_counter() if inicio is None else inicio
+        self.ultimo = self.inicio
+        self.fases: Dict[str, float] = {}
+        self.fins: Dict[str, float] = {}
+
+    def marcar(self, fase: str) -> Optional[float]:
+        """Fecha a fase e retorna sua duração (None se já tinha sido medida)."""
+        agora = time.perf_counter()
+        if fase in self.fases:
+            self.ultimo = agora
+            return None
+        duracao = agora - self.ultimo
+        self.fases[fase] = duracao
+        self.fins[fase] = agora
+        self.ultimo = agora
+        INICIALIZACAO.definir(duracao, fase=fase)
+        return duracao
+
+    def desde(self, fase: str) -> Optional[float]:
+        """Segundos entre o fim de `fase` e a última marca."""
+        return self.ultimo - self.fins[fase] if fase in self.fins else None
+
+    @property
+    def total(self) -> float:
+        return self.ultimo - self.inicio
+
+    def resumo(self) -> str:
+        fases = " | ".join(f"{fase} {duracao * 1000:.0f} ms" for fase, duracao in self.fases.items())
+        return f"{fases} | total {self.total:.2f} s"
+
+    def registrar(self, **campos) -> None:
+        """Evento `inicializacao` com a duração (ms) de cada fase."""
+        evento(log, logging.INFO, "inicializacao", total_ms=round(self.total * 1000, 1),
+               **{fase: round(duracao * 1000, 1) for fase, duracao in self.fases.items()}, **campos)
@@ -0,0 +1,308 @@
+# metricas.py
+# Contadores e histogramas leves para o caminho crítico, no formato texto do
+# Prometheus. O processo da câmera grava um snapshot em arquivo e o servidor
+# web o publica em /metrics junto com as suas próprias métricas. Workers em
+# processos próprios repassam as suas ao processo principal (drenar/somar)
+
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# --- CONFIGURAÇÕES ---
+ARQUIVO_METRICAS = "metricas_catraca.prom"  # Snapshot do processo da câmera
+INTERVALO_EXPORTACAO = 5.0                  # segundos entre gravações do snapshot
+BALDES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+Rotulos = Tuple[Tuple[str, str], ...]
+
+
+def _rotulos(rotulos: Dict[str, str]) -> Rotulos:
+    return tuple(sorted((chave, str(valor)) for chave, valor in rotulos.items()))
+
+
+def _formatar_rotulos(rotulos: Rotulos, extra: Optional[Tuple[str, str]] = None) -> str:
+    itens = list(rotulos) + ([extra] if extra else [])
+    if not itens:
+        return ""
+    return "{" + ",".join(f'{chave}="{valor}"' for chave, valor in itens) + "}"
+
+
+def _numero(valor: float) -> str:
+    return "+Inf" if valor == float('inf') else repr(float(valor))
+
+
+class Contador:
+    """Contador monotônico, com um valor por combinação de rótulos."""
+
+    def __init__(self, nome: str, ajuda: str):
+        self.nome = nome
+        self.ajuda = ajuda
+        self._valores: Dict[Rotulos, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, quantidade: float = 1, **rotulos) -> None:
+        chave = _rotulos(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + quantidade
+
+    def drenar(self) -> Dict[Rotulos, float]:
+        """Devolve os incrementos desde a última drenagem e zera o contador."""
+        with self._lock:
+            valores, self._valores = self._valores, {}
+        return valores
+
+    def somar(self, valores: Dict[Rotulos, float]) -> None:
+        with self._lock:
+            for chave, valor in valores.items():
+                self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def texto(self) -> List[str]:
+        with self._lock:
+            valores = sorted(self._valores.items())
+        if not valores:
+            return []  # Sem amostras: outro processo pode publicar a mesma família
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} counter"]
+        for chave, valor in valores:
+            linhas.append(f"{self.nome}{_formatar_rotulos(chave)} {_numero(valor)}")
+        return linhas
+
+
+class Medidor:
+    """Valor instantâneo (gauge), com um valor por combinação de rótulos."""
+
+    def __init__(self, nome: str, ajuda: str):
+        self.nome = nome
+        self.ajuda = ajuda
+        self._valores: Dict[Rotulos, float] = {}
+        self._lock = threading.Lock()
+
+    def definir(self, valor: float, **rotulos) -> None:
+        chave = _rotulos(rotulos)
+        with self._lock:
+            self._valores[chave] = valor
+
+    def drenar(self) -> Dict[Rotulos, float]:
+        """Devolve os valores definidos desde a última drenagem."""
+        with self._lock:
+            valores, self._valores = self._valores, {}
+        return valores
+
+    def somar(self, valores: Dict[Rotulos, float]) -> None:
+        """Um medidor não se soma: o valor mais recente vale."""
+        with self._lock:
+            self._valores.update(valores)
+
+    def texto(self) -> List[str]:
+        with self._lock:
+            valores = sorted(self._valores.items())
+        if not valores:
+            return []
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} gauge"]
+        for chave, valor in valores:
+            linhas.append(f"{self.nome}{_formatar_rotulos(chave)} {_numero(valor)}")
+        return linhas
+
+
+class Histograma:
+    """Histograma cumulativo (baldes fixos, soma e contagem) por combinação de rótulos."""
+
+    def __init__(self, nome: str, ajuda: str, baldes=BALDES_SEGUNDOS):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.baldes = tuple(baldes)
+        self._series: Dict[Rotulos, List] = {}  # rótulos -> [contagens por balde, soma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, **rotulos) -> None:
+        chave = _rotulos(rotulos)
+        indice = bisect.bisect_left(self.baldes, valor)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [[0] * (len(self.baldes) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def drenar(self) -> Dict[Rotulos, List]:
+        """Devolve as observações desde a última drenagem e zera o histograma."""
+        with self._lock:
+            series, self._series = self._series, {}
+        return series
+
+    def somar(self, series: Dict[Rotulos, List]) -> None:
+        with self._lock:
+            for chave, (contagens, soma, total) in series.items():
+                serie = self._series.get(chave)
+                if serie is None:
+                    serie = self._series[chave] = [[0] * (len(self.baldes) + 1), 0.0, 0]
+                serie[0] = [a + b for a, b in zip(serie[0], contagens)]
+                serie[1] += soma
+                serie[2] += total
+
+    @contextmanager
+    def cronometrar(self, **rotulos) -> Iterator[None]:
+        """Observa a duração do bloco `with`, em segundos."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **rotulos)
+
+    def texto(self) -> List[str]:
+        with self._lock:
+            series = [(chave, list(serie[0]), serie[1], serie[2]) for chave, serie in sorted(self._series.items())]
+        if not series:
+            return []
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        for chave, contagens, soma, total in series:
+            acumulado = 0
+            for limite, contagem in zip(self.baldes + (float('inf'),), contagens):
+                acumulado += contagem
+                linhas.append(f"{self.nome}_bucket{_formatar_rotulos(chave, ('le', _numero(limite)))} {acumulado}")
+            linhas.append(f"{self.nome}_sum{_formatar_rotulos(chave)} {_numero(soma)}")
+            linhas.append(f"{self.nome}_count{_formatar_rotulos(chave)} {total}")
+        return linhas
+
+
+class Registro:
+    """Conjunto de métricas de um processo."""
+
+    def __init__(self):
+        self._metricas: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _obter(self, classe, nome: str, ajuda: str, **kwargs):
+        with self._lock:
+            if nome not in self._metricas:
+                self._metricas[nome] = classe(nome, ajuda, **kwargs)
+            return self._metricas[nome]
+
+    def contador(self, nome: str, ajuda: str) -> Contador:
+        return self._obter(Contador, nome, ajuda)
+
+    def medidor(self, nome: str, ajuda: str) -> Medidor:
+        return self._obter(Medidor, nome, ajuda)
+
+    def histograma(self, nome: str, ajuda: str, baldes=BALDES_SEGUNDOS) -> Histograma:
+        return self._obter(Histograma, nome, ajuda, baldes=baldes)
+
+    def drenar(self) -> List[Tuple]:
+        """
+        Lote picklável com o que cada métrica acumulou desde a última
+        drenagem, para um worker repassar ao processo principal (ver `somar`).
+        """
+        with self._lock:
+            metricas = list(self._metricas.values())
+        lote = []
+        for metrica in metricas:
+            dados = metrica.drenar()
+            if dados:
+                extras = {'baldes': metrica.baldes} if isinstance(metrica, Histograma) else {}
+                lote.append((type(metrica).__name__, metrica.nome, metrica.ajuda, extras, dados))
+        return lote
+
+    def somar(self, lote: List[Tuple]) -> None:
+        """Incorpora um lote de `drenar()` vindo de outro processo."""
+        classes = {classe.__name__: classe for classe in (Contador, Medidor, Histograma)}
+        for classe, nome, ajuda, extras, dados in lote:
+            self._obter(classes[classe], nome, ajuda, **extras).somar(dados)
+
+    def texto(self) -> str:
+        with self._lock:
+            metricas = list(self._metricas.values())
+        linhas = [linha for metrica in metricas for linha in metrica.texto()]
+        return "\n".join(linhas) + "\n" if linhas else ""
+
+    def exportar(self, caminho: str = ARQUIVO_METRICAS) -> None:
+        """Grava o snapshot de forma atômica (quem lê nunca vê um arquivo pela metade)."""
+        temporario = f"{caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            f.write(self.texto())
+        os.replace(temporario, caminho)
+
+
+def mesclar_exposicoes(*textos: str) -> str:
+    """
+    Junta exposições de processos diferentes (ex.: servidor web + snapshot da
+    catraca) numa só: o Prometheus rejeita a mesma família duas vezes, então
+    cada família sai uma vez, com HELP/TYPE da primeira ocorrência. A mesma
+    série vinda de dois processos é somada em contadores e histogramas; em
+    medidores vale a última.
+    """
+    familias: Dict[str, Dict] = {}
+    for texto in textos:
+        atual = None
+        for linha in texto.splitlines():
+            if linha.startswith(('# HELP ', '# TYPE ')):
+                _, chave, nome, resto = (linha.split(' ', 3) + [''])[:4]
+                atual = familias.setdefault(nome, {'HELP': None, 'TYPE': None, 'series': {}})
+                if atual[chave] is None:
+                    atual[chave] = resto
+            elif linha and not linha.startswith('#') and atual is not None:
+                serie, valor = linha.rsplit(' ', 1)
+                series = atual['series']
+                if serie in series and atual['TYPE'] != 'gauge':
+                    valor = _numero(float(series[serie]) + float(valor))
+                series[serie] = valor
+
+    linhas = []
+    for nome, familia in familias.items():
+        if not familia['series']:
+            continue
+        if familia['HELP'] is not None:
+            linhas.append(f"# HELP {nome} {familia['HELP']}")
+        if familia['TYPE'] is not None:
+            linhas.append(f"# TYPE {nome} {familia['TYPE']}")
+        linhas.extend(f"{serie} {valor}" for serie, valor in familia['series'].items())
+    return "\n".join(linhas) + "\n" if linhas else ""
+
+
+REGISTRO = Registro()
+
+# Métricas do caminho crítico da catraca (compartilhadas pelos módulos)
+ETAPAS_CATRACA = REGISTRO.histograma(
+    "catraca_etapa_segundos", "Duração de cada etapa do laço da catraca (captura, deteccao, qualidade, encoding, busca, registro, desenho, exibicao)")
+FRAMES_CATRACA = REGISTRO.contador(
+    "catraca_frames_total", "Frames por resultado (capturado, falha_captura, descartado, processado, sem_movimento)")
+ROSTOS_CATRACA = REGISTRO.contador(
+    "catraca_rostos_total", "Rostos por resultado da busca (reconhecido, desconhecido)")
+ROSTOS_DESCARTADOS = REGISTRO.contador(
+    "catraca_rostos_descartados_total", "Rostos descartados antes do encoding por motivo (pequeno, borrado, perfil, exposicao)")
+ETAPAS_UPLOAD = REGISTRO.histograma(
+    "catraca_upload_etapa_segundos", "Duração de cada etapa do cadastro por upload (leitura, ajuste, gravacao, chip, duplicata)")
+UPLOADS = REGISTRO.contador(
+    "catraca_uploads_total", "Fotos de cadastro recebidas por resultado (ok, sem_rosto, duplicata, erro)")
+TAXA_PROCESSAMENTO = REGISTRO.medidor(
+    "catraca_processamento_hz", "Frames processados por segundo escolhidos pelo governador")
+CUSTO_PROCESSAMENTO = REGISTRO.medidor(
+    "catraca_custo_processamento_segundos", "Média móvel do tempo de processamento de um frame")
+PRESENCA_CATRACA = REGISTRO.medidor(
+    "catraca_presenca", "1 com rostos na catraca (cadência rápida), 0 vazia (cadência ociosa)")
+CAMERA_ATIVA = REGISTRO.medidor(
+    "catraca_camera_ativa", "1 com a câmera entregando frames, 0 instável, reconectando ou encerrada")
+RECONEXOES_CAMERA = REGISTRO.contador(
+    "catraca_camera_reconexoes_total", "Tentativas de reabrir a fonte de vídeo por resultado (ok, falha)")
+EVENTOS_DESCARTADOS = REGISTRO.contador(
+    "catraca_eventos_descartados_total", "Eventos de log descartados com a fila cheia")
+INICIALIZACAO = REGISTRO.medidor(
+    "catraca_inicializacao_segundos", "Duração de cada fase da inicialização (importacoes, banco, galeria, camera, espera_modelos, primeiro_reconhecimento; modelos corre em paralelo)")
+
+
+def iniciar_exportacao(caminho: str = ARQUIVO_METRICAS, intervalo: float = INTERVALO_EXPORTACAO,
+                       registro: Registro = REGISTRO) -> threading.Thread:
+    """Thread que grava o snapshot periodicamente, fora do laço da câmera."""
+    def exportar_sempre():
+        while True:
+            time.sleep(intervalo)
+            try:
+                registro.exportar(caminho)
+            except OSError as e:
+                print(f"⚠️ Não foi possível gravar as métricas: {e}")
+
+    thread = threading.Thread(target=exportar_sempre, name="exportador-metricas", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,189 @@
+# modelos_face.py
+# Modelos do dlib carregados sob demanda, um a um, e aquecidos em segundo
+# plano. Importar face_recognition.api desserializa todos os modelos de uma
+# vez (~2 s, metade só no preditor de 68 pontos, que a catraca não usa).
+# Os modelos do dlib não são thread-safe: cada thread usa a sua instância
+
+import time
+import pickle
+import logging
+import threading
+import importlib.util
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+
+from metricas import INICIALIZACAO
+from eventos import obter_logger, evento
+
+# --- ARQUIVOS DO face_recognition_models ---
+MODELO_5_PONTOS = "shape_predictor_5_face_landmarks.dat"
+MODELO_ENCODER = "dlib_face_recognition_resnet_model_v1.dat"
+MODELO_CNN = "mmod_human_face_detector.dat"
+
+log = obter_logger("modelos_face")
+_modelos: Dict[str, object] = {}      # Instância original de cada modelo (a aquecida)
+_donos: Dict[str, Optional[int]] = {}  # Thread que está usando a original (None = livre)
+_locais = threading.local()            # Instâncias da thread atual
+_lock = threading.Lock()
+_aquecimento: Optional[threading.Thread] = None
+_aquecidos = threading.Event()
+
+
+def caminho_modelo(arquivo: str) -> str:
+    """
+    Caminho de um modelo do pacote face_recognition_models, sem importá-lo
+    (o __init__ dele carrega o pkg_resources, ~0,2 s).
+    """
+    spec = importlib.util.find_spec("face_recognition_models")
+    if spec is None or not spec.submodule_search_locations:
+        raise ImportError("face_recognition_models não instalado (pip install face_recognition_models)")
+    return f"{list(spec.submodule_search_locations)[0]}/models/{arquivo}"
+
+
+def _carregar(nome: str, fabrica: Callable[[], object], copiavel: bool = False):
+    """
+    Instância do modelo para a thread atual. A original (carregada uma vez,
+    normalmente pelo aquecimento) fica com a primeira thread que a pedir
+    livre; as demais recebem uma cópia própria, por pickle quando o modelo
+    permite (HOG: ~7 ms contra ~0,7 s do construtor) ou carregada de novo.
+    """
+    locais = getattr(_locais, 'modelos', None)
+    if locais is None:
+        locais = _locais.modelos = {}
+    modelo = locais.get(nome)
+    if modelo is not None:
+        return modelo
+
+    with _lock:
+        inicio = time.perf_counter()
+        if nome not in _modelos:
+            _modelos[nome] = modelo = fabrica()
+            _donos[nome] = threading.get_ident()
+            origem = "arquivo"
+        elif _donos.get(nome) is None:
+            modelo = _modelos[nome]
+            _donos[nome] = threading.get_ident()
+            origem = "original"
+        else:
+            modelo = pickle.loads(pickle.dumps(_modelos[nome])) if copiavel else None
+            origem = "copia" if copiavel else "arquivo"
+    if modelo is None:
+        modelo = fabrica()  # Fora do lock: carregar um modelo não bloqueia as outras threads
+    if origem != "original":
+        evento(log, logging.INFO, "modelo_carregado", modelo=nome, origem=origem,
+               ms=round((time.perf_counter() - inicio) * 1000, 1))
+    locais[nome] = modelo
+    return modelo
+
+
+def liberar_modelos() -> None:
+    """Devolve as instâncias originais usadas por esta thread (ex.: ao fim do aquecimento)."""
+    eu = threading.get_ident()
+    with _lock:
+        for nome, dono in _donos.items():
+            if dono == eu:
+                _donos[nome] = None
+    _locais.modelos = {}
+
+
+def detector_hog():
+    import dlib
+    return _carregar("hog", dlib.get_frontal_face_detector, copiavel=True)
+
+
+def detector_cnn():
+    import dlib
+    return _carregar("cnn", lambda: dlib.cnn_face_detection_model_v1(caminho_modelo(MODELO_CNN)))
+
+
+def preditor_5_pontos():
+    import dlib
+    return _carregar("5_pontos", lambda: dlib.shape_predictor(caminho_modelo(MODELO_5_PONTOS)))
+
+
+def codificador():
+    import dlib
+    return _carregar("encoder", lambda: dlib.face_recognition_model_v1(caminho_modelo(MODELO_ENCODER)))
+
+
+def localizar_rostos(imagem_rgb: np.ndarray, upsample: int = 1, modelo: str = "hog") -> List[Tuple[int, int, int, int]]:
+    """Equivalente a face_recognition.face_locations: caixas (top, right, bottom, left) recortadas à imagem."""
+    if modelo == "cnn":
+        retangulos = [d.rect for d in detector_cnn()(imagem_rgb, upsample)]
+    else:
+        retangulos = detector_hog()(imagem_rgb, upsample)
+    altura, largura = imagem_rgb.shape[:2]
+    return [(max(r.top(), 0), min(r.right(), largura), min(r.bottom(), altura), max(r.left(), 0))
+            for r in retangulos]
+
+
+def carregar_imagem(caminho: str) -> np.ndarray:
+    """Equivalente a face_recognition.load_image_file (RGB uint8)."""
+    from PIL import Image, ImageFile
+    ImageFile.LOAD_TRUNCATED_IMAGES = True
+    with Image.open(caminho) as imagem:
+        return np.array(imagem.convert('RGB'))
+
+
+def aquecer(detector: str = "hog", registrar_fase: bool = True) -> float:
+    """
+    Carrega os modelos do caminho de reconhecimento e roda uma detecção e um
+    encoding de descarte (as primeiras chamadas do dlib alocam buffers), no
+    codificador ativo (ver codificacao.definir_codificador).
+    Retorna a duração em segundos. `registrar_fase` grava a duração na fase
+    "modelos" de catraca_inicializacao_segundos: só o processo da catraca
+    deve gravar, para a série não aparecer duas vezes no /metrics.
+    """
+    from codificacao import codificador_ativo  # codificacao importa este módulo
+
+    inicio = time.perf_counter()
+    if detector in ("hog", "cnn"):
+        localizar_rostos(np.zeros((120, 160, 3), np.uint8), 0, detector)
+    preditor_5_pontos()
+    backend = codificador_ativo()
+    backend.aquecer()
+    duracao = time.perf_counter() - inicio
+
+    _aquecidos.set()
+    if registrar_fase:
+        INICIALIZACAO.definir(duracao, fase="modelos")
+    evento(log, logging.INFO, "modelos_aquecidos", detector=detector, codificador=backend.versao,
+           ms=round(duracao * 1000, 1))
+    return duracao
+
+
+def aquecer_em_segundo_plano(detector: str = "hog", registrar_fase: bool = True) -> threading.Thread:
+    """
+    Dispara o aquecimento numa thread (idempotente). O dlib segura o GIL
+    enquanto desserializa, então o ganho vem de sobrepor a carga com o que
+    libera o GIL: abrir e sondar a câmera, SQLite e disco.
+    """
+    global _aquecimento
+    with _lock:
+        if _aquecimento is None:
+            _aquecimento = threading.Thread(target=_aquecer_seguro, args=(detector, registrar_fase),
+                                            name="aquecimento-modelos", daemon=True)
+            _aquecimento.start()
+        return _aquecimento
+
+
+def _aquecer_seguro(detector: str, registrar_fase: bool) -> None:
+    try:
+        aquecer(detector, registrar_fase)
+    except Exception:
+        # Quem usar o modelo depois vê o erro de novo, na própria thread
+        evento(log, logging.ERROR, "erro_aquecer_modelos", exc_info=True, detector=detector)
+    finally:
+        # Os modelos aquecidos passam para a primeira thread que os pedir
+        liberar_modelos()
+
+
+def aguardar_modelos(timeout: Optional[float] = None) -> bool:
+    """
+    Espera o aquecimento disparado em segundo plano; True se os modelos
+    estão prontos. Chamar antes da primeira detecção: assim a thread recebe
+    as instâncias já aquecidas em vez de carregar cópias.
+    """
+    if _aquecimento is not None:
+        _aquecimento.join(timeout)
+    return _aquecidos.is_set()
@@ -0,0 +1,74 @@
+# movimento.py
+# Pré-filtro de presença: subtração de fundo numa miniatura em tons de cinza
+# da ROI. Com a cena parada e ninguém na catraca, detecção e encoding não rodam
+
+import time
+import cv2
+import numpy as np
+from typing import Optional, Tuple
+
+# --- CONFIGURAÇÕES ---
+LARGURA_MINIATURA = 64          # px; a altura segue a proporção da ROI
+LIMIAR_PIXEL = 20               # Diferença de cinza (0-255) para um pixel contar como mudança
+SENSIBILIDADE = 0.01            # Fração da miniatura que precisa mudar para haver movimento
+APRENDIZADO_FUNDO = 0.2         # Peso de cada miniatura na média do fundo
+INTERVALO_VERIFICACAO = 5.0     # segundos: detecção completa mesmo sem movimento
+
+
+class DetectorMovimento:
+    """
+    Mantém uma média móvel do fundo em baixíssima resolução e compara cada
+    frame com ela. Custa um resize e algumas operações em ~3 mil pixels
+    (menos de 0,1 ms num frame 720p).
+
+    `sensibilidade` é a fração de pixels alterados que conta como movimento:
+    menor dispara com menos (mais detecções), maior ignora mudanças pequenas.
+    """
+
+    def __init__(self, roi: Tuple[float, float, float, float] = (0.0, 0.0, 1.0, 1.0),
+                 sensibilidade: float = SENSIBILIDADE, limiar_pixel: int = LIMIAR_PIXEL,
+                 largura: int = LARGURA_MINIATURA, aprendizado: float = APRENDIZADO_FUNDO,
+                 intervalo_verificacao: float = INTERVALO_VERIFICACAO):
+        self.roi = roi
+        self.sensibilidade = sensibilidade
+        self.limiar_pixel = limiar_pixel
+        self.largura = largura
+        self.aprendizado = aprendizado
+        self.intervalo_verificacao = intervalo_verificacao
+        self.fundo: Optional[np.ndarray] = None
+        self.ultima_verificacao = float('-inf')
+        self.fracao_alterada = 0.0
+
+    def _miniatura(self, frame) -> np.ndarray:
+        altura, largura = frame.shape[:2]
+        x0, y0, x1, y1 = self.roi
+        recorte = frame[int(y0 * altura):int(y1 * altura), int(x0 * largura):int(x1 * largura)]
+        altura_mini = max(1, round(self.largura * recorte.shape[0] / max(1, recorte.shape[1])))
+        # INTER_LINEAR amostra poucos pixels (~0,02 ms contra ~1,7 ms do INTER_AREA em 720p);
+        # o ruído dessa amostragem é absorvido pelo blur e pelo limiar por pixel
+        mini = cv2.resize(recorte, (self.largura, altura_mini), interpolation=cv2.INTER_LINEAR)
+        if mini.ndim == 3:
+            mini = cv2.cvtColor(mini, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(mini, (5, 5), 0).astype(np.float32)
+
+    def verificar(self, frame, forcar: bool = False, agora: Optional[float] = None) -> bool:
+        """
+        Atualiza o fundo e diz se o frame deve passar para a detecção: há
+        movimento, `forcar` (ex.: rostos presentes) ou venceu o intervalo de
+        verificação periódica (pega quem parou diante da câmera).
+        """
+        agora = time.monotonic() if agora is None else agora
+        mini = self._miniatura(frame)
+
+        if self.fundo is None or self.fundo.shape != mini.shape:
+            self.fundo = mini
+            self.fracao_alterada = 1.0
+        else:
+            self.fracao_alterada = float(np.count_nonzero(cv2.absdiff(mini, self.fundo) > self.limiar_pixel)) / mini.size
+            cv2.accumulateWeighted(mini, self.fundo, self.aprendizado)
+
+        if forcar or self.fracao_alterada >= self.sensibilidade or \
+                agora - self.ultima_verificacao >= self.intervalo_verificacao:
+            self.ultima_verificacao = agora
+            return True
+        return False
@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+# multi_catraca.py
+# Serviço multi-catraca: N câmeras num único processo, compartilhando uma
+# galeria, um reconhecedor (encoding em lote) e um único escritor do SQLite.
+# Com --processos, cada catraca roda num processo próprio e lê a galeria
+# publicada em memória compartilhada
+
+import sys
+import json
+import time
+import queue
+import signal
+import sqlite3
+import logging
+import argparse
+import threading
+import multiprocessing
+import cv2
+import numpy as np
+from typing import Dict, List, Optional
+
+import catraca_virtual
+from catraca_virtual import (setup_database, carregar_galeria_db, draw_recognition_interface, reconhecer_frame,
+                             RECOGNITION_COOLDOWN, DETECTOR_BACKEND, ESCALAS_BUSCA,
+                             REFINAR_DETECCAO, PRECISAO_GALERIA, SENSIBILIDADE_MOVIMENTO, LIMIAR_PIXEL_MOVIMENTO)
+from camera import CameraSupervisionada
+from codificacao import LoteEncoding
+from qualidade import registrar_descartes
+from deteccao import DetectorAdaptativo, criar_detector, ROI_PADRAO
+from galeria_compartilhada import PublicadorGaleria, GaleriaCompartilhada, NOME_PADRAO
+from governador import GovernadorTaxa
+from modelos_face import aquecer_em_segundo_plano, aguardar_modelos
+from movimento import DetectorMovimento
+from eventos import obter_logger, evento, configurar_eventos
+from metricas import REGISTRO, INTERVALO_EXPORTACAO, iniciar_exportacao
+
+# --- CONFIGURAÇÕES DO SERVIÇO ---
+CONFIG_CATRACAS = "catracas.json"
+TAMANHO_LOTE = 16               # Máximo de rostos codificados por chamada
+TAMANHO_FILA_ROSTOS = 32        # Frames com rostos aguardando o reconhecedor
+DIRECOES = ("ENTRADA", "SAÍDA", "AUTO")
+log = obter_logger("multi_catraca")
+
+
+def config_catraca(item: Dict, indice: int = 0) -> Dict:
+    """
+    Valida e completa a configuração de uma catraca: nome, fonte (índice,
+    arquivo ou URL), roi [x0, y0, x1, y1], direcao (ENTRADA, SAÍDA ou AUTO),
+    exibir (janela de vídeo), limiar (distância máxima do match) e detector.
+    """
+    if item.get('fonte') is None:
+        raise ValueError(f"Catraca {indice}: 'fonte' é obrigatória")
+
+    direcao = item.get('direcao', 'AUTO').upper().replace('SAIDA', 'SAÍDA')
+    if direcao not in DIRECOES:
+        raise ValueError(f"Catraca {indice}: direção inválida '{item.get('direcao')}'")
+
+    return {
+        'nome': item.get('nome', f"catraca_{indice + 1}"),
+        'fonte': item['fonte'],
+        'roi': tuple(item.get('roi', ROI_PADRAO)),
+        'direcao': direcao,
+        'exibir': bool(item.get('exibir', False)),
+        # Padrões lidos na chamada: seguem o que a linha de comando ajustou em catraca_virtual
+        'limiar': float(item.get('limiar', catraca_virtual.FACE_MATCH_THRESHOLD)),
+        'detector': item.get('detector', catraca_virtual.DETECTOR_BACKEND),
+    }
+
+
+def carregar_config_catracas(caminho: str = CONFIG_CATRACAS) -> List[Dict]:
+    """Lê a lista de catracas do JSON (campos de cada item em `config_catraca`)."""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        itens = json.load(f)
+
+    catracas = [config_catraca(item, i) for i, item in enumerate(itens)]
+    nomes = [c['nome'] for c in catracas]
+    if len(set(nomes)) != len(nomes):
+        raise ValueError("Nomes de catraca repetidos")
+    return catracas
+
+
+class EscritorAcessos(threading.Thread):
+    """
+    Único escritor do banco para todas as catracas: consome uma fila e grava
+    os acessos acumulados numa só transação. O último tipo (ENTRADA/SAÍDA)
+    de cada pessoa fica em memória, sem SELECT por passagem.
+    """
+
+    def __init__(self, db_file: Optional[str] = None):
+        super().__init__(name="escritor-acessos", daemon=True)
+        self.db_file = db_file or catraca_virtual.DB_FILE  # Lido na criação: respeita o --db da linha de comando
+        self.fila = queue.Queue()
+        self.ultimo_tipo: Dict[str, str] = {}
+
+    def registrar(self, dados_usuario: Dict, status: str, direcao: str, catraca: str) -> None:
+        """Enfileira um acesso; não bloqueia o pipeline da câmera."""
+        self.fila.put((dados_usuario, status, direcao, catraca))
+
+    def parar(self) -> None:
+        self.fila.put(None)
+        self.join()
+
+    def _tipo(self, cursor, cpf: str, direcao: str) -> str:
+        """Direção fixa da catraca ou alternância ENTRADA/SAÍDA (AUTO)."""
+        if direcao != "AUTO":
+            tipo = direcao
+        else:
+            if cpf not in self.ultimo_tipo:
+                cursor.execute('''
+                    SELECT tipo FROM acessos
+                    WHERE cpf = ? AND status = "Identificado"
+                    ORDER BY id DESC LIMIT 1
+                ''', (cpf,))
+                resultado = cursor.fetchone()
+                self.ultimo_tipo[cpf] = resultado[0] if resultado else "SAÍDA"
+            tipo = "SAÍDA" if self.ultimo_tipo[cpf] == "ENTRADA" else "ENTRADA"
+
+        self.ultimo_tipo[cpf] = tipo
+        return tipo
+
+    def run(self) -> None:
+        conn = sqlite3.connect(self.db_file)
+        cursor = conn.cursor()
+        ativo = True
+
+        while ativo:
+            itens = [self.fila.get()]
+            while True:
+                try:
+                    itens.append(self.fila.get_nowait())
+                except queue.Empty:
+                    break
+
+            if None in itens:
+                ativo = False
+                itens = [item for item in itens if item is not None]
+
+            linhas = []
+            for dados_usuario, status, direcao, catraca in itens:
+                tipo = self._tipo(cursor, dados_usuario['cpf'], direcao) if status == "Identificado" else "N/A"
+                linhas.append((dados_usuario.get('id'), dados_usuario.get('nome', 'Desconhecido'),
+                               dados_usuario.get('equipe', 'N/A'), dados_usuario.get('cpf', 'N/A'),
+                               tipo, status, catraca))
+                if status == "Identificado":
+                    evento(log, logging.INFO, "pessoa_identificada", catraca=catraca, pessoa=dados_usuario['nome'],
+                           equipe=dados_usuario['equipe'], tipo=tipo)
+
+            if linhas:
+                try:
+                    cursor.executemany('''
+                        INSERT INTO acessos (usuario_id, nome, equipe, cpf, tipo, status, catraca)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', linhas)
+                    conn.commit()
+                except Exception:
+                    evento(log, logging.ERROR, "erro_registrar_acessos", exc_info=True, acessos=len(linhas))
+
+        conn.close()
+
+
+class PipelineCatraca(threading.Thread):
+    """Captura e detecção de uma catraca; os rostos seguem para o reconhecedor central."""
+
+    def __init__(self, config: Dict, fila_rostos: queue.Queue):
+        super().__init__(name=f"catraca-{config['nome']}", daemon=True)
+        self.config = config
+        self.nome = config['nome']
+        self.fila_rostos = fila_rostos
+        self.ativo = False
+        self.fonte_indisponivel = False
+        self.ultimo_frame = None
+        self.ultimo_resultado = ([], [], [])  # locations, nomes, distâncias (para exibição)
+        self.governador = GovernadorTaxa(self.nome)  # O reconhecedor soma a parte do lote ao custo
+
+    def run(self) -> None:
+        camera = CameraSupervisionada(self.config['fonte'], self.nome)
+        if not camera.conectar():
+            if not camera.ao_vivo:
+                print(f"❌ [{self.nome}] Não foi possível abrir a fonte {self.config['fonte']}")
+                self.fonte_indisponivel = True
+                return
+            print(f"⚠️ [{self.nome}] Fonte {self.config['fonte']} indisponível; tentando reconectar...")
+
+        aguardar_modelos()  # Não detectar enquanto o aquecimento usa os modelos
+        detector = DetectorAdaptativo(self.config['roi'], ESCALAS_BUSCA, REFINAR_DETECCAO,
+                                      criar_detector(self.config['detector']))
+        governador = self.governador
+        movimento = DetectorMovimento(self.config['roi'], SENSIBILIDADE_MOVIMENTO, LIMIAR_PIXEL_MOVIMENTO)
+        self.ativo = True
+        print(f"✅ [{self.nome}] Catraca ativa ({self.config['direcao']})")
+
+        while self.ativo:
+            ret, frame = camera.read()
+            if not ret:
+                if camera.encerrada:
+                    print(f"📼 [{self.nome}] Fim do vídeo")
+                    break
+                continue  # A supervisão já esperou (falha ou backoff de reconexão)
+
+            self.ultimo_frame = frame
+            agora = time.time()
+            if not governador.deve_processar(agora):
+                continue
+            if not movimento.verificar(frame, forcar=governador.presenca(agora)):
+                governador.pular(time.time())
+                self.ultimo_resultado = ([], [], [])
+                continue
+
+            face_locations = detector.detectar(frame)
+            governador.registrar(agora, time.time() - agora, len(face_locations))
+            if not face_locations:
+                self.ultimo_resultado = ([], [], [])
+                continue
+
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            try:
+                self.fila_rostos.put_nowait((self, rgb_frame, face_locations, agora))
+            except queue.Full:
+                pass  # Reconhecedor atrasado: descarta o frame em vez de acumular latência
+
+        self.ativo = False
+        camera.release()
+
+
+class ServicoCatracas:
+    """Orquestra as catracas: uma galeria, um reconhecedor e um escritor para todas."""
+
+    def __init__(self, configs: List[Dict]):
+        self.galeria = carregar_galeria_db()
+        self.fila_rostos = queue.Queue(maxsize=TAMANHO_FILA_ROSTOS)
+        self.escritor = EscritorAcessos()
+        self.pipelines = {c['nome']: PipelineCatraca(c, self.fila_rostos) for c in configs}
+        self.ultima_passagem: Dict = {}  # (catraca, cpf) -> instante
+        self.ativo = False
+        self.reconhecedor = threading.Thread(target=self._reconhecer, name="reconhecedor", daemon=True)
+
+    def recarregar_galeria(self) -> None:
+        """Monta a galeria nova fora do caminho crítico e troca a referência de uma vez."""
+        self.galeria = carregar_galeria_db()
+
+    def _reconhecer(self) -> None:
+        """Junta rostos de todas as catracas em lotes e processa cada lote de uma vez."""
+        lote = LoteEncoding(TAMANHO_LOTE, filtrar=catraca_virtual.FILTRO_QUALIDADE)
+        while self.ativo:
+            try:
+                item = self.fila_rostos.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            # Junta o que já estiver na fila (outras catracas) no mesmo lote;
+            # rostos reprovados pelo filtro de qualidade só voltam para a tela
+            descartados = []
+            custos: Dict[PipelineCatraca, float] = {}  # Parte de cada catraca no tempo do lote
+            while True:
+                pipeline, rgb_frame, face_locations, instante = item
+                inicio = time.perf_counter()
+                qualidades = lote.adicionar(rgb_frame, face_locations, (pipeline, instante))
+                custos[pipeline] = custos.get(pipeline, 0.0) + time.perf_counter() - inicio
+                registrar_descartes(qualidades, pipeline.nome)
+                descartados.extend((pipeline, loc) for loc, q in zip(face_locations, qualidades) if not q['aprovado'])
+                if lote.cheio:
+                    break
+                try:
+                    item = self.fila_rostos.get_nowait()
+                except queue.Empty:
+                    break
+
+            galeria = self.galeria
+            exibicao = {}
+            inicio = time.perf_counter()
+            resultados = lote.processar(galeria)
+            duracao = time.perf_counter() - inicio
+            for r in resultados:
+                # Encoding e busca divididos entre as catracas pelo nº de rostos no lote
+                custos[r['contexto'][0]] += duracao / len(resultados)
+
+            agora = time.time()
+            for pipeline, custo in custos.items():
+                pipeline.governador.registrar_reconhecimento(custo, agora)
+
+            for r in resultados:
+                pipeline, instante = r['contexto']
+                locations, nomes, distancias = exibicao.setdefault(pipeline, ([], [], []))
+                locations.append(r['location'])
+                distancias.append(r['distancia'])
+
+                if r['indice'] < 0 or r['distancia'] > pipeline.config['limiar']:
+                    nomes.append("Desconhecido")
+                    continue
+
+                dados_usuario = galeria.usuarios[r['indice']]
+                nomes.append(dados_usuario['nome'])
+
+                chave = (pipeline.nome, dados_usuario['cpf'])
+                if instante - self.ultima_passagem.get(chave, 0) > RECOGNITION_COOLDOWN:
+                    self.ultima_passagem[chave] = instante
+                    self.escritor.registrar(dados_usuario, "Identificado", pipeline.config['direcao'], pipeline.nome)
+
+            for pipeline, location in descartados:
+                locations, nomes, distancias = exibicao.setdefault(pipeline, ([], [], []))
+                locations.append(location)
+                nomes.append(catraca_virtual.ROSTO_BAIXA_QUALIDADE)
+                distancias.append(float('inf'))
+
+            for pipeline, resultado in exibicao.items():
+                pipeline.ultimo_resultado = resultado
+
+    def iniciar(self) -> None:
+        self.ativo = True
+        self.escritor.start()
+        self.reconhecedor.start()
+        for pipeline in self.pipelines.values():
+            pipeline.start()
+
+    def parar(self) -> None:
+        for pipeline in self.pipelines.values():
+            pipeline.ativo = False
+        for pipeline in self.pipelines.values():
+            pipeline.join(timeout=2)
+        self.ativo = False
+        self.reconhecedor.join(timeout=2)
+        self.escritor.parar()
+        if any(p.config['exibir'] for p in self.pipelines.values()):
+            cv2.destroyAllWindows()
+
+    def executar(self) -> None:
+        """Laço principal: janelas (só na thread principal) e teclas q / r."""
+        self.iniciar()
+        exibidas = [p for p in self.pipelines.values() if p.config['exibir']]
+        buffers: Dict[str, np.ndarray] = {}
+        print(f"✅ {len(self.pipelines)} catraca(s) | {len(self.galeria)} pessoa(s) na galeria")
+        print("💡 'q' encerra | 'r' recarrega a galeria" if exibidas else "💡 Ctrl+C encerra")
+
+        try:
+            while any(p.is_alive() for p in self.pipelines.values()):
+                if not exibidas:
+                    time.sleep(0.5)
+                    continue
+
+                for pipeline in exibidas:
+                    origem = pipeline.ultimo_frame
+                    if origem is None:
+                        continue
+                    # Desenha sobre uma cópia num buffer fixo por catraca (o frame da thread fica intacto)
+                    frame = buffers.get(pipeline.nome)
+                    if frame is None or frame.shape != origem.shape:
+                        frame = buffers[pipeline.nome] = np.empty_like(origem)
+                    np.copyto(frame, origem)
+                    locations, nomes, distancias = pipeline.ultimo_resultado
+                    draw_recognition_interface(frame, locations, nomes, distancias,
+                                               total_cadastrados=len(self.galeria))
+                    cv2.imshow(f"Catraca Virtual - {pipeline.nome}", frame)
+
+                key = cv2.waitKey(30) & 0xFF
+                if key == ord('q'):
+                    break
+                elif key == ord('r'):
+                    print("🔄 Recarregando galeria...")
+                    self.recarregar_galeria()
+        except KeyboardInterrupt:
+            print("\n🛑 Serviço interrompido pelo usuário.")
+        finally:
+            self.parar()
+
+
+def processo_catraca(config: Dict, nome_galeria: str, fila_eventos, evento_parar,
+                     codificador: str = "dlib", eventos: Optional[Dict] = None) -> None:
+    """
+    Worker de uma catraca em processo próprio: captura, detecção, encoding e
+    busca na galeria compartilhada. Só os acessos e, a cada
+    INTERVALO_EXPORTACAO, as métricas voltam ao processo principal.
+    `codificador` é o do processo principal, que montou a galeria publicada;
+    `eventos` são os argumentos de configurar_eventos do processo principal.
+    """
+    nome = config['nome']
+    configurar_eventos(**(eventos or {}))  # Processo spawn: handlers não são herdados
+    catraca_virtual.configurar_codificador(codificador)
+    aquecer_em_segundo_plano(config['detector'])
+    compartilhada = GaleriaCompartilhada(nome_galeria, PRECISAO_GALERIA)
+    camera = CameraSupervisionada(config['fonte'], nome)
+    if not camera.conectar():
+        if not camera.ao_vivo:
+            print(f"❌ [{nome}] Não foi possível abrir a fonte {config['fonte']}")
+            compartilhada.fechar()
+            return
+        print(f"⚠️ [{nome}] Fonte {config['fonte']} indisponível; tentando reconectar...")
+
+    aguardar_modelos()
+    detector = DetectorAdaptativo(config['roi'], ESCALAS_BUSCA, REFINAR_DETECCAO, criar_detector(config['detector']))
+    governador = GovernadorTaxa(nome)
+    movimento = DetectorMovimento(config['roi'], SENSIBILIDADE_MOVIMENTO, LIMIAR_PIXEL_MOVIMENTO)
+    ultima_passagem: Dict[str, float] = {}
+    proxima_exportacao = time.monotonic() + INTERVALO_EXPORTACAO
+    print(f"✅ [{nome}] Catraca ativa em processo próprio ({config['direcao']})")
+
+    try:
+        while not evento_parar.is_set():
+            if time.monotonic() >= proxima_exportacao:
+                # O snapshot do /metrics é gravado pelo processo principal
+                fila_eventos.put(("metricas", REGISTRO.drenar()))
+                proxima_exportacao = time.monotonic() + INTERVALO_EXPORTACAO
+            ret, frame = camera.read()
+            if not ret:
+                if camera.encerrada:
+                    print(f"📼 [{nome}] Fim do vídeo")
+                    break
+                continue
+
+            agora = time.time()
+            if not governador.deve_processar(agora):
+                continue
+            if not movimento.verificar(frame, forcar=governador.presenca(agora)):
+                governador.pular(time.time())
+                continue
+
+            # Troca de geração custa só a leitura do número quando nada mudou
+            compartilhada.atualizar()
+            galeria = compartilhada.galeria
+            face_locations, _, matches = reconhecer_frame(frame, detector, galeria, nome)
+            governador.registrar(agora, time.time() - agora, len(face_locations))
+
+            for indice, distancia in matches:
+                if indice < 0 or distancia > config['limiar']:
+                    continue
+                dados_usuario = galeria.usuarios[indice]
+                if agora - ultima_passagem.get(dados_usuario['cpf'], 0) > RECOGNITION_COOLDOWN:
+                    ultima_passagem[dados_usuario['cpf']] = agora
+                    fila_eventos.put(("acesso", (dados_usuario, "Identificado", config['direcao'], nome)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        camera.release()
+        compartilhada.fechar()
+        fila_eventos.put(("metricas", REGISTRO.drenar()))
+
+
+class ServicoProcessos:
+    """
+    Variante multi-processo: o processo principal monta e publica a galeria
+    e é o único escritor do banco; cada catraca roda em um processo (spawn).
+    Janelas de vídeo não são suportadas neste modo.
+    """
+
+    def __init__(self, configs: List[Dict], nome_galeria: str = NOME_PADRAO, eventos: Optional[Dict] = None):
+        self.configs = configs
+        self.nome_galeria = nome_galeria
+        self.eventos = eventos or {}  # Nível e arquivo do log de eventos, repassados aos workers
+        self.contexto = multiprocessing.get_context('spawn')
+        self.fila_eventos = self.contexto.Queue()
+        self.evento_parar = self.contexto.Event()
+        self.escritor = EscritorAcessos()
+        self.publicador = PublicadorGaleria(nome_galeria)
+        self.total_cadastrados = 0
+        self.processos = []
+        self.encaminhador = threading.Thread(target=self._encaminhar, name="encaminhador", daemon=True)
+
+    def recarregar_galeria(self) -> None:
+        """Publica uma nova geração; cada worker troca para ela no próximo frame processado."""
+        galeria = carregar_galeria_db()
+        geracao = self.publicador.publicar(galeria)
+        self.total_cadastrados = len(galeria)
+        print(f"📤 Galeria publicada (geração {geracao}, {self.total_cadastrados} pessoa(s))")
+
+    def _encaminhar(self) -> None:
+        """Repassa os acessos vindos dos workers ao escritor único e soma as métricas deles às daqui."""
+        while True:
+            mensagem = self.fila_eventos.get()
+            if mensagem is None:
+                break
+            tipo, carga = mensagem
+            if tipo == "metricas":
+                REGISTRO.somar(carga)
+            else:
+                self.escritor.registrar(*carga)
+
+    def iniciar(self) -> None:
+        self.recarregar_galeria()
+        self.escritor.start()
+        self.encaminhador.start()
+        for config in self.configs:
+            processo = self.contexto.Process(target=processo_catraca, name=f"catraca-{config['nome']}",
+                                             args=(config, self.nome_galeria, self.fila_eventos, self.evento_parar,
+                                                   catraca_virtual.CODIFICADOR_BACKEND, self.eventos))
+            processo.start()
+            self.processos.append(processo)
+
+    def parar(self) -> None:
+        self.evento_parar.set()
+        for processo in self.processos:
+            processo.join(timeout=5)
+            if processo.is_alive():
+                processo.terminate()
+        self.fila_eventos.put(None)
+        self.encaminhador.join(timeout=2)
+        self.escritor.parar()
+        self.publicador.fechar()
+        try:
+            REGISTRO.exportar()  # Snapshot final, com as últimas métricas dos workers
+        except OSError as e:
+            print(f"⚠️ Não foi possível gravar as métricas: {e}")
+
+    def falhas(self) -> Dict[str, int]:
+        """Workers que terminaram com erro: nome -> exitcode (negativo = morto por sinal)."""
+        return {p.name: p.exitcode for p in self.processos if p.exitcode not in (0, None)}
+
+    def executar(self) -> Dict[str, int]:
+        """
+        Aguarda os workers; SIGHUP recarrega a galeria, Ctrl+C encerra.
+        Retorna os workers que terminaram com erro (ver `falhas`).
+        """
+        self.iniciar()
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, lambda *_: self.recarregar_galeria())
+        print(f"✅ {len(self.processos)} catraca(s) em processos | {self.total_cadastrados} pessoa(s) na galeria")
+        print("💡 Ctrl+C encerra | SIGHUP recarrega a galeria")
+
+        try:
+            while any(p.is_alive() for p in self.processos):
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            print("\n🛑 Serviço interrompido pelo usuário.")
+        finally:
+            self.parar()
+
+        falhas = self.falhas()
+        for nome, codigo in falhas.items():
+            evento(log, logging.ERROR, "worker_falhou", processo=nome, exitcode=codigo)
+        return falhas
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serviço multi-catraca")
+    parser.add_argument('--config', default=CONFIG_CATRACAS, help="JSON com as catracas")
+    parser.add_argument('--processos', action='store_true',
+                        help="Uma catraca por processo, com a galeria em memória compartilhada")
+    parser.add_argument('--nome-galeria', default=NOME_PADRAO,
+                        help="Prefixo dos segmentos de memória compartilhada (modo --processos)")
+    parser.add_argument('--codificador', default=catraca_virtual.CODIFICADOR_BACKEND,
+                        help="Backend de encoding de todas as catracas (dlib, sface)")
+    args = parser.parse_args(argv)
+
+    try:
+        # Antes da config: o limiar padrão das catracas é o do codificador
+        catraca_virtual.configurar_codificador(args.codificador)
+        configs = carregar_config_catracas(args.config)
+    except (OSError, ValueError) as e:
+        print(f"❌ Configuração inválida: {e}")
+        return 2
+
+    configurar_eventos()
+    aquecer_em_segundo_plano(DETECTOR_BACKEND)  # Modelos carregam enquanto banco, galeria e câmeras sobem
+    setup_database()
+    iniciar_exportacao()  # Snapshot das métricas (as dos workers incluídas) para o /metrics do servidor web
+    if args.processos:
+        if any(c['exibir'] for c in configs):
+            print("⚠️ Janelas de vídeo não são exibidas no modo --processos")
+        if ServicoProcessos(configs, args.nome_galeria).executar():
+            return 1
+    else:
+        ServicoCatracas(configs).executar()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# qualidade.py
+# Estimativa barata da qualidade de um rosto, feita antes do encoding com
+# nitidez (variância do Laplaciano), yaw pelos 5 marcos, tamanho e exposição.
+# Rostos reprovados não são codificados; o mesmo score escolhe os melhores
+# frames do cadastro
+
+import logging
+import cv2
+import numpy as np
+from typing import Dict, List, Tuple
+
+from chip_facial import CHIP_TAMANHO, CHIP_PADDING
+from metricas import ROSTOS_DESCARTADOS
+from eventos import obter_logger, evento_amostrado
+
+# --- LIMIARES DO FILTRO ---
+ALTURA_MINIMA = 60          # Altura (px) da caixa no frame original
+ALTURA_BOA = 120            # A partir daqui o tamanho não pesa no score
+NITIDEZ_MINIMA = 15.0       # Variância do Laplaciano no centro do chip em cinza
+NITIDEZ_BOA = 60.0
+DESVIO_MAXIMO = 0.35        # |nariz - meio dos olhos| / distância entre os olhos (~30° de yaw)
+BRILHO_MINIMO = 40          # Média de cinza no centro do chip
+BRILHO_MAXIMO = 215
+SATURADOS_MAXIMO = 0.25     # Fração de pixels estourados (>= 250) ou pretos (<= 5)
+
+# Orientação mostrada na tela para cada motivo de reprovação
+ORIENTACOES = {
+    'pequeno': "APROXIME-SE DA CAMERA",
+    'borrado': "FIQUE PARADO",
+    'perfil': "OLHE PARA A CAMERA",
+    'exposicao': "MELHORE A ILUMINACAO",
+}
+
+# Centro do chip: o rosto, sem o padding de fundo
+MARGEM_CHIP = int(round(CHIP_TAMANHO * CHIP_PADDING / (1 + 2 * CHIP_PADDING)))
+
+log = obter_logger("qualidade")
+
+
+def desvio_yaw(pontos: np.ndarray) -> float:
+    """
+    Deslocamento horizontal da base do nariz em relação ao meio dos olhos,
+    em distâncias entre olhos: ~0 de frente, cresce com o giro da cabeça.
+    `pontos` são os 5 marcos do dlib (0-1 e 2-3 cantos dos olhos, 4 nariz).
+    """
+    olho_a, olho_b = pontos[0:2].mean(axis=0), pontos[2:4].mean(axis=0)
+    distancia_olhos = max(float(np.linalg.norm(olho_a - olho_b)), 1.0)
+    return float((pontos[4, 0] - (olho_a[0] + olho_b[0]) / 2) / distancia_olhos)
+
+
+def avaliar_rosto(chip_rgb: np.ndarray, pontos: np.ndarray, face_location: Tuple[int, int, int, int]) -> Dict:
+    """
+    Mede o rosto no chip alinhado e nos marcos faciais. Retorna as medidas,
+    `aprovado`, o primeiro `motivo` de reprovação (pequeno, exposicao,
+    borrado, perfil) e um `score` 0-100 para ordenar frames do cadastro.
+    """
+    top, _, bottom, _ = face_location
+    altura = bottom - top
+    cinza = cv2.cvtColor(chip_rgb, cv2.COLOR_RGB2GRAY)[MARGEM_CHIP:-MARGEM_CHIP, MARGEM_CHIP:-MARGEM_CHIP]
+    nitidez = float(cv2.Laplacian(cinza, cv2.CV_64F).var())
+    brilho = float(cinza.mean())
+    saturados = float(np.count_nonzero((cinza <= 5) | (cinza >= 250))) / cinza.size
+    desvio = desvio_yaw(pontos)
+
+    if altura < ALTURA_MINIMA:
+        motivo = "pequeno"
+    elif not BRILHO_MINIMO <= brilho <= BRILHO_MAXIMO or saturados > SATURADOS_MAXIMO:
+        motivo = "exposicao"  # Antes da nitidez: rosto escuro também tem pouco contraste
+    elif nitidez < NITIDEZ_MINIMA:
+        motivo = "borrado"
+    elif abs(desvio) > DESVIO_MAXIMO:
+        motivo = "perfil"
+    else:
+        motivo = None
+
+    # Cada fator em [0, 1]; pose e exposição só reduzem o score pela metade no limite
+    score = (min(1.0, nitidez / NITIDEZ_BOA)
+             * min(1.0, altura / ALTURA_BOA)
+             * max(0.0, 1.0 - abs(desvio) / (2 * DESVIO_MAXIMO))
+             * max(0.0, 1.0 - abs(brilho - 128) / 256))
+    return {
+        'aprovado': motivo is None,
+        'motivo': motivo,
+        'score': round(100.0 * score, 1),
+        'altura': int(altura),
+        'nitidez': round(nitidez, 1),
+        'desvio': round(desvio, 3),
+        'brilho': round(brilho, 1),
+    }
+
+
+def registrar_descartes(qualidades: List[Dict], catraca: str) -> None:
+    """Conta os rostos reprovados por motivo (métrica + evento amostrado)."""
+    for qualidade in qualidades:
+        if not qualidade['aprovado']:
+            ROSTOS_DESCARTADOS.inc(motivo=qualidade['motivo'], catraca=catraca)
+            evento_amostrado(log, logging.DEBUG, "rosto_descartado", catraca=catraca, **qualidade)
@@ -0,0 +1,293 @@
+# quiosque.py
+# Cadastro automático (mãos livres) para uma fila de pessoas: o rosto é
+# acompanhado em frames reduzidos, os melhores frames pelo score de qualidade
+# são coletados numa janela curta e chips, encodings e cadastro são gravados
+# em segundo plano enquanto a próxima pessoa já se posiciona, sem nenhuma
+# tecla
+
+import os
+import csv
+import time
+import queue
+import sqlite3
+import logging
+import threading
+import cv2
+from typing import Dict, List, Optional, Tuple
+
+import catraca_virtual
+from catraca_virtual import atualizar_candidatos, avaliar_qualidade_cadastro, sanitizar_matricula
+from camera import abrir_fonte
+from chip_facial import gerar_chip, gravar_chip, listar_chips
+from codificacao import codificar_chips
+from deteccao import DetectorAdaptativo, criar_detector
+from galeria import Galeria
+from qualidade import ORIENTACOES
+from renderizacao import RENDERIZADOR
+from modelos_face import aquecer_em_segundo_plano, aguardar_modelos
+from eventos import obter_logger, evento
+
+# --- CONFIGURAÇÕES ---
+ESCALAS_QUIOSQUE = (0.25,)       # Busca com ninguém na frente; com rosto, escala adaptativa (~100 px)
+JANELA_COLETA = 2.0              # s de coleta a partir do primeiro frame aprovado
+SCORE_SUFICIENTE = 70.0          # K frames acima disso encerram a coleta antes da janela
+IOU_MESMO_ROSTO = 0.3            # Sobreposição mínima com a caixa anterior para ser a mesma pessoa
+FRAMES_AUSENCIA = 10             # Frames sem o rosto acompanhado: a pessoa saiu
+TEMPO_SAIDA = 5.0                # s esperando a pessoa sair antes de chamar a próxima
+COLUNAS_FILA = ("nome", "equipe", "matricula")
+
+log = obter_logger("quiosque")
+
+
+def sobreposicao(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+    """IoU entre duas caixas (top, right, bottom, left)."""
+    altura = min(a[2], b[2]) - max(a[0], b[0])
+    largura = min(a[1], b[1]) - max(a[3], b[3])
+    if altura <= 0 or largura <= 0:
+        return 0.0
+    intersecao = altura * largura
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return intersecao / float(area_a + area_b - intersecao)
+
+
+def carregar_fila(caminho_csv: str) -> List[Dict]:
+    """Lê a fila de cadastro (CSV com nome, equipe, matricula); linhas incompletas são ignoradas."""
+    pessoas = []
+    with open(caminho_csv, newline='', encoding='utf-8-sig') as f:
+        for numero, linha in enumerate(csv.DictReader(f), start=2):
+            pessoa = {coluna: str(linha.get(coluna) or '').strip() for coluna in COLUNAS_FILA}
+            pessoa['matricula'] = sanitizar_matricula(pessoa['matricula'])
+            if not all(pessoa.values()):
+                evento(log, logging.WARNING, "linha_fila_invalida", arquivo=caminho_csv, linha=numero)
+                continue
+            pessoas.append(pessoa)
+    return pessoas
+
+
+def matriculas_cadastradas(db_file: str) -> set:
+    """Matrículas já no banco (a fila pula quem já foi cadastrado)."""
+    conn = sqlite3.connect(db_file)
+    try:
+        return {cpf for (cpf,) in conn.execute('SELECT cpf FROM usuarios')}
+    finally:
+        conn.close()
+
+
+class ColetaCadastro:
+    """
+    Acompanha o rosto de uma pessoa entre frames (maior rosto ao chegar,
+    depois o de maior sobreposição com a caixa anterior) e guarda os
+    TEMPLATES_POR_CADASTRO melhores frames aprovados pelo filtro de qualidade.
+    Se a pessoa sai antes do fim, a coleta recomeça do zero.
+    """
+
+    def __init__(self):
+        self.alvo: Optional[Tuple[int, int, int, int]] = None
+        self.candidatos: List[Dict] = []
+        self.inicio: Optional[float] = None
+        self.ausente = 0
+        self.qualidade: Optional[Dict] = None
+
+    def reiniciar(self) -> None:
+        self.__init__()
+
+    def acompanhar(self, face_locations) -> Optional[Tuple[int, int, int, int]]:
+        """Caixa da pessoa acompanhada neste frame (None se ela não apareceu)."""
+        if self.alvo is None:
+            rosto = max(face_locations, key=lambda l: (l[1] - l[3]) * (l[2] - l[0]), default=None)
+        else:
+            rosto = max(face_locations, key=lambda l: sobreposicao(l, self.alvo), default=None)
+            if rosto is not None and sobreposicao(rosto, self.alvo) < IOU_MESMO_ROSTO:
+                rosto = None
+
+        if rosto is None:
+            self.ausente += 1
+            if self.alvo is not None and self.ausente > FRAMES_AUSENCIA:
+                self.reiniciar()
+            return None
+        self.alvo, self.ausente = rosto, 0
+        return rosto
+
+    def observar(self, frame, face_locations) -> Optional[Tuple[int, int, int, int]]:
+        """Acompanha o rosto e, se aprovado, o oferece como candidato. Retorna a caixa acompanhada."""
+        rosto = self.acompanhar(face_locations)
+        if rosto is None:
+            return None
+        self.qualidade = avaliar_qualidade_cadastro(frame, rosto)
+        if self.qualidade['aprovado']:
+            if self.inicio is None:
+                self.inicio = time.time()
+            atualizar_candidatos(self.candidatos, self.qualidade['score'], frame, rosto)
+        return rosto
+
+    @property
+    def concluida(self) -> bool:
+        if len(self.candidatos) >= catraca_virtual.TEMPLATES_POR_CADASTRO and \
+                self.candidatos[-1]['score'] >= SCORE_SUFICIENTE:
+            return True
+        return self.inicio is not None and time.time() - self.inicio >= JANELA_COLETA
+
+
+def concluir_cadastro(pessoa: Dict, candidatos: List[Dict], galerias: Tuple[Galeria, ...] = ()) -> Dict:
+    """
+    Grava foto, chips e usuário e salva os templates já codificados (um
+    lote só), para a catraca reconhecer a pessoa na próxima carga da galeria.
+    O rosto é comparado com todos os usuários das `galerias`: suspeitos de
+    duplicata não bloqueiam o quiosque, mas voltam em `duplicatas`, junto
+    dos `encodings` gravados.
+    """
+    inicio = time.perf_counter()
+    gerados = [gerar_chip(cv2.cvtColor(c['frame'], cv2.COLOR_BGR2RGB), c['location']) for c in candidatos]
+    gerados = [g for g in gerados if g is not None]
+    if not gerados:
+        return {'status': 'sem_rosto'}
+    encodings = codificar_chips([chip for chip, _ in gerados])
+    suspeitos = [s for galeria in galerias for s in catraca_virtual.verificar_duplicatas(encodings, galeria)]
+
+    caminho_usuario = os.path.join(catraca_virtual.USUARIOS_DIR, pessoa['matricula'])
+    foto_path = os.path.join(caminho_usuario, "foto.jpg")
+    os.makedirs(caminho_usuario, exist_ok=True)
+    if not cv2.imwrite(foto_path, candidatos[0]['frame'], [cv2.IMWRITE_JPEG_QUALITY, 95]):
+        return {'status': 'erro_foto'}
+    for caminho_chip in listar_chips(caminho_usuario):
+        os.remove(caminho_chip)
+    for indice, (chip, dados) in enumerate(gerados, start=1):
+        gravar_chip(caminho_usuario, chip, dados, indice)
+
+    if not catraca_virtual.salvar_usuario_db(pessoa['nome'], pessoa['equipe'], pessoa['matricula'], foto_path):
+        return {'status': 'erro_banco'}
+    conn = sqlite3.connect(catraca_virtual.DB_FILE)
+    try:
+        usuario_id = conn.execute('SELECT id FROM usuarios WHERE cpf = ?', (pessoa['matricula'],)).fetchone()[0]
+    finally:
+        conn.close()
+    catraca_virtual.salvar_templates_db(usuario_id, encodings, "cadastro")
+    return {'status': 'cadastrado', 'usuario_id': usuario_id, 'templates': len(encodings),
+            'score': candidatos[0]['score'], 'duplicatas': [s['cpf'] for s in suspeitos], 'encodings': encodings,
+            'ms': round((time.perf_counter() - inicio) * 1000, 1)}
+
+
+class GravadorCadastros(threading.Thread):
+    """
+    Conclui os cadastros numa thread própria: a câmera do quiosque nunca
+    espera o encoding. A thread usa as suas próprias instâncias dos modelos
+    do dlib (ver modelos_face). `galeria` é a do banco, para a checagem de
+    duplicatas; quem é cadastrado na sessão vai para uma galeria à parte
+    (a mapeada é somente leitura) e também conta para os próximos da fila.
+    """
+
+    def __init__(self, galeria: Galeria):
+        super().__init__(name="gravador-cadastros", daemon=True)
+        self.fila = queue.Queue()
+        self.resultados: List[Dict] = []
+        self.galeria = galeria
+        self.sessao = Galeria(modelo=galeria.modelo)
+
+    def enfileirar(self, pessoa: Dict, candidatos: List[Dict]) -> None:
+        self.fila.put((pessoa, candidatos))
+
+    def parar(self) -> None:
+        """Espera os cadastros pendentes terminarem."""
+        self.fila.put(None)
+        self.join()
+
+    def run(self) -> None:
+        while True:
+            item = self.fila.get()
+            if item is None:
+                break
+            pessoa, candidatos = item
+            try:
+                resultado = concluir_cadastro(pessoa, candidatos, (self.galeria, self.sessao))
+                if resultado['status'] == 'cadastrado':
+                    self.sessao.adicionar_usuario({'id': resultado['usuario_id'], 'nome': pessoa['nome'],
+                                                   'cpf': pessoa['matricula']}, resultado.pop('encodings'))
+            except Exception:
+                evento(log, logging.ERROR, "erro_cadastro_quiosque", exc_info=True, matricula=pessoa['matricula'])
+                resultado = {'status': 'erro'}
+            resultado['matricula'] = pessoa['matricula']
+            self.resultados.append(resultado)
+            evento(log, logging.INFO, "cadastro_quiosque", pessoa=pessoa['nome'], **resultado)
+            print(f"{'✅' if resultado['status'] == 'cadastrado' else '❌'} {pessoa['nome']} "
+                  f"({pessoa['matricula']}): {resultado['status']}")
+            if resultado.get('duplicatas'):
+                print(f"⚠️ {pessoa['nome']} parece já cadastrado(a) como: {', '.join(resultado['duplicatas'])} "
+                      f"(confira com `catraca.py audit-duplicates`)")
+
+
+def _desenhar(frame, pessoa: Dict, rosto, coleta: ColetaCadastro, restantes: int, saindo: bool) -> None:
+    if saindo:
+        status, cor = f"OBRIGADO, {pessoa['nome'].split()[0].upper()}! PODE SAIR", (0, 255, 0)
+    elif rosto is None:
+        status, cor = "POSICIONE SEU ROSTO NA CAMERA", (0, 255, 255)
+    elif coleta.qualidade and not coleta.qualidade['aprovado']:
+        status, cor = ORIENTACOES[coleta.qualidade['motivo']], (0, 165, 255)
+    else:
+        status = f"CAPTURANDO... {len(coleta.candidatos)}/{catraca_virtual.TEMPLATES_POR_CADASTRO}"
+        cor = (0, 255, 0)
+
+    if rosto is not None and not saindo:
+        top, right, bottom, left = rosto
+        cv2.rectangle(frame, (left, top), (right, bottom), cor, 3)
+    RENDERIZADOR.cabecalho(frame, f"CADASTRO: {pessoa['nome']} ({restantes} na fila)", status, cor)
+
+
+def executar_quiosque(pessoas: List[Dict], fonte=None, exibir: bool = True) -> Optional[List[Dict]]:
+    """
+    Cadastra a fila em sequência. Para cada pessoa: coleta os melhores frames,
+    entrega ao gravador e espera ela sair da frente da câmera (ou TEMPO_SAIDA).
+    ESC encerra. Retorna o resultado de cada cadastro concluído, ou None se a
+    fonte de vídeo não abrir.
+    """
+    aquecer_em_segundo_plano(catraca_virtual.DETECTOR_BACKEND)  # Sobrepõe a carga dos modelos com a abertura da câmera
+    cap = abrir_fonte(fonte)
+    if cap is None:
+        return None
+    aguardar_modelos()  # O laço da câmera recebe os modelos já aquecidos
+    # Antes do laço: montar a galeria pode gerar chips (detecção + encoding)
+    galeria = catraca_virtual.carregar_galeria_db()
+
+    detector = DetectorAdaptativo(escalas_busca=ESCALAS_QUIOSQUE, backend=criar_detector(catraca_virtual.DETECTOR_BACKEND))
+    gravador = GravadorCadastros(galeria)
+    gravador.start()
+    encerrar = False
+    try:
+        for posicao, pessoa in enumerate(pessoas):
+            if encerrar:
+                break
+            print(f"📸 Próximo: {pessoa['nome']} ({pessoa['matricula']})")
+            coleta = ColetaCadastro()
+            saida_desde = None
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    evento(log, logging.ERROR, "falha_captura")
+                    encerrar = True
+                    break
+
+                # Detecção em frame reduzido, na escala dos rostos recentes (caixas no frame original)
+                face_locations = detector.detectar(frame)
+                if saida_desde is None:
+                    rosto = coleta.observar(frame, face_locations)
+                    if coleta.concluida:
+                        gravador.enfileirar(pessoa, coleta.candidatos)
+                        saida_desde = time.time()
+                else:
+                    rosto = coleta.acompanhar(face_locations)
+                    if coleta.alvo is None or time.time() - saida_desde >= TEMPO_SAIDA:
+                        break  # Saiu (a coleta reinicia ao perder o rosto) ou demorou demais
+
+                if exibir:
+                    _desenhar(frame, pessoa, rosto, coleta, len(pessoas) - posicao, saida_desde is not None)
+                    cv2.imshow('Cadastro Automatico', frame)
+                    if cv2.waitKey(1) & 0xFF == 27:
+                        print("❌ Quiosque encerrado.")
+                        encerrar = True
+                        break
+    finally:
+        cap.release()
+        gravador.parar()
+        if exibir:
+            cv2.destroyAllWindows()
+    return gravador.resultados
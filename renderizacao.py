@@ -0,0 +1,81 @@
+# renderizacao.py
+# Desenho da interface ao vivo sem cópias do frame: o cabeçalho é escurecido
+# direto na faixa do topo e os textos que se repetem são rasterizados uma vez
+# em máscaras guardadas em cache
+
+import cv2
+import numpy as np
+from collections import OrderedDict
+from typing import Tuple
+
+# --- CONFIGURAÇÕES ---
+ALTURA_CABECALHO = 80           # px da faixa de status no topo
+OPACIDADE_CABECALHO = 0.4       # Fundo preto a 40% (a faixa mantém 60% do brilho)
+MAX_TEXTOS_CACHE = 128          # Máscaras de texto guardadas (LRU)
+
+Cor = Tuple[int, int, int]
+
+
+class Renderizador:
+    """
+    Substitui o `overlay = frame.copy()` + `addWeighted` do frame inteiro:
+    misturar com preto é só multiplicar a faixa por (1 - opacidade), feito
+    no lugar. Textos são desenhados copiando a cor pela máscara em cache
+    (`cv2.copyTo` numa view do frame), em vez de rasterizar a fonte Hershey
+    a cada frame.
+    """
+
+    def __init__(self, altura_cabecalho: int = ALTURA_CABECALHO, opacidade: float = OPACIDADE_CABECALHO,
+                 max_textos: int = MAX_TEXTOS_CACHE):
+        self.altura_cabecalho = altura_cabecalho
+        self.opacidade = opacidade
+        self.max_textos = max_textos
+        self._textos: "OrderedDict[tuple, Tuple[np.ndarray, np.ndarray, int, int]]" = OrderedDict()
+
+    def _mascara(self, texto: str, fonte: int, escala: float, cor: Cor, espessura: int):
+        """Máscara do texto, bloco da cor e deslocamento da origem (cache LRU)."""
+        chave = (texto, fonte, escala, cor, espessura)
+        item = self._textos.get(chave)
+        if item is not None:
+            self._textos.move_to_end(chave)
+            return item
+
+        (largura, altura), base = cv2.getTextSize(texto, fonte, escala, espessura)
+        margem = espessura + 1
+        mascara = np.zeros((altura + base + 2 * margem, largura + 2 * margem), np.uint8)
+        cv2.putText(mascara, texto, (margem, altura + margem), fonte, escala, 255, espessura)
+        tinta = np.empty(mascara.shape + (3,), np.uint8)
+        tinta[:] = cor
+        item = (mascara, tinta, margem, altura + margem)
+
+        self._textos[chave] = item
+        if len(self._textos) > self.max_textos:
+            self._textos.popitem(last=False)
+        return item
+
+    def texto(self, frame, texto: str, origem: Tuple[int, int], fonte: int, escala: float,
+              cor: Cor, espessura: int = 1) -> None:
+        """Equivalente a cv2.putText (mesma origem na linha de base), recortado nas bordas do frame."""
+        mascara, tinta, dx, dy = self._mascara(texto, fonte, escala, cor, espessura)
+        x0, y0 = origem[0] - dx, origem[1] - dy
+        altura, largura = frame.shape[:2]
+
+        # Recorte para textos que saem do frame (ex.: rosto encostado na borda)
+        mx0, my0 = max(0, -x0), max(0, -y0)
+        mx1 = min(mascara.shape[1], largura - x0)
+        my1 = min(mascara.shape[0], altura - y0)
+        if mx1 <= mx0 or my1 <= my0:
+            return
+
+        destino = frame[y0 + my0:y0 + my1, x0 + mx0:x0 + mx1]
+        cv2.copyTo(tinta[my0:my1, mx0:mx1], mascara[my0:my1, mx0:mx1], destino)
+
+    def cabecalho(self, frame, titulo: str, status: str, cor_status: Cor = (255, 255, 255)) -> None:
+        """Faixa escurecida no topo com o título e a linha de status."""
+        faixa = frame[:self.altura_cabecalho + 1]  # Como o cv2.rectangle de antes, inclui a linha final
+        cv2.convertScaleAbs(faixa, faixa, alpha=1.0 - self.opacidade)
+        self.texto(frame, titulo, (20, 30), cv2.FONT_HERSHEY_DUPLEX, 0.8, (255, 255, 255), 2)
+        self.texto(frame, status, (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, cor_status, 2)
+
+
+RENDERIZADOR = Renderizador()
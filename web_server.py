@@ -2,17 +2,22 @@
 # web_server.py
 # Servidor web local para cadastro por etapas via celular
 
-from flask import Flask, request, render_template_string, redirect, url_for, flash, jsonify
+from flask import Flask, request, render_template_string, redirect, url_for, flash, jsonify, Response
 import os
 import sqlite3
-import face_recognition
-import cv2
 import numpy as np
 from PIL import Image
 import io
 import re
 from datetime import datetime
 import socket
+import time
+import shutil
+import catraca_virtual
+from chip_facial import gerar_chip, gravar_chip
+from codificacao import codificar_chips
+from modelos_face import aquecer_em_segundo_plano, aguardar_modelos
+from metricas import REGISTRO, ETAPAS_UPLOAD, UPLOADS, ARQUIVO_METRICAS, mesclar_exposicoes
 
 # Configurações
 DB_FILE = "catraca_virtual.db"
@@ -54,6 +59,15 @@ def salvar_usuario_db(nome: str, equipe: str, matricula: str, foto_path: str) ->
 
 def processar_foto_upload(file, matricula_sanitizada: str, nome: str) -> tuple:
     """Processa foto enviada via upload com otimização para reconhecimento facial."""
+    marca = time.perf_counter()
+    
+    def etapa(nome: str) -> None:
+        nonlocal marca
+        agora = time.perf_counter()
+        ETAPAS_UPLOAD.observar(agora - marca, etapa=nome)
+        marca = agora
+    
+    aguardar_modelos()  # O primeiro upload pode chegar durante o aquecimento
     try:
         # Ler imagem do upload
         image_data = file.read()
@@ -65,6 +79,7 @@ def processar_foto_upload(file, matricula_sanitizada: str, nome: str) -> tuple:
         
         # Converter para numpy array para processamento
         image_array = np.array(image)
+        etapa("leitura")
         
         # Otimizar para reconhecimento facial
         # Redimensionar mantendo qualidade para face_recognition
@@ -99,6 +114,7 @@ def processar_foto_upload(file, matricula_sanitizada: str, nome: str) -> tuple:
         # Aumentar nitidez levemente
         enhancer = ImageEnhance.Sharpness(image)
         image = enhancer.enhance(1.2)
+        etapa("ajuste")
         
         # Criar diretório do usuário
         caminho_usuario = os.path.join(USUARIOS_DIR, matricula_sanitizada)
@@ -109,18 +125,39 @@ def processar_foto_upload(file, matricula_sanitizada: str, nome: str) -> tuple:
         
         # Salvar com qualidade alta para melhor reconhecimento
         image.save(caminho_foto, 'JPEG', quality=95, optimize=False, subsampling=0)
+        etapa("gravacao")
         
-        # Testar se consegue fazer encoding (validação)
+        # Gerar chip alinhado + landmarks (valida a detecção e evita re-detecção na carga)
+        resultado = "ok"
+        chip = None
         try:
-            test_image = face_recognition.load_image_file(caminho_foto)
-            encodings = face_recognition.face_encodings(test_image)
-            print(f"✅ Foto processada - {len(encodings)} encoding(s) gerado(s)")
+            chip = gerar_chip(np.array(image))
+            if chip is None:
+                resultado = "sem_rosto"
+                print("⚠️ Aviso: nenhum rosto encontrado na foto enviada")
         except Exception as e:
+            resultado = "sem_rosto"
             print(f"⚠️ Aviso: {e}")
+        etapa("chip")
+        
+        if chip is not None:
+            # Matrícula nova não garante pessoa nova: o rosto é comparado com a galeria inteira antes de gravar
+            encodings = codificar_chips([chip[0]])
+            suspeitos = catraca_virtual.verificar_duplicatas(encodings, catraca_virtual.carregar_galeria_db())
+            etapa("duplicata")
+            if suspeitos:
+                UPLOADS.inc(resultado="duplicata")
+                shutil.rmtree(caminho_usuario, ignore_errors=True)
+                nomes = ", ".join(f"{s['nome']} (matrícula {s['cpf']})" for s in suspeitos)
+                return False, f"Este rosto é muito parecido com pessoa(s) já cadastrada(s): {nomes}. Procure o administrador."
+            gravar_chip(caminho_usuario, *chip)
+            print("✅ Foto processada - chip facial gerado")
+        UPLOADS.inc(resultado=resultado)
         
         return True, caminho_foto
         
     except Exception as e:
+        UPLOADS.inc(resultado="erro")
         return False, f"Erro ao processar imagem: {str(e)}"
 
 # Template HTML para interface por etapas
@@ -752,6 +789,21 @@ def status():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/metrics')
+def metrics():
+    """
+    Métricas no formato texto do Prometheus: as deste servidor e o último
+    snapshot da catraca, numa exposição só (uma família por nome).
+    """
+    snapshot = ""
+    try:
+        with open(ARQUIVO_METRICAS, 'r', encoding='utf-8') as f:
+            snapshot = f.read()
+    except OSError:
+        pass  # Catraca ainda não gravou métricas
+    texto = mesclar_exposicoes(REGISTRO.texto(), snapshot)
+    return Response(texto, content_type='text/plain; version=0.0.4; charset=utf-8')
+
 def get_local_ip():
     """Obtém o IP local da máquina."""
     try:
@@ -770,10 +822,13 @@ def run_local_server(port=5000):
     print(f"📱 Acesso via CELULAR: http://{local_ip}:{port}")
     print(f"💻 Acesso via COMPUTADOR: http://localhost:{port}")
     print(f"📊 Status do sistema: http://{local_ip}:{port}/status")
+    print(f"📈 Métricas (Prometheus): http://{local_ip}:{port}/metrics")
     print(f"🛑 Para parar: Ctrl+C")
     print("=" * 50)
     print("💡 Cadastro por etapas com interface moderna!")
     
+    # O primeiro upload não espera a carga dos modelos; a fase de inicialização é da catraca
+    aquecer_em_segundo_plano(registrar_fase=False)
     app.run(host='0.0.0.0', port=port, debug=False)
 
 if __name__ == '__main__':